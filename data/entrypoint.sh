@@ -31,6 +31,13 @@ case $1 in
   mock)
     exec calllogger-mock
   ;;
+  hosted)
+    exec calllogger-hosted
+  ;;
+  reprocess)
+    shift
+    exec calllogger-reprocess "$@"
+  ;;
   *)
     exec "$@"
   ;;
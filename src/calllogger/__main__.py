@@ -1,7 +1,10 @@
 # Standard Lib
+from functools import partial
+from pathlib import PosixPath
 from queue import SimpleQueue
 import argparse
 import logging
+import typing
 import signal
 import sys
 
@@ -9,10 +12,14 @@ import sys
 import sentry_sdk
 
 # Local
-from calllogger.plugins import get_plugin
-from calllogger import __version__, api, settings, stopped, telemetry
+from calllogger.plugins import SerialPlugin, get_plugin, get_plugins
+from calllogger import __version__, api, settings, stopped, telemetry, phonebook, bench
 from calllogger.auth import get_token
-from calllogger.misc import graceful_exception, terminate
+from calllogger.deadletter import dead_letters
+from calllogger import capture
+from calllogger.simulator import SerialSimulator
+from calllogger.misc import graceful_exception, terminate, Supervisor
+from calllogger.tenants import HostedTenants, load_tenants
 
 logger = logging.getLogger("calllogger")
 
@@ -22,8 +29,10 @@ parser.add_argument("--version", action="version", version=f"calllogger {__versi
 parser.parse_known_args()
 
 
-def initialise_telemetry(client_info: api.ClientInfo):
+def initialise_telemetry(client_info: api.ClientInfo, slug: str = None):
     """Collect system metrics and logs."""
+    slug = slug or client_info.slug
+
     # Enable metrics telemetry
     if settings.collect_metrics and client_info.influx_token:
         api.InfluxWrite(
@@ -34,7 +43,7 @@ def initialise_telemetry(client_info: api.ClientInfo):
             token=client_info.influx_token,
             default_fields=dict(
                 identifier=settings.identifier,
-                client=client_info.slug,
+                client=slug,
             ),
         ).start()
 
@@ -45,7 +54,7 @@ def initialise_telemetry(client_info: api.ClientInfo):
             token=client_info.logzio_token,
             extras=dict(
                 identifier=settings.identifier,
-                tenant_slug=client_info.slug,
+                tenant_slug=slug,
             ),
         )
 
@@ -61,25 +70,154 @@ def main_loop(plugin: str) -> int:
     # Enable periodic checkin
     api.ClientInfo.setup_checkin(tokenauth, settings.identifier)
 
+    # Load the phonebook used by the 'phonebook' middleware
+    phonebook.load_phonebook()
+    if settings.phonebook_sync:
+        api.setup_phonebook_sync(tokenauth)
+
     # Configure sentry
-    plugin_name = plugin if plugin else settings.plugin
-    sentry_sdk.set_tag("plugin", plugin_name)
-    plugin = get_plugin(plugin_name)
+    plugin_spec = plugin if plugin else settings.plugin
+    sentry_sdk.set_tag("plugin", plugin_spec)
+    selected = get_plugins(plugin_spec)
+
+    # Failed threads get restarted in place, keeping the queue intact
+    supervisor = Supervisor()
 
     # Start the CDR worker to monitor the record queue
     queue = SimpleQueue()
-    cdr_thread = api.CDRWorker(queue, tokenauth)
-    cdr_thread.start()
+    supervisor.start(partial(api.CDRWorker, queue, tokenauth))
 
-    # Start the plugin thread to monitor for call records
-    plugin_thread = plugin(_queue=queue)
-    plugin_thread.start()
+    # Start a plugin thread for each plugin instance to monitor for call records
+    # All instances share the same queue and CDR worker
+    for plugin, overrides in selected:
+        supervisor.start(partial(plugin, _queue=queue, **overrides))
 
     # Block untill the stop event has been triggered
     stopped.wait()
     return stopped.get_exit_code()
 
 
+def hosted_loop() -> int:
+    """Run every tenant from the tenants file and wait for program shutdown."""
+    tenants_file = settings.tenants_file or settings.datastore.joinpath("tenants.json")
+    hosted = HostedTenants(load_tenants(tenants_file))
+    sentry_sdk.set_tag("plugin", "hosted")
+    hosted.start()
+
+    # Telemetry is shared by all tenants, so use the credentials of the first tenant that started
+    started = (tenant for tenant in hosted.tenants if not tenant.disabled and tenant.client_info is not None)
+    if (tenant := next(started, None)) is not None:
+        initialise_telemetry(tenant.client_info, slug="hosted")
+    else:
+        logger.warning("No tenant started, telemetry is disabled")
+
+    # Block untill the stop event has been triggered
+    stopped.wait()
+    return stopped.get_exit_code()
+
+
+def reprocess_loop(plugin: str = "") -> int:
+    """
+    Run the dead letters through the plugin parsers again and send the recovered records.
+    Lines that still fail are stored again as dead letters.
+
+    :param plugin: Parse every line with this plugin instead of the plugin that stored it.
+    """
+    # The letters are moved aside first, so the running logger keeps adding new ones to a fresh file meanwhile.
+    # Only the lines that fail again are stored once the run finishes, a failed run puts every letter back.
+    with dead_letters.claim() as letters:
+        if not letters:
+            print("No dead letters to reprocess")
+            return 0
+
+        # Every plugin is checked before any letter is processed
+        queue = SimpleQueue()
+        parsers = {}
+        for name in dict.fromkeys(plugin or letter.plugin for letter in letters):
+            plugin_class = get_plugin(name)
+            if not issubclass(plugin_class, SerialPlugin):
+                print(f"Plugin '{plugin_class.__name__}' does not support reprocessing")
+                sys.exit(0)
+            parsers[name] = plugin_class(_queue=queue)
+
+        recovered = []
+        for letter in letters:
+            parser = parsers[plugin or letter.plugin]
+            try:
+                record = parser.process_line(letter.raw)
+            except Exception:
+                continue
+
+            # Records dropped by the middleware or filter rules don't reach the queue
+            parser.push(record)
+            if not queue.empty():
+                recovered.append((letter, queue.get()))
+
+        print(f"Recovered {len(recovered)} of {len(letters)} dead letters")
+        if not recovered:
+            return 0
+
+        worker = api.CDRWorker(queue, get_token())
+        for start in range(0, len(recovered), settings.batch_size):
+            batch = recovered[start:start + settings.batch_size]
+            if not worker.send_request(worker.request, [record.__dict__ for _, record in batch]):
+                for letter, _ in batch:
+                    dead_letters.add(letter.raw, "send", RuntimeError("Failed to send record"), plugin=letter.plugin)
+        return stopped.get_exit_code()
+
+
+def replay_loop(plugin: str, paths: list[str], speed: float = 1.0, port: str = "") -> int:
+    """
+    Feed a serial capture archive through a serial plugin, printing the records.
+
+    :param plugin: The serial plugin to parse the lines with.
+    :param paths: Capture segments, or directories of segments.
+    :param speed: Multiple of the original speed, 0 replays as fast as possible.
+    :param port: Only replay the segments of this port, required when the segments are from more than one port.
+    """
+    plugin_class = get_plugin(plugin)
+    if not issubclass(plugin_class, SerialPlugin):
+        print(f"Plugin '{plugin_class.__name__}' does not support replaying")
+        return 0
+
+    name = capture.port_name(port) if port else "*"
+    segments = []
+    for path in map(PosixPath, paths or [capture.capture_dir()]):
+        segments.extend(capture.segments(path, name) if path.is_dir() else [path])
+
+    # Each port has its own timeline and line format, so the lines of two ports can't go through one parser
+    if port:
+        segments = [path for path in segments if capture.segment_port(path) == name]
+    elif len(ports := sorted({capture.segment_port(path) for path in segments})) > 1:
+        print(f"The capture has more than one port, pick one with --port: {', '.join(ports)}")
+        return 0
+
+    queue = SimpleQueue()
+    parser = plugin_class(_queue=queue)
+    # Don't capture the replay itself or count it in the serial link stats
+    parser.capture = None
+    parser.stats = None
+    lines = records = 0
+    previous = None
+
+    for timestamp, chunk in capture.read_frames(segments):
+        # Keep the original gaps between the chunks, scaled by the speed
+        if speed and previous is not None and (delay := (timestamp - previous) / speed) > 0:
+            if stopped.wait(delay):
+                break
+        previous = timestamp
+
+        for raw_line in parser.frame(chunk):
+            parser.handle_line(raw_line)
+            lines += 1
+        while not queue.empty():
+            print(queue.get())
+            records += 1
+
+    print(f"Replayed {lines} lines into {records} records")
+    return 0
+
+
 # Entrypoint: calllogger
 @graceful_exception
 def monitor() -> int:
@@ -94,12 +232,102 @@ def mockcalls() -> int:
     return main_loop("MockCalls")
 
 
+# Entrypoint: calllogger-hosted
+@graceful_exception
+def hosted() -> int:
+    """Run many tenants in one process."""
+    return hosted_loop()
+
+
+# Entrypoint: calllogger-reprocess
+@graceful_exception
+def reprocess() -> int:
+    """Reprocess the dead letters after a parser fix."""
+    reprocess_parser = argparse.ArgumentParser(prog="calllogger-reprocess")
+    reprocess_parser.add_argument("--plugin", default="", help="Parse the lines with this plugin instead")
+    args, _ = reprocess_parser.parse_known_args()
+    return reprocess_loop(args.plugin)
+
+
+# Entrypoint: calllogger-bench-plugin
+@graceful_exception
+def bench_plugin() -> int:
+    """Benchmark a plugin against a capture file, see :mod:`calllogger.bench`."""
+    bench_parser = argparse.ArgumentParser(prog="calllogger-bench-plugin")
+    bench_parser.add_argument("plugin", help="The plugin to benchmark")
+    bench_parser.add_argument("capture", help="File of raw lines captured from the phone system")
+    bench_parser.add_argument("--repeat", type=int, default=1, help="Number of times to run through the lines")
+    bench_parser.add_argument("--min-rate", type=float, default=0, help="Fail when below this many lines/s")
+    bench_parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE", help="Plugin setting")
+    args, _ = bench_parser.parse_known_args()
+
+    plugin = get_plugin(args.plugin)
+    casts = typing.get_type_hints(plugin)
+    overrides = {}
+    for option in args.set:
+        key, _, value = option.partition("=")
+        overrides[key] = casts.get(key, str)(value)
+
+    result = bench.bench_plugin(plugin, bench.read_capture(args.capture), repeat=args.repeat, **overrides)
+    print(result.report())
+    if result.rate < args.min_rate:
+        print(f"Below the minimum rate of {args.min_rate:,.0f} lines/s")
+        return 1
+    return 0
+
+
+# Entrypoint: calllogger-replay
+@graceful_exception
+def replay() -> int:
+    """Replay a serial capture archive through a plugin, see :mod:`calllogger.capture`."""
+    replay_parser = argparse.ArgumentParser(prog="calllogger-replay")
+    replay_parser.add_argument("plugin", help="The serial plugin to parse the lines with")
+    replay_parser.add_argument("paths", nargs="*", help="Capture segments or directories, defaults to the datastore")
+    replay_parser.add_argument("--speed", type=float, default=1.0, help="Multiple of the original speed, 0 is no delay")
+    replay_parser.add_argument("--port", default="", help="Only replay this port, needed with more than one")
+    args, _ = replay_parser.parse_known_args()
+    return replay_loop(args.plugin, args.paths, args.speed, args.port)
+
+
 @graceful_exception
 def getmac() -> int:
     print(settings.identifier)
     return 0
 
 
+# Entrypoint: calllogger-simulate-serial
+@graceful_exception
+def simulate_serial() -> int:
+    """Simulate a phone system on a pseudo terminal, see :mod:`calllogger.simulator`."""
+    simulate_parser = argparse.ArgumentParser(prog="calllogger-simulate-serial")
+    simulate_parser.add_argument("--rate", type=float, default=10.0, help="Lines per second")
+    simulate_parser.add_argument("--burst", type=int, default=1, help="Number of lines written together")
+    simulate_parser.add_argument("--noise", type=float, default=0.0, help="Chance of line noise in a line")
+    simulate_parser.add_argument("--control", type=float, default=0.0, help="Chance of a control character in a line")
+    simulate_parser.add_argument("--capture", help="Write the lines of this capture file instead of random lines")
+    simulate_parser.add_argument("--count", type=int, default=0, help="Number of lines to write, 0 for no limit")
+    simulate_parser.add_argument("--seed", type=int, help="Seed of the random lines")
+    args, _ = simulate_parser.parse_known_args()
+
+    simulator = SerialSimulator(
+        lines=bench.read_capture(args.capture) if args.capture else None,
+        rate=args.rate,
+        burst=args.burst,
+        noise=args.noise,
+        control=args.control,
+        seed=args.seed,
+    )
+    port = simulator.open()
+    print(f"Simulating a phone system on: {port}")
+    print(f"Set PLUGIN=SiemensHipathSerial:{port} or PLUGIN_PORT={port}")
+    try:
+        written = simulator.run(args.count, stopped)
+    finally:
+        simulator.close()
+    print(f"Wrote {written} lines")
+    return 0
+
+
 # Gracefully shutdown for 'kill <pid>' or docker stop <container>
 signal.signal(signal.SIGTERM, terminate)
 
@@ -4,6 +4,8 @@ __all__ = [
     "InfluxWrite",
     "ClientInfo",
     "link_device",
+    "sync_phonebook",
+    "setup_phonebook_sync",
 ]
 
 from calllogger.api.handlers import QuartxAPIHandler
@@ -11,3 +13,4 @@ from calllogger.api.info import ClientInfo
 from calllogger.api.device import link_device
 from calllogger.api.cdr import CDRWorker
 from calllogger.api.influx import InfluxWrite
+from calllogger.api.phonebook import sync_phonebook, setup_phonebook_sync
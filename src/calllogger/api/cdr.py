@@ -35,6 +35,7 @@ class CDRWorker(QuartxAPIHandler, ThreadExceptionManager):
         self.backlog_mode = False
         self.queue = call_queue
         self.logger = logger
+        self.quit = False
 
         # Request
         self.request = requests.Request(
@@ -46,7 +47,7 @@ class CDRWorker(QuartxAPIHandler, ThreadExceptionManager):
     def entrypoint(self):
         """Process the call record queue."""
 
-        while not self.stopped.is_set():
+        while not self.stopped.is_set() and self.quit is False:
             # Deside if we need to switch to backlog mode
             if self.queue.qsize() > settings.backlog_trigger:
                 self.backlog_mode = True
@@ -42,11 +42,31 @@ class ClientInfo:
         return self.raw_json[key]
 
     @classmethod
-    def get_client_info(cls, token: TokenAuth, identifier: str, checkin=False) -> ClientInfo:
-        """Request information about the client."""
+    def get_client_info(
+        cls,
+        token: TokenAuth,
+        identifier: str,
+        checkin=False,
+        apply_settings=True,
+        handler: QuartxAPIHandler = None,
+    ) -> ClientInfo:
+        """
+        Request information about the client.
+
+        :param token: The CDR token of the client.
+        :param identifier: The device identifier.
+        :param checkin: Flag to indicate that this is a periodic checkin.
+        :param apply_settings: Apply the restart request, settings and sentry user to this process.
+            Disabled in hosted mode where the process is shared by many clients.
+        :param handler: Optional API handler to make the request with, e.g. one that
+            handles a revoked token without stopping the process.
+        """
         (logger.debug if checkin else logger.info)("Requesting client info and settings")
-        api = QuartxAPIHandler()
-        api.logger = logger
+        if handler is None:
+            api = QuartxAPIHandler()
+            api.logger = logger
+        else:
+            api = handler
 
         # We will pass data to server using query params
         params = dict(
@@ -77,6 +97,8 @@ class ClientInfo:
 
         client_data = resp.json()
         client_data = cls(client_data)
+        if not apply_settings:
+            return client_data
 
         # Check if a restart is requested
         if checkin and client_data.restart:
@@ -0,0 +1,75 @@
+# Standard lib
+from urllib.parse import urljoin
+import logging
+
+# Third party
+from requests import Request, RequestException, codes
+
+# Local
+from calllogger import settings, utils, phonebook
+from calllogger.api import QuartxAPIHandler
+from calllogger.misc import ThreadTimer
+from calllogger.utils import TokenAuth
+
+phonebook_url = urljoin(settings.domain, "/api/v1/monitor/cdr/phonebook/")
+download_chunk_size = 64 * 1024
+logger = logging.getLogger(__name__)
+
+
+def etag_store():
+    return settings.datastore.joinpath("phonebook.etag")
+
+
+def sync_phonebook(token: TokenAuth) -> bool:
+    """
+    Download the phonebook from the server if it changed since the last sync.
+
+    :returns: True if a new phonebook was loaded, else False.
+    """
+    api = QuartxAPIHandler(suppress_errors=True)
+    api.logger = logger
+    headers = {}
+
+    # Only download the phonebook if it changed
+    if (store := etag_store()).exists() and phonebook.phonebook_path().exists():
+        headers["If-None-Match"] = utils.read_datastore(store)
+
+    request = Request(method="GET", url=phonebook_url, auth=token, headers=headers)
+    resp = api.send_request(request, stream=True)
+    if not resp or resp.status_code == codes.not_modified:
+        logger.debug("Phonebook unchanged")
+        return False
+
+    # Stream the download to a new file that replaces the phonebook once complete,
+    # so the phonebook is never held in memory as a whole and is loaded the same way as at startup
+    path = phonebook.phonebook_path()
+    download = path.with_name(f"{path.name}.download")
+    try:
+        with resp, download.open("wb") as stream:
+            for chunk in resp.iter_content(chunk_size=download_chunk_size):
+                stream.write(chunk)
+    except (RequestException, OSError) as err:
+        logger.warning("Failed to download phonebook: %s", err)
+        download.unlink(missing_ok=True)
+        return False
+
+    download.replace(path)
+    phonebook.load_phonebook()
+
+    # Only remembered once loaded, so a failed load is downloaded again on the next sync
+    if etag := resp.headers.get("ETag"):
+        utils.write_datastore(store, etag)
+    else:
+        store.unlink(missing_ok=True)
+    return True
+
+
+def setup_phonebook_sync(token: TokenAuth):
+    """Sync the phonebook now and then again at every checkin interval."""
+    sync_phonebook(token)
+    ThreadTimer(
+        min(settings.checkin_interval, 30) * 60,
+        sync_phonebook,
+        args=[token],
+        repeat=True,
+    ).start()
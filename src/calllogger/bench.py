@@ -0,0 +1,197 @@
+"""
+Plugin benchmark
+----------------
+Feed the lines of a capture file through a plugin offline, without the phone system.
+
+Each line is driven through the plugin stages (decode, validate, parse and push for serial plugins)
+in a tight loop, with the record queue swapped for one that drops the records. The report gives the
+lines per second, the time spent in each stage, the memory kept per record and a breakdown of failures.
+
+.. code-block:: bash
+
+    calllogger-bench-plugin SiemensHipathSerial capture.txt --repeat 10 --min-rate 50000
+"""
+
+# Standard lib
+from collections import Counter
+from typing import Callable, Iterable, Optional, Type
+from pathlib import PosixPath
+import tracemalloc
+import time
+import csv
+import sys
+import gc
+
+# Local
+from calllogger.plugins import BasePlugin, SerialPlugin
+from calllogger.plugins.internal.beronet import BeroNet
+
+__all__ = ["NullQueue", "BenchResult", "bench_plugin", "read_capture"]
+
+# A stage takes the output of the previous stage and returns its own output,
+# the check returns the name of the failure for an output that should go no further.
+Stage = tuple[str, Callable, Optional[Callable]]
+
+
+class NullQueue:
+    """Stand in for the record queue that counts the records and drops them."""
+
+    def __init__(self):
+        self.count = 0
+
+    def qsize(self) -> int:
+        return 0
+
+    def put(self, _):
+        self.count += 1
+
+
+class BenchResult:
+    """The results of a benchmark run."""
+
+    def __init__(self, plugin: str, stage_names: list[str]):
+        self.plugin = plugin
+        self.lines = 0
+        self.records = 0
+        self.elapsed = 0.0
+        #: Time in seconds spent in each stage.
+        self.stage_time = dict.fromkeys(stage_names, 0.0)
+        #: Count of failures by stage and error.
+        self.failures = Counter()
+        #: Memory blocks and bytes kept per record, measured in a separate untimed pass.
+        self.blocks_per_record = 0.0
+        self.bytes_per_record = 0.0
+
+    @property
+    def rate(self) -> float:
+        """Lines processed per second."""
+        return self.lines / self.elapsed if self.elapsed else 0.0
+
+    def report(self) -> str:
+        lines = [
+            f"Plugin:           {self.plugin}",
+            f"Lines:            {self.lines}",
+            f"Records:          {self.records}",
+            f"Lines/s:          {self.rate:,.0f}",
+            f"Blocks/record:    {self.blocks_per_record:.1f}",
+            f"Bytes/record:     {self.bytes_per_record:.0f}",
+            "Stage time per line:",
+        ]
+        for name, spent in self.stage_time.items():
+            lines.append(f"  {name:<16}{spent / self.lines * 1_000_000 if self.lines else 0:.2f}us")
+        if self.failures:
+            lines.append("Failures:")
+            for name, count in self.failures.most_common():
+                lines.append(f"  {name:<40}{count}")
+        return "\n".join(lines)
+
+
+def _check_validated(line) -> Optional[str]:
+    if line == "":
+        return "validation: EmptyLine"
+    return None if line else "validation: ValidationError"
+
+
+def _check_parsed(record) -> Optional[str]:
+    return None if record else "parse: ParseError"
+
+
+def _decode_csv(raw: bytes) -> Optional[list[str]]:
+    return next(csv.reader([raw.decode("utf-8")]), None)
+
+
+def plugin_stages(plugin: BasePlugin) -> list[Stage]:
+    """The stages a line goes through for the given plugin."""
+    if isinstance(plugin, SerialPlugin):
+        return [
+            ("decode", plugin.decode, None),
+            ("validate", plugin.validate, _check_validated),
+            ("parse", plugin.parse, _check_parsed),
+            ("push", plugin.push, None),
+        ]
+    elif isinstance(plugin, BeroNet):
+        # BeroNet pushes the records itself while parsing the CSV rows
+        return [
+            ("decode", _decode_csv, lambda row: None if row else "decode: EmptyLine"),
+            ("parse", plugin.process_call, None),
+        ]
+    raise TypeError(f"Plugin '{plugin.__class__.__name__}' can't be benchmarked")
+
+
+def make_plugin(plugin_class: Type[BasePlugin], queue: NullQueue, **overrides) -> BasePlugin:
+    """Create the plugin, giving any required text setting a blank value as no connection is made."""
+    for key, cast in plugin_class.__dict__.get("__annotations__", {}).items():
+        if cast is str and not hasattr(plugin_class, key):
+            overrides.setdefault(key, "")
+    return plugin_class(_queue=queue, **overrides)
+
+
+def run_stages(stages: list[Stage], lines: list[bytes], result: BenchResult):
+    """Drive every line through the stages, timing each stage."""
+    clock = time.perf_counter
+    stage_time = result.stage_time
+    failures = result.failures
+
+    start = clock()
+    for line in lines:
+        value = line
+        for name, func, check in stages:
+            stage_start = clock()
+            try:
+                value = func(value)
+            except Exception as err:
+                stage_time[name] += clock() - stage_start
+                failures[f"{name}: {err.__class__.__name__}"] += 1
+                break
+            stage_time[name] += clock() - stage_start
+            if check and (failure := check(value)):
+                failures[failure] += 1
+                break
+    result.elapsed += clock() - start
+    result.lines += len(lines)
+
+
+def measure_memory(stages: list[Stage], lines: list[bytes], queue: NullQueue) -> tuple[float, float]:
+    """Return the memory blocks and bytes kept per record, by holding on to every record made."""
+    kept = []
+    original_put, queue.put = queue.put, kept.append
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    try:
+        run_stages(stages, lines, BenchResult("", [name for name, *_ in stages]))
+        used = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+        queue.put = original_put
+    gc.collect()
+    blocks = sys.getallocatedblocks() - blocks
+    return (blocks / len(kept), used / len(kept)) if kept else (0.0, 0.0)
+
+
+def read_capture(path: PosixPath) -> list[bytes]:
+    """Read the raw lines of a capture file, keeping the line endings."""
+    return [line for line in PosixPath(path).read_bytes().splitlines(keepends=True) if line]
+
+
+def bench_plugin(plugin_class: Type[BasePlugin], lines: Iterable[bytes], repeat: int = 1, **overrides) -> BenchResult:
+    """
+    Benchmark the plugin against the given raw lines.
+
+    :param plugin_class: The plugin to benchmark.
+    :param lines: The raw lines as read from the phone system.
+    :param repeat: Number of times to run through the lines.
+    :param overrides: Plugin settings.
+    """
+    lines = list(lines)
+    queue = NullQueue()
+    plugin = make_plugin(plugin_class, queue, **overrides)
+    stages = plugin_stages(plugin)
+    result = BenchResult(plugin_class.__name__, [name for name, *_ in stages])
+
+    for _ in range(repeat):
+        run_stages(stages, lines, result)
+
+    result.records = queue.count
+    result.blocks_per_record, result.bytes_per_record = measure_memory(stages, lines, queue)
+    return result
@@ -0,0 +1,155 @@
+"""
+Serial capture
+--------------
+Keep a copy of the raw bytes read from the serial ports, so parse bugs can be reproduced exactly.
+
+Every chunk read from a port is written with its monotonic timestamp to gzip compressed segments
+in the 'capture' directory of the datastore. Segments are rotated once they hold ``capture_segment_size``
+bytes and the oldest segments are removed to keep the whole archive within ``capture_size`` bytes.
+
+An archive can be fed back through a plugin with ``calllogger-replay``, at the original speed or faster.
+"""
+
+# Standard lib
+from typing import BinaryIO, Iterable, Iterator, Optional
+from pathlib import PosixPath
+import logging
+import struct
+import time
+import gzip
+import zlib
+import re
+
+# Local
+from calllogger import settings, closeers
+
+__all__ = ["CaptureWriter", "read_frames", "capture_dir", "port_name"]
+logger = logging.getLogger(__name__)
+
+magic = b"CLCAP1\n"
+# Monotonic timestamp and length of each chunk
+frame_header = struct.Struct("<dI")
+# Segments that are being written to, never removed by the size limit
+_open_segments: set[PosixPath] = set()
+
+
+def capture_dir() -> PosixPath:
+    return settings.datastore.joinpath("capture")
+
+
+def port_name(name: str) -> str:
+    """The name of a port as used in the segment file names."""
+    return re.sub(r"[^\w.-]+", "_", name).strip("_") or "serial"
+
+
+def segment_port(path: PosixPath) -> str:
+    """The name of the port a segment was captured from."""
+    return path.name[:-len(".cap.gz")].rpartition("-")[0]
+
+
+class CaptureWriter:
+    """
+    Write raw serial chunks to rotating gzip segments.
+
+    :param name: Name of the port, used in the segment file names.
+    :param directory: Where to keep the segments, defaults to 'capture' in the datastore.
+    """
+
+    def __init__(self, name: str, directory: Optional[PosixPath] = None):
+        self.name = port_name(name)
+        self.directory = directory or capture_dir()
+        self._stream: Optional[BinaryIO] = None
+        self._path: Optional[PosixPath] = None
+        self._written = 0
+        self._flushed = 0.0
+
+    def write(self, data: bytes):
+        """Write a chunk of raw data, errors are logged and never stop the serial reader."""
+        if not data:
+            return
+        try:
+            if self._stream is None or self._written >= settings.capture_segment_size:
+                self.rotate()
+
+            now = time.monotonic()
+            self._stream.write(frame_header.pack(now, len(data)))
+            self._stream.write(data)
+            self._written += frame_header.size + len(data)
+
+            # A sync flush lets the segment be read up to this point even if the process dies
+            if now - self._flushed >= 1.0:
+                self._stream.flush(zlib.Z_SYNC_FLUSH)
+                self._flushed = now
+        except (OSError, ValueError) as err:
+            logger.warning("Failed to write serial capture: %s", err, extra={"port": self.name})
+            self.close()
+
+    def rotate(self):
+        """Start a new segment and remove the oldest segments that are over the size limit."""
+        self.close()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._path = self.directory.joinpath(f"{self.name}-{time.time_ns()}.cap.gz")
+        self._stream = gzip.open(self._path, "wb")
+        self._stream.write(magic)
+        self._written = 0
+        _open_segments.add(self._path)
+        # Flush what's left on shutdown, only while a segment is open so closed writers are not kept around
+        closeers.append(self.close)
+        enforce_size(self.directory)
+
+    def close(self):
+        if self._stream is not None:
+            try:
+                self._stream.close()
+            except OSError:  # pragma: no cover
+                pass
+            _open_segments.discard(self._path)
+            self._stream = self._path = None
+            if self.close in closeers:
+                closeers.remove(self.close)
+
+
+def segments(directory: PosixPath, name: str = "*") -> list[PosixPath]:
+    """The capture segments in the directory, oldest first."""
+    def created(path: PosixPath) -> int:
+        return int(path.name[:-len(".cap.gz")].rpartition("-")[2] or 0)
+    paths = directory.glob(f"{name}-*.cap.gz")
+    if name != "*":
+        # A port named like 'ttyUSB' would also match the segments of 'ttyUSB-0'
+        paths = [path for path in paths if segment_port(path) == name]
+    return sorted(paths, key=created)
+
+
+def enforce_size(directory: PosixPath):
+    """Remove the oldest closed segments until the archive fits within the capture size."""
+    paths = segments(directory)
+    total = sum(path.stat().st_size for path in paths)
+    for path in paths:
+        if total <= settings.capture_size:
+            break
+        elif path not in _open_segments:
+            total -= path.stat().st_size
+            path.unlink(missing_ok=True)
+
+
+def read_frames(paths: Iterable[PosixPath]) -> Iterator[tuple[float, bytes]]:
+    """
+    Yield the ``(timestamp, chunk)`` frames from the capture segments in order.
+    A segment cut short, like the one being written when the process died, is read up to the cut.
+    """
+    for path in paths:
+        with gzip.open(path, "rb") as stream:
+            try:
+                if stream.read(len(magic)) != magic:
+                    logger.warning("Not a capture segment: %s", path)
+                    continue
+                while header := stream.read(frame_header.size):
+                    if len(header) < frame_header.size:
+                        break
+                    timestamp, length = frame_header.unpack(header)
+                    chunk = stream.read(length)
+                    if len(chunk) < length:
+                        break
+                    yield timestamp, chunk
+            except (EOFError, zlib.error, gzip.BadGzipFile):
+                logger.warning("Capture segment cut short: %s", path)
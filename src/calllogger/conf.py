@@ -5,6 +5,7 @@ from typing import Union
 import binascii
 import logging
 import base64
+import json
 import sys
 import os
 
@@ -29,6 +30,16 @@ def b64(value: str) -> str:
     return value
 
 
+def json_value(value: Union[str, dict, list]) -> Union[dict, list]:
+    """Decode a JSON encoded environment variable, values from the server are already decoded."""
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def serial_port(value: Union[str, PosixPath]) -> Union[str, PosixPath]:
+    """A serial device path, or a network port URL like ``socket://host:port`` or ``rfc2217://host:port``."""
+    return value if isinstance(value, str) and "://" in value else PosixPath(value)
+
+
 def merge_settings(ins, prefix="", **defaults):
     """
     Populate class defined settings from environment variables.
@@ -86,6 +97,10 @@ class Settings:
     timeout_decay: float = 1.5
     #: The max value the timeout can be after continuous decay.
     max_timeout: int = 300
+    #: The number of times a failed thread can be restarted within the restart window before quitting.
+    max_restarts: int = 5
+    #: The window in seconds that thread restarts are counted over.
+    restart_window: int = 600
     #: Time between server checkins in minutes
     checkin_interval: int = 5
     #: Size of the call queue
@@ -107,6 +122,44 @@ class Settings:
     collect_logs: bool = True
     #: Collect metrics and send to remote server
     collect_metrics: bool = True
+    #: Seconds between each point of the serial link stats, 0 disables them
+    serial_stats_interval: int = 60
+    #: Comma separated list of record middleware to run on every record, in order
+    middleware: str = ""
+    #: Extension names used by the 'enrich' middleware, mapping of extension to name
+    ext_names: json_value = {}
+    #: Contact names used by the 'enrich' middleware, mapping of number to name
+    contact_names: json_value = {}
+    #: Country code of the phone system used by the 'e164' middleware, e.g. '353'
+    country_code: str = ""
+    #: Prefix dialled before national numbers
+    trunk_prefix: str = "0"
+    #: Prefix dialled before international numbers
+    international_prefix: str = "00"
+    #: Comma separated digits dialled to get an outside line, e.g. '9'
+    outside_line: str = ""
+    #: Path to the phonebook CSV used by the 'phonebook' middleware, defaults to 'phonebook.csv' in the datastore
+    phonebook_file: str = ""
+    #: Download the phonebook from the server at every checkin
+    phonebook_sync: bool = False
+    #: Comma separated list of call types dropped by the 'filter' middleware
+    drop_call_types: str = ""
+    #: Number of trailing digits masked by the 'redact' middleware
+    redact_digits: int = 4
+    #: Max size in bytes of the dead-letter file for lines that fail to process, 0 disables it
+    dead_letter_size: int = 1_000_000
+    #: Number of rotated dead-letter files to keep
+    dead_letter_files: int = 3
+    #: Max total size in bytes of the raw serial capture archive, 0 disables capturing
+    capture_size: int = 0
+    #: Bytes of raw serial data in each capture segment before it's rotated
+    capture_segment_size: int = 1_000_000
+    #: Seconds without an incoming record before a ringing call is forgotten
+    live_call_timeout: int = 300
+    #: Only send the record that ends the ringing of a call, not every incoming hop
+    live_calls_summary: bool = False
+    #: Edge filtering rules, records matching any rule are dropped. See :mod:`calllogger.rules`
+    filter_rules: json_value = []
 
     # The domain to send the call logs to, used in development.
     domain: str = "https://quartx.ie"
@@ -116,6 +169,8 @@ class Settings:
     dockerized: bool = False
     # The plugin that will be used
     plugin: str = ""
+    # Path to the tenants file used in hosted mode, defaults to 'tenants.json' in the datastore
+    tenants_file: str = ""
 
     # Base64 encoded Environment variables
     sentry_dsn: b64 = ""
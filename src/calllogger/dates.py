@@ -0,0 +1,150 @@
+"""
+Dates
+-----
+Parse the fixed-width dates printed by phone systems without ``strptime``.
+
+A format made only of two digit fields (and ``%Y``) and single character separators, like ``%d.%m.%y%X``
+or ``%y/%m/%d-%H:%M:%S``, is compiled into a parser that slices out each field and converts it with ``int``.
+The date portion is cached, as consecutive records are nearly always from the same day.
+
+Anything the fast path does not expect, like a single digit day or a different separator, is handed to
+``strptime``, so the results and errors are always the same as ``datetime.strptime``.
+"""
+
+# Standard lib
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from typing import Callable, Optional
+import time
+import re
+
+__all__ = ["compile_date_parser", "date_parser", "parse_date"]
+
+# Field and width of each supported directive
+directives = {
+    "d": ("day", 2), "m": ("month", 2), "y": ("year", 2), "Y": ("year", 4),
+    "H": ("hour", 2), "M": ("minute", 2), "S": ("second", 2),
+}
+
+
+def _locale_time() -> str:
+    """The time format of '%X' in the current locale, the fast path only knows the 24 hour format."""
+    return time.strftime("%X", (2000, 1, 1, 13, 14, 15, 5, 1, -1))
+
+
+def _century(year: int) -> int:
+    """Same as strptime, two digit years 69-99 are in the 1900s and 00-68 are in the 2000s."""
+    return year + (1900 if year >= 69 else 2000)
+
+
+def _check_day(year: int, month: int, day: int) -> tuple[int, int, int]:
+    # Raises the same ValueError as strptime for a day that does not exist
+    date(year, month, day)
+    return year, month, day
+
+
+def _positions(fmt: str) -> Optional[tuple[dict[str, tuple[int, int]], list[tuple[int, str]], int]]:
+    """
+    Work out where each field is in a date of the given format.
+    Return the start and end of each field, the position of each separator and the width,
+    or None if the format is not fixed-width.
+    """
+    tokens = re.findall(r"%.|[^%]", fmt)
+    if "".join(tokens) != fmt:
+        return None
+
+    fields, separators, position = {}, [], 0
+    for token in tokens:
+        if token == "%X" and _locale_time() == "13:14:15":
+            parts = ["%H", ":", "%M", ":", "%S"]
+        else:
+            parts = [token]
+
+        for part in parts:
+            if part == "%%":
+                part = "%"
+            elif part.startswith("%"):
+                name, width = directives.get(part[1], (None, 0))
+                if name is None or name in fields:
+                    return None
+                fields[name] = (position, position + width)
+                position += width
+                continue
+
+            # Whitespace matches any amount of whitespace in strptime, so is not fixed-width
+            if part.isspace():
+                return None
+            separators.append((position, part))
+            position += 1
+
+    if not {"year", "month", "day"} <= fields.keys():
+        return None
+    return fields, separators, position
+
+
+def compile_date_parser(fmt: str, tz: Optional[timezone] = None) -> Callable[[str], datetime]:
+    """
+    Compile a parser for dates of the given format, the same as
+    ``datetime.strptime(value, fmt).replace(tzinfo=tz)`` but quicker for fixed-width formats.
+
+    :param fmt: The strptime format of the dates.
+    :param tz: The timezone of the dates, None for naive dates.
+    """
+    def fallback(value: str) -> datetime:
+        return datetime.strptime(value, fmt).replace(tzinfo=tz)
+
+    if (positions := _positions(fmt)) is None:
+        return fallback
+    fields, separators, width = positions
+
+    # Checks that the value has the expected shape, anything else is left to strptime
+    spans = sorted(fields.values())
+    digits = " + ".join(f"value[{start}:{end}]" for start, end in spans)
+    checks = [f"len(value) != {width}", "not value.isascii()", f"not ({digits}).isdigit()"]
+    checks.extend(f"value[{index}] != {char!r}" for index, char in separators)
+
+    # The date portion is the key of the cache, so it's converted once per day
+    day_start = min(fields[name][0] for name in ("year", "month", "day"))
+    day_end = max(fields[name][1] for name in ("year", "month", "day"))
+
+    def field(name: str, source: str = "value", offset: int = 0) -> str:
+        start, end = fields[name]
+        return f"int({source}[{start - offset}:{end - offset}])"
+
+    year = field("year", "key", day_start)
+    if fields["year"][1] - fields["year"][0] == 2:
+        year = f"_century({year})"
+    times = ", ".join(field(name) if name in fields else "0" for name in ("hour", "minute", "second"))
+
+    source = [
+        "@_cache",
+        "def day(key):",
+        f"    return _check_day({year}, {field('month', 'key', day_start)}, {field('day', 'key', day_start)})",
+        "def parse(value):",
+        f"    if {' or '.join(checks)}:",
+        "        return _fallback(value)",
+        f"    return _datetime(*day(value[{day_start}:{day_end}]), {times}, 0, _tz)",
+    ]
+    namespace = {
+        "_cache": lru_cache(maxsize=32), "_check_day": _check_day, "_century": _century,
+        "_fallback": fallback, "_datetime": datetime, "_tz": tz,
+    }
+    exec(compile("\n".join(source), f"<date {fmt}>", "exec"), namespace)
+    return namespace["parse"]
+
+
+@lru_cache(maxsize=64)
+def date_parser(fmt: str, tz: Optional[timezone] = None) -> Callable[[str], datetime]:
+    """The compiled parser of a format, shared by everything that parses that format."""
+    return compile_date_parser(fmt, tz)
+
+
+def parse_date(value: str, fmt: str, tz: Optional[timezone] = None) -> datetime:
+    """
+    Parse a date, the same as ``datetime.strptime(value, fmt).replace(tzinfo=tz)``.
+
+    :param value: The date string.
+    :param fmt: The strptime format of the date.
+    :param tz: The timezone of the date, None for a naive date.
+    """
+    return date_parser(fmt, tz)(value)
@@ -0,0 +1,200 @@
+"""
+Dead letters
+------------
+Raw lines that fail to decode, validate or parse are kept in a dead-letter file in the datastore,
+together with the plugin, the failing stage and the error. After a parser fix they can be
+run through the plugin again with ``calllogger-reprocess``.
+
+The file is a JSON line per dead letter and is rotated like a log file, so it never grows
+past ``dead_letter_size`` bytes times ``dead_letter_files`` + 1.
+
+A reprocess run claims the letters by moving the files aside, so the running logger keeps
+adding to a fresh file without either process losing letters.
+"""
+
+# Standard lib
+from datetime import datetime, timezone
+from typing import Iterator, NamedTuple, Optional
+from contextlib import contextmanager
+from pathlib import PosixPath
+import threading
+import logging
+import fcntl
+import json
+
+# Local
+from calllogger import settings
+
+__all__ = ["DeadLetter", "DeadLetterStore", "dead_letters"]
+logger = logging.getLogger(__name__)
+
+
+class DeadLetter(NamedTuple):
+    """A raw line that failed to process."""
+    time: str
+    plugin: str
+    stage: str
+    error: str
+    raw: bytes
+
+
+class DeadLetterStore:
+    """
+    Bounded and rotating store of dead letters.
+    The store is locked with a lock file, so the running logger and a reprocess run can share it.
+
+    :param path: The dead-letter file, defaults to 'deadletters.jsonl' in the datastore.
+    """
+
+    def __init__(self, path: Optional[PosixPath] = None):
+        self._path = path
+        self._lock = threading.Lock()
+        # Dead letters added by this process while the store is claimed, only stored once the claim finishes
+        self._held: Optional[list[str]] = None
+
+    @property
+    def path(self) -> PosixPath:
+        return self._path or settings.datastore.joinpath("deadletters.jsonl")
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Lock the store against the other threads of this process and against other processes."""
+        path = self.path
+        with self._lock, path.with_name(f"{path.name}.lock").open("a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def files(self) -> list[PosixPath]:
+        """The dead-letter files that exist, oldest first."""
+        path = self.path
+        paths = [path.with_name(f"{path.name}.{index}") for index in range(settings.dead_letter_files, 0, -1)]
+        return [path for path in paths + [path] if path.exists()]
+
+    def _claimed(self) -> list[PosixPath]:
+        """The files moved aside by a claim, oldest first."""
+        path = self.path
+        return sorted(path.parent.glob(f"{path.name}.claimed.*"), key=lambda claimed: int(claimed.suffix[1:]))
+
+    def add(self, raw: bytes, stage: str, error: Exception, plugin: str = ""):
+        """Append a failed raw line to the store, rotating the file if full."""
+        if not settings.dead_letter_size:
+            return
+
+        entry = json.dumps({
+            "time": datetime.now(timezone.utc).isoformat(),
+            "plugin": plugin,
+            "stage": stage,
+            "error": f"{error.__class__.__name__}: {error}",
+            # Latin-1 maps every byte to a character, so the raw line survives the round trip
+            "raw": raw.decode("latin-1"),
+        }) + "\n"
+
+        try:
+            with self._locked():
+                if self._held is not None:
+                    self._held.append(entry)
+                else:
+                    self._write(entry)
+        except OSError as err:
+            logger.warning("Failed to store dead letter: %s", err, extra={"stage": stage})
+
+    def _write(self, entry: str):
+        path = self.path
+        if path.exists() and path.stat().st_size + len(entry) > settings.dead_letter_size:
+            self._rotate(path)
+        with path.open("a", encoding="utf8") as stream:
+            stream.write(entry)
+
+    @staticmethod
+    def _rotate(path: PosixPath):
+        """Shift each file down one place, dropping the oldest."""
+        for index in range(settings.dead_letter_files, 0, -1):
+            source = path.with_name(f"{path.name}.{index - 1}") if index > 1 else path
+            if source.exists():
+                source.replace(path.with_name(f"{path.name}.{index}"))
+        path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _load(path: PosixPath) -> list[DeadLetter]:
+        letters = []
+        for line in path.read_text(encoding="utf8").splitlines():
+            try:
+                entry = json.loads(line)
+                entry["raw"] = entry["raw"].encode("latin-1")
+                letters.append(DeadLetter(**entry))
+            except (ValueError, TypeError, KeyError):
+                logger.warning("Skipping corrupt dead letter", extra={"path": str(path)})
+        return letters
+
+    def read(self) -> list[DeadLetter]:
+        """Return all the stored dead letters, oldest first."""
+        with self._locked():
+            return [letter for path in self.files() for letter in self._load(path)]
+
+    def _move_aside(self, claimed: list[PosixPath]) -> list[PosixPath]:
+        """Rename the files of the store after the claimed files, so new letters start a fresh file."""
+        path = self.path
+        start = int(claimed[-1].suffix[1:]) + 1 if claimed else 0
+        for index, old in enumerate(self.files(), start):
+            claimed.append(old.replace(path.with_name(f"{path.name}.claimed.{index}")))
+        return claimed
+
+    @contextmanager
+    def claim(self) -> Iterator[list[DeadLetter]]:
+        """
+        Move the stored dead letters aside and yield them. The letters added meanwhile by other processes,
+        e.g. the running logger, go to a fresh file and are left in the store. The letters added by this
+        process within the block are held back and stored once it finishes.
+
+        If the block fails, the claimed letters are put back in front of the new ones, otherwise they are
+        removed. Files left behind by a claim that was killed are claimed again by the next one.
+        """
+        path = self.path
+        # Only one claim at a time, a second would take the files left behind by the first
+        with path.with_name(f"{path.name}.claim.lock").open("a") as claim_lock:
+            try:
+                fcntl.flock(claim_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise RuntimeError("The dead letters are being reprocessed by another process") from None
+
+            with self._locked():
+                claimed = self._move_aside(self._claimed())
+                self._held = []
+
+            try:
+                yield [letter for old in claimed for letter in self._load(old)]
+            except BaseException:
+                with self._locked():
+                    self._held = None
+                    self._restore(self._move_aside(claimed))
+                raise
+
+            with self._locked():
+                held, self._held = self._held, None
+                for old in claimed:
+                    old.unlink()
+                for entry in held:
+                    self._write(entry)
+
+    def _restore(self, claimed: list[PosixPath]):
+        """Put the claimed files back as the store, dropping the oldest past the limit like a rotation."""
+        path = self.path
+        keep = settings.dead_letter_files + 1
+        for old in claimed[:-keep]:
+            old.unlink()
+        for index, old in enumerate(reversed(claimed[-keep:])):
+            old.replace(path.with_name(f"{path.name}.{index}") if index else path)
+
+    def clear(self):
+        """Remove all the dead-letter files."""
+        with self._locked():
+            for path in self.files():
+                path.unlink(missing_ok=True)
+
+    def __len__(self):
+        with self._locked():
+            return sum(len(path.read_text(encoding="utf8").splitlines()) for path in self.files())
+
+
+# Shared by all plugins
+dead_letters = DeadLetterStore()
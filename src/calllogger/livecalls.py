@@ -0,0 +1,136 @@
+"""
+Live calls
+----------
+In memory table of calls that are ringing right now, built from the records pushed by the plugins.
+
+An INCOMING record starts or refreshes a call, keyed on the plugin instance, line and number.
+The call is removed once the record that ends the ringing comes in, e.g. RECEIVED or OUTGOING,
+or once it has not been seen for ``live_call_timeout`` seconds.
+"""
+
+# Standard lib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+import threading
+import time
+
+# Local
+from calllogger.record import CallDataRecord as Record
+from calllogger import settings, telemetry
+
+__all__ = ["LiveCall", "LiveCallTable", "live_calls"]
+
+# Records that end the ringing of a call
+ending_types = frozenset((
+    Record.RECEIVED,
+    Record.OUTGOING,
+    Record.RECEIVED_FORWARDED,
+    Record.OUTGOING_FORWARDED,
+    Record.OUTGOING_VIA_FORWARDED,
+    Record.RECEIVED_TRANSFERRED_INT,
+    Record.OUTGOING_TRANSFERRED_INT,
+    Record.RECEIVED_TRANSFERRED_EXT,
+    Record.OUTGOING_TRANSFERRED_EXT,
+))
+
+
+class LiveCall:
+    """A call that is currently ringing."""
+    __slots__ = ("source", "line", "number", "exts", "date", "started", "last_seen")
+
+    def __init__(self, source, line, number, date: Optional[datetime], now: float):
+        self.source = source
+        self.line = line
+        self.number = number
+        self.exts = []
+        self.date = date
+        self.started = now
+        self.last_seen = now
+
+    def as_dict(self, now: float) -> dict:
+        return dict(
+            source=self.source,
+            line=self.line,
+            number=self.number,
+            exts=list(self.exts),
+            date=self.date,
+            ringing=int(now - self.started),
+        )
+
+
+class LiveCallTable:
+    """
+    Track the ringing calls. Each record is processed in constant time.
+
+    :param timeout: Seconds without an INCOMING record before a call is forgotten. Defaults to the settings.
+    """
+
+    def __init__(self, timeout: float = None):
+        self.timeout = timeout
+        self._calls: OrderedDict[tuple, LiveCall] = OrderedDict()
+        self._lock = threading.Lock()
+        self._gauge = telemetry.live_calls_gauge()
+
+    def track(self, record: Record) -> bool:
+        """
+        Update the table with the given record.
+
+        :returns: False if the record should not be sent to the server, True otherwise.
+        """
+        fields = record.__dict__
+        try:
+            call_type = int(fields["call_type"])
+        except (KeyError, TypeError, ValueError):
+            return True
+
+        if call_type != Record.INCOMING and call_type not in ending_types:
+            return True
+
+        key = (fields.get("source"), fields.get("line"), fields.get("number"))
+        now = time.monotonic()
+        with self._lock:
+            count = len(self._calls)
+            self._expire(now)
+
+            if call_type == Record.INCOMING:
+                if (call := self._calls.get(key)) is None:
+                    call = self._calls[key] = LiveCall(*key, fields.get("date"), now)
+                else:
+                    self._calls.move_to_end(key)
+                call.last_seen = now
+                if (ext := fields.get("ext")) is not None and ext not in call.exts:
+                    call.exts.append(ext)
+
+            # Calculate the ring time at the edge if the phone system did not give us one
+            elif (call := self._calls.pop(key, None)) and not fields.get("ring"):
+                fields["ring"] = int(now - call.started)
+
+            if len(self._calls) != count:
+                self._gauge.set(len(self._calls))
+
+        # In summary mode the server only gets the record that ends the ringing
+        return not (call_type == Record.INCOMING and settings.live_calls_summary)
+
+    def _expire(self, now: float):
+        """Remove calls that have not been seen within the timeout, oldest calls are always first."""
+        timeout = settings.live_call_timeout if self.timeout is None else self.timeout
+        while self._calls:
+            call = next(iter(self._calls.values()))
+            if now - call.last_seen <= timeout:
+                break
+            self._calls.popitem(last=False)
+
+    def snapshot(self) -> list[dict]:
+        """Return the calls that are ringing right now."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            return [call.as_dict(now) for call in self._calls.values()]
+
+    def __len__(self):
+        return len(self._calls)
+
+
+# Shared by all plugins
+live_calls = LiveCallTable()
@@ -0,0 +1,182 @@
+"""
+Record middleware
+-----------------
+Transforms that run on every call record before it gets queued.
+
+Each middleware is registered as a factory that gets called once with the settings object
+and returns a function that takes a record and returns the record, or None to drop it.
+The configured middleware are then compiled into a single function, so pushing a record
+costs one call per stage and nothing else.
+"""
+
+# Standard lib
+from typing import Callable, Iterable, Optional, Union
+import logging
+
+# Local
+from calllogger.record import CallDataRecord
+from calllogger import settings as _settings
+from calllogger.phonebook import directory
+from calllogger.numbers import compile_normaliser
+
+__all__ = ["Middleware", "register", "build_chain", "installed"]
+logger = logging.getLogger(__name__)
+
+Middleware = Callable[[CallDataRecord], Optional[CallDataRecord]]
+installed: dict[str, Callable[..., Middleware]] = {}
+
+
+def register(name: str):
+    """Decorator to register a middleware factory under the given name."""
+    def decorator(factory: Callable[..., Middleware]):
+        installed[name.lower()] = factory
+        return factory
+    return decorator
+
+
+def passthrough(record: CallDataRecord) -> CallDataRecord:
+    """The chain used when no middleware is configured."""
+    return record
+
+
+def build_chain(names: Union[str, Iterable[str]], settings=_settings) -> Middleware:
+    """
+    Compile the named middleware into one callable.
+
+    :param names: Comma separated string or list of middleware names, in the order they will run.
+    :param settings: The settings object passed to each middleware factory.
+    :returns: A function that takes a record and returns the transformed record, or None if dropped.
+    """
+    if isinstance(names, str):
+        names = names.split(",")
+
+    stages = []
+    for name in filter(None, (name.strip().lower() for name in names)):
+        if factory := installed.get(name):
+            stages.append(factory(settings))
+        else:
+            logger.warning("Unknown record middleware: %s", name, extra={"middleware": name})
+
+    if not stages:
+        return passthrough
+    elif len(stages) == 1:
+        return stages[0]
+
+    # Generate a flat function that calls each stage in turn, bailing out as
+    # soon as a stage drops the record. This avoids looping over the stages for every record.
+    source = ["def chain(record):"]
+    for index in range(len(stages) - 1):
+        source.append(f"    record = _stage{index}(record)")
+        source.append("    if record is None:")
+        source.append("        return None")
+    source.append(f"    return _stage{len(stages) - 1}(record)")
+
+    namespace = {f"_stage{index}": stage for index, stage in enumerate(stages)}
+    exec(compile("\n".join(source), "<middleware-chain>", "exec"), namespace)
+    return namespace["chain"]
+
+
+def to_seconds(value: Union[str, int]) -> Union[str, int]:
+    """Convert a duration in the format of 'HH:MM:SS', 'MM:SS' or 'SS' to seconds."""
+    if isinstance(value, int):
+        return value
+    elif not value:
+        return 0
+
+    seconds = 0
+    for part in value.split(":"):
+        if not part.isdigit():
+            return value
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+@register("normalise")
+def normalise(_):
+    """Convert line & ext to integers and ring & duration to seconds."""
+    def middleware(record: CallDataRecord) -> CallDataRecord:
+        fields = record.__dict__
+        for key in ("line", "ext"):
+            value = fields.get(key)
+            if isinstance(value, str) and value.isdigit():
+                fields[key] = int(value)
+        for key in ("ring", "duration"):
+            if key in fields:
+                fields[key] = to_seconds(fields[key])
+        return record
+    return middleware
+
+
+@register("enrich")
+def enrich(settings):
+    """Add the extension & contact names from the settings."""
+    ext_names = {str(key): val for key, val in settings.ext_names.items()}
+    contact_names = {str(key): val for key, val in settings.contact_names.items()}
+
+    def middleware(record: CallDataRecord) -> CallDataRecord:
+        fields = record.__dict__
+        if "ext_name" not in fields and (name := ext_names.get(str(fields.get("ext")))):
+            fields["ext_name"] = name
+        if "contact_name" not in fields and (name := contact_names.get(fields.get("number"))):
+            fields["contact_name"] = name
+        return record
+    return middleware
+
+
+@register("e164")
+def e164(settings):
+    """Convert the phone number to the E.164 format using the dialling rules from the settings."""
+    normalise_number = compile_normaliser(
+        settings.country_code,
+        settings.trunk_prefix,
+        settings.international_prefix,
+        settings.outside_line,
+    )
+
+    def middleware(record: CallDataRecord) -> CallDataRecord:
+        fields = record.__dict__
+        if number := fields.get("number"):
+            fields["number"] = normalise_number(number)
+        return record
+    return middleware
+
+
+@register("phonebook")
+def phonebook(_):
+    """Add the contact & extension names from the phonebook, see :mod:`calllogger.phonebook`."""
+    lookup = directory.lookup
+
+    def middleware(record: CallDataRecord) -> CallDataRecord:
+        fields = record.__dict__
+        if "contact_name" not in fields and (contact := lookup(fields.get("number"))):
+            fields["contact_name"], email = contact
+            if email and "contact_email" not in fields:
+                fields["contact_email"] = email
+        if "ext_name" not in fields and (contact := lookup(fields.get("ext"), prefixes=False)):
+            fields["ext_name"] = contact[0]
+        return record
+    return middleware
+
+
+@register("filter")
+def filter_call_types(settings):
+    """Drop records with any of the call types listed in the settings."""
+    dropped = frozenset(int(call_type) for call_type in settings.drop_call_types.split(",") if call_type.strip())
+
+    def middleware(record: CallDataRecord) -> Optional[CallDataRecord]:
+        return None if int(record.call_type) in dropped else record
+    return middleware
+
+
+@register("redact")
+def redact(settings):
+    """Mask the trailing digits of the phone number and remove the raw record."""
+    digits = settings.redact_digits
+
+    def middleware(record: CallDataRecord) -> CallDataRecord:
+        fields = record.__dict__
+        fields.pop("raw", None)
+        if digits and (number := fields.get("number")):
+            fields["number"] = number[:-digits] + "X" * min(digits, len(number))
+        return record
+    return middleware
@@ -1,14 +1,17 @@
 # Standard Lib
+from collections import deque
+from typing import Callable
 import logging
 import threading
 import functools
 import signal
+import time
 
 # Third Party
 from sentry_sdk import push_scope, capture_exception
 
 # Local
-from calllogger import closeers, stopped
+from calllogger import closeers, stopped, settings, telemetry
 
 logger = logging.getLogger("calllogger")
 
@@ -57,7 +60,11 @@ class ThreadExceptionManager(threading.Thread):
     """
     Same as a normal threading.Thread but with
     Exception handling for the run method.
+
+    Unhandled exceptions will stop the program, unless the thread
+    was started by a :class:`Supervisor` which will restart it instead.
     """
+    supervisor: "Supervisor" = None
 
     def run(self) -> bool:
         try:
@@ -65,7 +72,10 @@ class ThreadExceptionManager(threading.Thread):
         except Exception as err:
             capture_exception(err)
             logger.warning(err)
-            stopped.set(1)
+            if self.supervisor is None:
+                stopped.set(1)
+            else:
+                self.supervisor.failed(self)
             return False
         except SystemExit as err:
             stopped.set(err.code)
@@ -78,6 +88,67 @@ class ThreadExceptionManager(threading.Thread):
         raise NotImplementedError
 
 
+class Supervisor:
+    """
+    Start threads and restart them in place when they fail with an unhandled exception.
+
+    Restarts are delayed with the same backoff as the timeout settings. If a thread
+    fails more than ``max_restarts`` times within ``restart_window`` seconds then the
+    program is stopped with an exit code of 1, so that docker can restart it.
+
+    :param max_restarts: The number of restarts allowed within the window. Defaults to the settings.
+    :param window: The window in seconds that restarts are counted over. Defaults to the settings.
+    """
+
+    def __init__(self, max_restarts: int = None, window: float = None):
+        self.max_restarts = settings.max_restarts if max_restarts is None else max_restarts
+        self.window = settings.restart_window if window is None else window
+        self._factories: dict[str, Callable[[], ThreadExceptionManager]] = {}
+        self._failures: dict[str, deque] = {}
+
+    def start(self, factory: Callable[[], ThreadExceptionManager]) -> ThreadExceptionManager:
+        """Create a thread using the factory and start it. The factory is reused to restart the thread."""
+        thread = factory()
+        thread.supervisor = self
+        self._factories[thread.name] = factory
+        thread.start()
+        return thread
+
+    def failed(self, thread: ThreadExceptionManager):
+        """Called from within the failed thread, restarts it after a backoff or stops the program."""
+        name = thread.name
+        now = time.monotonic()
+        failures = self._failures.setdefault(name, deque())
+        failures.append(now)
+        while now - failures[0] > self.window:
+            failures.popleft()
+
+        if len(failures) > self.max_restarts:
+            logger.warning(
+                "Thread failed too many times, quitting", extra={"thread_name": name, "failures": len(failures)}
+            )
+            stopped.set(1)
+            return
+
+        delay = min(settings.max_timeout, settings.timeout * settings.timeout_decay ** (len(failures) - 1))
+        logger.info("Restarting failed thread in %.1f seconds", delay, extra={"thread_name": name})
+        telemetry.thread_restarts(tags=dict(thread=name)).inc()
+        if stopped.wait(delay):
+            return
+
+        # The factory runs in the failed thread, so anything it raises would end that thread without a restart
+        try:
+            self.start(self._factories[name])
+        except Exception as err:
+            capture_exception(err)
+            logger.warning("Failed to restart thread, quitting", extra={"thread_name": name, "error": str(err)})
+            stopped.set(1)
+        except SystemExit as err:
+            # Config errors of a plugin quit while it's created, e.g. an invalid setting
+            logger.warning("Thread quit while restarting, quitting", extra={"thread_name": name, "code": err.code})
+            stopped.set(1)
+
+
 # noinspection PyBroadException
 def terminate(signum, *_) -> int:
     """This will allow the threads to gracefully shutdown."""
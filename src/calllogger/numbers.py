@@ -0,0 +1,64 @@
+"""
+Phone numbers
+-------------
+Normalise the dialled numbers printed by phone systems to the E.164 format, e.g. ``+353876153281``.
+
+The dialling rules (country code, trunk prefix, international prefix and outside line digits)
+are compiled once into a prefix table, so normalising a number is a translate and a few dict lookups.
+Numbers that can't be normalised, like extensions and withheld numbers, are returned as they are.
+"""
+
+# Standard lib
+from typing import Callable
+
+__all__ = ["compile_normaliser"]
+
+# Formatting characters that some phone systems print within numbers
+formatting = str.maketrans("", "", " -().\t/")
+# Fewer digits than this after a prefix is an extension or service number, not a phone number
+min_digits = 4
+
+
+def compile_normaliser(
+    country_code: str,
+    trunk_prefix: str = "0",
+    international_prefix: str = "00",
+    outside_line: str = "",
+) -> Callable[[str], str]:
+    """
+    Build a function that converts a number dialled under the given rules to E.164.
+
+    :param country_code: The country code of the phone system without the '+', e.g. '353'.
+    :param trunk_prefix: The prefix used to dial national numbers, e.g. '0'.
+    :param international_prefix: The prefix used to dial international numbers, e.g. '00'.
+    :param outside_line: Comma separated digits dialled to get an outside line, e.g. '9'.
+    """
+    country_code = country_code.strip().lstrip("+")
+    table = {"+": "+"}
+    if international_prefix:
+        table[international_prefix] = "+"
+    if trunk_prefix and country_code:
+        table[trunk_prefix] = f"+{country_code}"
+
+    # An outside line digit is only removed when followed by a national or international prefix,
+    # so extensions that start with the same digit are left alone.
+    for digits in filter(None, (digits.strip() for digits in outside_line.split(","))):
+        for prefix, replacement in list(table.items()):
+            if prefix != "+":
+                table[digits + prefix] = replacement
+
+    lengths = sorted({len(prefix) for prefix in table}, reverse=True)
+
+    def normalise(number: str) -> str:
+        if not number:
+            return number
+        stripped = number.translate(formatting)
+        for length in lengths:
+            if (replacement := table.get(stripped[:length])) is not None:
+                rest = stripped[length:]
+                if len(rest) >= min_digits and rest.isdigit() and rest.isascii():
+                    return replacement + rest
+                break
+        return number
+
+    return normalise
@@ -0,0 +1,190 @@
+"""
+Phonebook
+---------
+Local directory used to add contact and extension names to records.
+
+The phonebook is a CSV file of ``number,name,email`` rows. A number that ends with ``*``
+is a prefix that matches a whole number range, e.g. a company switchboard block.
+Exact numbers always win over prefixes and the longest matching prefix wins over shorter ones.
+
+Memory budget: 500k entries with unique names and emails, like ``Contact Name 123456`` and
+``contact.123456@example.com``, keep about 31 MB (64 bytes per entry) and loading them from the
+file peaks at about 71 MB. The tests load the file through :func:`load_phonebook` and check that
+this stays within 40 MB and 80 MB. A phonebook synced from the server is streamed to the file
+first, so it's loaded the same way.
+"""
+
+# Standard lib
+from typing import Iterable, NamedTuple, Optional, Union
+from bisect import bisect_left
+from pathlib import PosixPath
+from array import array
+import logging
+import csv
+
+# Local
+from calllogger import settings
+
+__all__ = ["Phonebook", "directory", "phonebook_path", "load_phonebook"]
+logger = logging.getLogger(__name__)
+
+Contact = tuple[str, Optional[str]]
+# Separates the name from the email of a contact in the contacts buffer
+separator = "\x1f"
+
+
+def encode_number(number: str) -> Optional[int]:
+    """
+    Pack a phone number into an int, so it fits in 8 bytes of an array.
+    A leading marker digit keeps any leading zeros and the international '+'.
+    Numbers over 18 digits, longer than any phone number, are not supported.
+    """
+    if number.startswith("+"):
+        digits, marker = number[1:], "2"
+    else:
+        digits, marker = number, "1"
+    return int(marker + digits) if len(digits) <= 18 and digits.isdigit() and digits.isascii() else None
+
+
+class Index(NamedTuple):
+    """Sorted numbers and the contact of each, in arrays so an entry costs 12 bytes and no python objects."""
+    keys: array
+    contacts: array
+
+    @classmethod
+    def build(cls, keys: array, contacts: array) -> "Index":
+        """Sort the entries by number, where a number is listed more than once the last one wins."""
+        index = cls(array("Q"), array("I"))
+        # The sort is stable, so of the same numbers, the last one in the file comes last
+        for position in sorted(range(len(keys)), key=keys.__getitem__):
+            if index.keys and index.keys[-1] == keys[position]:
+                index.contacts[-1] = contacts[position]
+            else:
+                index.keys.append(keys[position])
+                index.contacts.append(contacts[position])
+        return index
+
+    def find(self, key: int) -> Optional[int]:
+        position = bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            return self.contacts[position]
+        return None
+
+
+class Entries(NamedTuple):
+    exact: Index
+    #: Index of each prefix length, longest first
+    levels: list[tuple[int, Index]]
+    #: The UTF-8 'name\x1femail' of every contact back to back, and where each one starts
+    text: bytes
+    offsets: array
+
+
+class Phonebook:
+    """
+    Prefix index of phone numbers to contacts.
+
+    Entries are grouped in levels by prefix length, a lookup checks each level from the
+    longest to the shortest. This gives the same longest prefix match as a trie with one
+    binary search per level instead of one node per digit.
+
+    Numbers are kept in sorted arrays and the contacts as one UTF-8 buffer, so the phonebook
+    holds no python object per entry. Numbers of the same contact on consecutive rows share it.
+    """
+
+    def __init__(self, rows: Iterable[Iterable[str]] = ()):
+        self._entries = Entries(Index(array("Q"), array("I")), [], b"", array("I", [0]))
+        self.load(rows)
+
+    def load(self, rows: Iterable[Iterable[str]]):
+        """Replace the phonebook entries with the given ``(number, name, email)`` rows."""
+        exact = (array("Q"), array("I"))
+        levels: dict[int, tuple[array, array]] = {}
+        text, offsets = bytearray(), array("I", [0])
+        previous = None
+
+        for row in rows:
+            row = list(row)
+            if not row or not (number := row[0].strip()) or number.startswith("#"):
+                continue
+
+            if number.endswith("*"):
+                number = number[:-1]
+                entries = levels.setdefault(len(number), (array("Q"), array("I")))
+            else:
+                entries = exact
+            if (key := encode_number(number)) is None:
+                continue
+
+            name = row[1].strip() if len(row) > 1 else ""
+            email = row[2].strip() if len(row) > 2 else ""
+            if (name, email) != previous:
+                previous = (name, email)
+                text += f"{name}{separator}{email}".encode("utf8")
+                offsets.append(len(text))
+
+            entries[0].append(key)
+            entries[1].append(len(offsets) - 2)
+
+        entries = Entries(
+            Index.build(*exact),
+            sorted(((length, Index.build(*level)) for length, level in levels.items()), reverse=True),
+            bytes(text),
+            offsets,
+        )
+        # Swap in the new entries in one go so lookups from other threads never see a half loaded phonebook
+        self._entries = entries
+        exact_count = len(entries.exact.keys)
+        logger.debug("Phonebook loaded", extra={"exact": exact_count, "prefixes": len(self) - exact_count})
+
+    def lookup(self, number: Union[str, int, None], prefixes=True) -> Optional[Contact]:
+        """
+        Find the contact for the given number.
+
+        :param number: The phone number.
+        :param prefixes: Also match number ranges, disabled for extension lookups.
+        :returns: The ``(name, email)`` of the contact or None if not found.
+        """
+        if number is None:
+            return None
+        number = str(number)
+        if (key := encode_number(number)) is None:
+            return None
+
+        entries = self._entries
+        contact = entries.exact.find(key)
+        if contact is None and prefixes:
+            for length, level in entries.levels:
+                if length <= len(number) and (contact := level.find(encode_number(number[:length]))) is not None:
+                    break
+
+        if contact is None:
+            return None
+        data = entries.text[entries.offsets[contact]:entries.offsets[contact + 1]].decode("utf8")
+        name, _, email = data.partition(separator)
+        return name, email or None
+
+    def __len__(self):
+        entries = self._entries
+        return len(entries.exact.keys) + sum(len(level.keys) for _, level in entries.levels)
+
+
+def phonebook_path() -> PosixPath:
+    if settings.phonebook_file:
+        return PosixPath(settings.phonebook_file)
+    return settings.datastore.joinpath("phonebook.csv")
+
+
+def load_phonebook():
+    """Load the shared phonebook from the phonebook file if it exists."""
+    if not (path := phonebook_path()).exists():
+        return
+
+    # Read the file a row at a time, so it's never held in memory as a whole
+    with path.open("r", encoding="utf8", newline="") as stream:
+        directory.load(csv.reader(stream))
+    logger.info("Phonebook loaded with %d entries", len(directory))
+
+
+# Shared by all plugins
+directory = Phonebook()
@@ -1,6 +1,7 @@
 # Standard library
 from typing import Type, Union
 import logging
+import typing
 import sys
 
 # Local
@@ -11,8 +12,10 @@ from calllogger.plugins.serial import SerialPlugin
 from calllogger.plugins.internal.beronet import BeroNet
 from calllogger.plugins.internal.mockcalls import MockCalls
 from calllogger.plugins.internal.siemens_serial import SiemensHipathSerial
+from calllogger.plugins.internal.smdr import GenericSMDR
+from calllogger.plugins.internal.multiserial import MultiSerial
 
-__all__ = ["BasePlugin", "SerialPlugin", "get_plugin"]
+__all__ = ["BasePlugin", "SerialPlugin", "get_plugin", "get_plugins"]
 logger = logging.getLogger(__name__)
 installed = {}
 
@@ -22,7 +25,10 @@ def register_plugins(*plugins: Type[BasePlugin]):
     """Register internal plugins."""
     for plugin in plugins:
         name = plugin.__name__
-        installed[name.lower()] = installed[str(plugin.id)] = plugin
+        installed[name.lower()] = plugin
+        # Plugins without a phone system entry on the server can only be selected by name
+        if plugin.id is not None:
+            installed[str(plugin.id)] = plugin
         logger.debug("Plugin Registered: %s - %s", name, plugin.__doc__)
 
 
@@ -33,10 +39,40 @@ def get_plugin(selected_plugin: Union[str, int]):
     else:
         print("Specified plugin not found:", selected_plugin)
         print("Available plugins are:")
-        for plugin in installed.values():
-            print(f"--> {plugin.id} {plugin.__name__} - {plugin.__doc__}")
+        for plugin in dict.fromkeys(installed.values()):
+            print(f"--> {'-' if plugin.id is None else plugin.id} {plugin.__name__} - {plugin.__doc__}")
         sys.exit(0)
 
 
+def get_plugins(spec: str) -> list[tuple[Type[BasePlugin], dict]]:
+    """
+    Return the plugins selected by a plugin spec, with the settings for each instance.
+
+    The spec is a comma separated list of plugins. Each plugin can be followed by a colon and
+    the value for the plugin's main setting, e.g. ``siemenshipathserial:/dev/ttyUSB0,beronet:10.0.0.5``.
+    When more than one plugin is given, each instance is named after its part of the spec.
+    """
+    parts = [part.strip() for part in str(spec).split(",") if part.strip()] or [""]
+    selected = []
+
+    for part in parts:
+        name, _, value = part.partition(":")
+        plugin = get_plugin(name)
+        overrides = {}
+
+        if value:
+            if not plugin.spec_setting:
+                print(f"Plugin '{plugin.__name__}' does not accept a value in the plugin spec:", part)
+                sys.exit(0)
+            cast = typing.get_type_hints(plugin).get(plugin.spec_setting, str)
+            overrides[plugin.spec_setting] = cast(value)
+
+        if len(parts) > 1:
+            overrides["instance"] = part
+        selected.append((plugin, overrides))
+
+    return selected
+
+
 # Register Internal and External Plugins
-register_plugins(MockCalls, SiemensHipathSerial, BeroNet)
+register_plugins(MockCalls, SiemensHipathSerial, BeroNet, GenericSMDR, MultiSerial)
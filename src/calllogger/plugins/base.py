@@ -5,7 +5,9 @@ import logging
 import abc
 
 # Local
-from calllogger import stopped, settings, conf
+from calllogger import stopped, settings, conf, middleware
+from calllogger import rules
+from calllogger.livecalls import live_calls
 from calllogger.misc import ThreadExceptionManager
 from calllogger.record import CallDataRecord
 from calllogger.utils import Timeout
@@ -18,12 +20,12 @@ installed_plugins = {}
 class PluginSettings(abc.ABCMeta):
     """Metaclass to intercept the init call and apply the plugin settings."""
 
-    def __call__(cls, *args, **kwargs):
-        # We update any default plugin values here
-        # Before the plugin gets initialised
-        for key, val in kwargs.items():
-            setattr(cls, key, val)
-        return super().__call__()
+    def __call__(cls, **overrides):
+        # The overrides are applied to the instance and not the class
+        # so that many instances of the same plugin can run side by side
+        self = cls.__new__(cls, **overrides)
+        self.__init__()
+        return self
 
 
 class BasePlugin(ThreadExceptionManager, metaclass=PluginSettings):
@@ -32,27 +34,49 @@ class BasePlugin(ThreadExceptionManager, metaclass=PluginSettings):
 
     .. note:: This class is not ment to be called directly, but subclassed by a Plugin.
     """
+    #: ID of the phone system entry on the server, None if there is no entry and the plugin is selected by name only.
     id = None
     _queue: SimpleQueue
 
-    def __new__(cls):
+    #: Name of the plugin setting that can be given in the plugin spec, e.g. ``beronet:10.0.0.5``.
+    spec_setting = None
+    #: Name of this plugin instance, records are tagged with it when set.
+    instance = ""
+    #: Filter rules that decide which records are dropped, each hosted tenant has its own.
+    edge_filter = rules.edge_filter
+
+    def __new__(cls, **overrides):
         # We inject the plugin settings onto the plugin instance
-        # Before it gets passed to init.
+        # Before it gets passed to init. Explicit overrides take priority.
         self = super().__new__(cls)
-        conf.merge_settings(self, prefix="plugin_")
+        conf.merge_settings(self, prefix="plugin_", **overrides)
+        self.__dict__.update(overrides)
         return self
 
     def __init__(self):
         self.logger = logging.getLogger(f"calllogger.plugin.{self.__class__.__name__}")
-        super(BasePlugin, self).__init__(name=f"Thread-{self.__class__.__name__}")
+        thread_name = f"Thread-{self.__class__.__name__}"
+        super(BasePlugin, self).__init__(name=f"{thread_name}-{self.instance}" if self.instance else thread_name)
         self.logger.info("Initializing plugin: %s", self.__class__.__name__)
 
         #: Timeout control, Used to control the timeout decay when repeatedly called.
         self.timeout = Timeout(settings, stopped)  # pragma: no branch
         self.stopped = stopped
 
+        #: The compiled record middleware chain, see :mod:`calllogger.middleware`.
+        self.middleware = middleware.build_chain(settings.middleware)
+
     def push(self, record: CallDataRecord) -> NoReturn:
         """Send a call log record to the call monitoring API."""
+        if (record := self.middleware(record)) is None or not self.edge_filter(record):
+            return
+        elif self.instance:
+            record.source = self.instance
+
+        # Keep the live call table up to date, in summary mode incoming hops stop here
+        if not live_calls.track(record):
+            return
+
         if self._queue.qsize() < settings.queue_size:
             self._queue.put(record)
         else:
@@ -0,0 +1,52 @@
+# Standard library
+from typing import Union
+
+__all__ = ["LineFramer"]
+
+
+class LineFramer:
+    """
+    Split a stream of serial data into lines.
+
+    Lines can end in CR, LF or CRLF, even with the CRLF split across two reads.
+    The partial line at the end of a chunk is kept until the rest arrives.
+
+    :param max_line: Longest line to buffer, a longer line without an ending is returned as is.
+    """
+
+    def __init__(self, max_line: int = 4096):
+        self.max_line = max_line
+        self._buffer = bytearray()
+        # The last chunk ended with a CR, so a LF at the start of the next chunk belongs to it
+        self._skip_lf = False
+
+    def feed(self, data: Union[bytes, bytearray]) -> list[bytes]:
+        """Add a chunk of data, returning the complete lines with their line endings."""
+        if self._skip_lf and data:
+            self._skip_lf = False
+            if data[:1] == b"\n":
+                data = data[1:]
+
+        buffer = self._buffer
+        buffer += data
+
+        # Quick path for a chunk that doesn't finish a line
+        if b"\n" not in data and b"\r" not in data:
+            if len(buffer) < self.max_line:
+                return []
+            line = bytes(buffer)
+            buffer.clear()
+            return [line]
+
+        lines = buffer.splitlines(keepends=True)
+        partial = b"" if lines[-1].endswith((b"\n", b"\r")) else lines.pop()
+        self._skip_lf = not partial and lines[-1].endswith(b"\r")
+
+        # Reuse the buffer for the partial line
+        buffer[:] = partial
+        return [bytes(line) for line in lines]
+
+    def reset(self):
+        """Drop any partial line, used when the connection is reopened."""
+        self._buffer.clear()
+        self._skip_lf = False
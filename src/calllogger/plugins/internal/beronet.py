@@ -1,19 +1,26 @@
 __all__ = ["BeroNet"]
 
 # Standard library
-from typing import NoReturn
-from datetime import datetime
+from typing import Iterable, Iterator, NoReturn, Optional
+from pathlib import PosixPath
+import binascii
+import hashlib
+import json
 import csv
+import re
 
 # Third Party
 import requests
 from requests.auth import HTTPBasicAuth
 from requests.exceptions import HTTPError
+from requests import codes
 from sentry_sdk import push_scope, capture_exception
 
 # Local
+from calllogger import settings, utils, telemetry
 from calllogger.plugins import BasePlugin
 from calllogger.record import CallDataRecord as Record
+from calllogger.dates import date_parser
 
 
 class BeroNet(BasePlugin):
@@ -31,6 +38,16 @@ class BeroNet(BasePlugin):
     beronet_user: str
     beronet_password: str
     beronet_sleep: int = 5
+    #: Only push the calls that ended after the high-water mark kept in the datastore
+    beronet_resume: bool = True
+
+    spec_setting = "beronet_ip"
+    #: Bytes read from the CDR download at a time
+    chunk_size = 64 * 1024
+    query_params = {
+        "apiCommand": "TelephonyGetCdr",
+        "Action": "download"
+    }
 
     def __init__(self):
         super(BeroNet, self).__init__()
@@ -40,6 +57,40 @@ class BeroNet(BasePlugin):
             self.beronet_password,
         )
         self.api_url = f"http://{self.beronet_ip}/app/api/api.php"
+        # End date of the newest call pushed and the hashes of the calls that ended at that date
+        self.hwm: Optional[tuple[str, frozenset[str]]] = None
+        # Conditional request headers and size of the last complete download
+        self.validators: dict[str, str] = {}
+        self.content_length: Optional[int] = None
+        # Cleared if the gateway gives no Content-Length for a HEAD request
+        self.head_supported = True
+
+    @property
+    def hwm_store(self) -> PosixPath:
+        # Hosted tenants can have gateways on the same private IP, so the instance name is part of the key
+        key = f"{self.instance}-{self.beronet_ip}" if self.instance else self.beronet_ip
+        name = re.sub(r"[^\w.-]+", "_", key).strip("_")
+        return settings.datastore.joinpath(f"beronet-{name}.hwm")
+
+    def load_hwm(self) -> tuple[str, frozenset[str]]:
+        """Load the high-water mark from the datastore, an empty mark pushes every call."""
+        try:
+            data = json.loads(utils.read_datastore(self.hwm_store))
+            return data["date"], frozenset(data["hashes"])
+        except FileNotFoundError:
+            return "", frozenset()
+        except (ValueError, KeyError, TypeError, binascii.Error) as err:
+            self.logger.warning("Ignoring broken BeroNet high-water mark: %s", err)
+            return "", frozenset()
+
+    def save_hwm(self, hwm: tuple[str, frozenset[str]]):
+        date, hashes = hwm
+        utils.write_datastore(self.hwm_store, json.dumps({"date": date, "hashes": sorted(hashes)}))
+        self.hwm = hwm
+
+    @staticmethod
+    def call_hash(call: list[str]) -> str:
+        return hashlib.blake2b(",".join(call).encode("utf8"), digest_size=8).hexdigest()
 
     def entrypoint(self) -> NoReturn:
         while self.is_running:
@@ -58,49 +109,131 @@ class BeroNet(BasePlugin):
 
                 self.timeout.sleep(self.beronet_sleep)
 
-    def collect_cdr(self) -> list[list[str]]:
-        """Collect CDR from the BeroNet web API."""
-        query_params = {
-            "apiCommand": "TelephonyGetCdr",
-            "Action": "download"
-        }
-        response = self.session.get(url=self.api_url, params=query_params)
+    def collect_cdr(self) -> Iterator[list[str]]:
+        """
+        Collect CDR from the BeroNet web API, the calls are parsed as they are downloaded.
+        Nothing is downloaded if the CDR has not changed since the last download.
+        """
+        if not self.validators and self.content_length is not None and self.head_supported:
+            # Without an ETag or Last-Modified date, the size of the CDR shows if calls were added
+            if not self.changed_by_head():
+                return self.unchanged("head")
+
+        response = self.session.get(url=self.api_url, params=self.query_params, headers=self.validators, stream=True)
+        if response.status_code == codes.not_modified:
+            response.close()
+            return self.unchanged("conditional")
+        elif response.status_code == codes.ok:
+            telemetry.beronet_polls(tags=dict(gateway=self.beronet_ip, result="changed")).inc()
+            return self.read_cdr(response)
+
+        response.close()
         response.raise_for_status()
+        # Anything other than 200 will raise HTTPError
+        err_msg = "Unexpected response from beronet"
+        self.logger.warning(
+            f"{err_msg}: {response.status_code}",
+            extra={"status_code": response.status_code},
+        )
+        raise HTTPError(err_msg, response=response)
 
-        if response.status_code == 200:
-            decoded = response.content.decode('utf-8')
-            cdr = csv.reader(decoded.splitlines(), delimiter=',')
-            return list(cdr)
-        else:
-            # Anything other than 200 will raise HTTPError
-            err_msg = "Unexpected response from beronet"
-            self.logger.warning(
-                f"{err_msg}: {response.status_code}",
-                extra={"status_code": response.status_code},
-            )
-            raise HTTPError(err_msg, response=response)
-
-    def process_cdr(self, cdr: list[list[str]]) -> NoReturn:
-        """Process the CDR and create the required record."""
-        for call in cdr:
-            if call:
-                # Deside if call is Outgoing or Received
-                direction = call[2]
-                if direction.startswith("ISDN"):
-                    self.outgoing(call)
-                else:
-                    self.received(call)
+    def changed_by_head(self) -> bool:
+        """Compare the size of the CDR with the last download using a HEAD request."""
+        response = self.session.head(url=self.api_url, params=self.query_params)
+        length = response.headers.get("Content-Length", "")
+        if response.status_code != codes.ok or not length.isdigit():
+            self.logger.debug("BeroNet gives no Content-Length for HEAD requests, downloading every poll")
+            self.head_supported = False
+            return True
+        return int(length) != self.content_length
+
+    def unchanged(self, method: str) -> list[list[str]]:
+        self.logger.debug("BeroNet CDR unchanged")
+        tags = dict(gateway=self.beronet_ip)
+        telemetry.beronet_polls(tags=dict(tags, result="unchanged", method=method)).inc()
+        if self.content_length:
+            telemetry.beronet_bytes(tags=dict(tags, kind="skipped")).inc(self.content_length)
+        return []
+
+    def read_cdr(self, response: requests.Response) -> Iterator[list[str]]:
+        """Parse the CSV rows of the CDR one line at a time, never holding the whole file."""
+        with response:
+            try:
+                # A UTF-8 character is never split over lines, so each line can be decoded on its own
+                lines = (line.decode("utf-8") for line in response.iter_lines(chunk_size=self.chunk_size))
+                yield from csv.reader(lines, delimiter=",")
+            finally:
+                fetched = response.raw.tell()
+                telemetry.beronet_bytes(tags=dict(gateway=self.beronet_ip, kind="fetched")).inc(fetched)
+
+        # Only a download that was read to the end is used to skip the next one,
+        # so a call is never missed because processing stopped halfway
+        headers = response.headers
+        self.validators = {
+            header: value for header, value in (
+                ("If-None-Match", headers.get("ETag")),
+                ("If-Modified-Since", headers.get("Last-Modified")),
+            ) if value
+        }
+        length = headers.get("Content-Length", "")
+        self.content_length = int(length) if length.isdigit() else None
+
+    def process_cdr(self, cdr: Iterable[list[str]]) -> NoReturn:
+        """Process the CDR and create the required record for each call past the high-water mark."""
+        if not self.beronet_resume:
+            for call in cdr:
+                self.process_call(call)
+            return
+
+        if self.hwm is None:
+            self.hwm = self.load_hwm()
+        hwm_date, hwm_hashes = self.hwm
+        new_date, new_hashes = hwm_date, set(hwm_hashes)
+        try:
+            for call in cdr:
+                if not call:
+                    continue
+
+                # Calls are written to the CDR as they end, so the end date is what keeps increasing.
+                # The 'yy/mm/dd-HH:MM:SS' dates sort as strings, so old calls are skipped without parsing them.
+                date = call[9]
+                if date < hwm_date:
+                    continue
+                digest = self.call_hash(call)
+                if date == hwm_date and digest in hwm_hashes:
+                    continue
+
+                self.process_call(call)
+                if date > new_date:
+                    new_date, new_hashes = date, {digest}
+                elif date == new_date:
+                    new_hashes.add(digest)
+        finally:
+            # Keep the mark of the calls pushed, even if a broken call stopped the rest
+            if (new_date, new_hashes) != (hwm_date, hwm_hashes):
+                self.save_hwm((new_date, frozenset(new_hashes)))
+
+    def process_call(self, call: list[str]) -> NoReturn:
+        """Create the record of a single CDR call."""
+        if call:
+            # Deside if call is Outgoing or Received
+            direction = call[2]
+            if direction.startswith("ISDN"):
+                self.outgoing(call)
+            else:
+                self.received(call)
 
     # noinspection PyMethodMayBeStatic
     def parse_dates(self, call: list[str], record: Record, fmt="%y/%m/%d-%H:%M:%S") -> NoReturn:
         """Parse and convert the CDR dates and calculate the extra fields."""
-        start_date = datetime.strptime(call[8], fmt)
-        end_date = datetime.strptime(call[9], fmt)
+        parse = date_parser(fmt)
+        start_date = parse(call[8])
+        end_date = parse(call[9])
         record.date = start_date
 
         # Only calls that are answered will have a date here
         if call[10] != '-':
-            ans_date = datetime.strptime(call[10], fmt)
+            ans_date = parse(call[10])
             record.duration = int((end_date - ans_date).total_seconds())
             record.ring = int((ans_date - start_date).total_seconds())
             record.answered = True
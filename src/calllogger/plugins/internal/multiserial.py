@@ -0,0 +1,152 @@
+__all__ = ["MultiSerial"]
+
+# Standard library
+from typing import NoReturn
+import selectors
+import typing
+import io
+import time
+import sys
+
+# Local
+from calllogger.plugins import BasePlugin, SerialPlugin
+from calllogger.conf import json_value
+from calllogger import telemetry, settings
+
+
+class MultiSerial(BasePlugin):
+    """
+    Monitor many serial ports from one thread.
+    Each port has its own serial plugin to parse the lines, so the ports can be from different phone systems.
+    """
+    # Not a phone system, so there is no entry on the server and it's selected by name only
+    id = None
+
+    # Configurable settings
+    #: List of ports, each with the serial plugin to parse its lines and any settings for that plugin,
+    #: e.g. ``[{"port": "/dev/ttyUSB0", "plugin": "SiemensHipathSerial"}, {"port": "/dev/ttyUSB1", ...}]``
+    serial_ports: json_value = []
+
+    def __init__(self):
+        super(MultiSerial, self).__init__()
+        self.selector = selectors.DefaultSelector()
+        if not self.serial_ports:
+            print("No serial ports configured, set PLUGIN_SERIAL_PORTS")
+            sys.exit(0)
+
+        self.parsers = [self.make_parser(entry) for entry in self.serial_ports]
+        #: Time after which each closed port can be reopened
+        self.reconnect_at = {parser.instance: 0.0 for parser in self.parsers}
+        #: File descriptor of each open port
+        self.fds = {}
+        #: Open ports without a file descriptor, e.g. rfc2217, read without waiting on every poll instead
+        self.polled = set()
+        #: Ports of the devices that are not plugged in
+        self.unplugged = set()
+
+    def make_parser(self, entry: dict) -> SerialPlugin:
+        """Create the serial plugin for a port. It's used only for its parser and serial connection."""
+        from calllogger.plugins import get_plugin
+
+        entry_settings = dict(entry)
+        plugin = get_plugin(entry_settings.pop("plugin", "SiemensHipathSerial"))
+        if not issubclass(plugin, SerialPlugin) or "port" not in entry_settings:
+            print(f"Invalid serial port entry, it needs a port and a serial plugin: {entry}")
+            sys.exit(0)
+
+        casts = typing.get_type_hints(plugin)
+        overrides = {key: casts.get(key, str)(val) for key, val in entry_settings.items()}
+        # Records are tagged with the port they came from, under the name of this instance if it has one
+        port = str(overrides["port"])
+        overrides.setdefault("instance", f"{self.instance}:{port}" if self.instance else port)
+        # The parsers push the records, so they use the filter rules of this instance, e.g. of a hosted tenant
+        overrides["edge_filter"] = self.edge_filter
+        return plugin(_queue=self._queue, **overrides)
+
+    def entrypoint(self) -> NoReturn:
+        try:
+            while self.is_running:
+                # Kept short so the thread stops quickly on shutdown or restart, even with no serial traffic
+                self.poll(timeout=SerialPlugin.read_timeout)
+        finally:
+            for parser in self.parsers:
+                self.close_port(parser)
+                parser.close()
+
+    def poll(self, timeout: float):
+        """Reopen any closed ports and process the lines of every port with data waiting."""
+        self.connect()
+        for key, _ in self.selector.select(timeout=timeout):
+            self.read_port(key.data)
+        for parser in list(self.polled):
+            self.read_port(parser)
+
+        # Quiet ports still write their stats on time
+        now = time.monotonic()
+        for parser in self.parsers:
+            if parser.stats is not None:
+                parser.stats.tick(now)
+
+    def connect(self):
+        """Open the ports that are closed. A port that fails is retried later without holding up the others."""
+        now = time.monotonic()
+        for parser in self.parsers:
+            if parser.sserver.is_open:
+                continue
+            elif parser.port_missing:
+                if parser.instance not in self.unplugged:
+                    self.logger.info("Waiting for serial device to be plugged in: %s", parser.port)
+                    self.unplugged.add(parser.instance)
+                continue
+            # A device that was unplugged is opened as soon as it's plugged back in, without waiting out the timeout
+            elif now < self.reconnect_at[parser.instance] and parser.instance not in self.unplugged:
+                continue
+
+            self.unplugged.discard(parser.instance)
+
+            try:
+                parser.connect()
+                try:
+                    self.fds[parser.instance] = parser.sserver.fileno()
+                except (io.UnsupportedOperation, OSError):
+                    # The rfc2217 handler reads the connection in its own thread, so a zero timeout never waits
+                    parser.sserver.timeout = 0
+                    self.polled.add(parser)
+                else:
+                    self.selector.register(self.fds[parser.instance], selectors.EVENT_READ, parser)
+            except Exception:
+                self.logger.warning(
+                    "Failed to connect to serial interface",
+                    extra={"baudrate": parser.baudrate, "port": str(parser.port)},
+                )
+                telemetry.serial_error_counter().tags(error_type="conn").mark()
+                self.close_port(parser)
+            else:
+                parser.framer.reset()
+                self.logger.info("Connected to serial interface: %s", parser.port)
+
+    def read_port(self, parser: SerialPlugin):
+        """Read the waiting data from a port, processing the complete lines."""
+        try:
+            if parser in self.polled:
+                data = parser.sserver.read(parser.sserver.in_waiting or 1)
+            else:
+                data = parser.read_waiting()
+        except Exception:
+            self.logger.warning("Failed to read from serial interface", extra={"port": str(parser.port)})
+            telemetry.serial_error_counter().tags(error_type="read").mark()
+            self.close_port(parser)
+            return
+
+        if not data:
+            return
+        for raw_line in parser.frame(data):
+            parser.handle_line(raw_line)
+
+    def close_port(self, parser: SerialPlugin):
+        """Close a port and schedule it to be reopened."""
+        if (fd := self.fds.pop(parser.instance, None)) is not None:
+            self.selector.unregister(fd)
+        self.polled.discard(parser)
+        parser.sserver.close()
+        self.reconnect_at[parser.instance] = time.monotonic() + settings.timeout
@@ -6,7 +6,7 @@ from typing import Union
 
 # Package imports
 from calllogger.plugins import SerialPlugin
-from calllogger.record import CallDataRecord
+from calllogger.plugins.layout import Layout, Column
 
 # Set of Control Characters the we don't need nor want
 # https://donsnotes.com/tech/charsets/ascii.html
@@ -18,34 +18,28 @@ class SiemensHipathSerial(SerialPlugin):
     """Add's support for the Siemens Hipath phone system, using the serial interface."""
     id = 0
 
+    # Example serial output
+    # |--------------|--|-----|----|-------|------------------------|----------|-|
+    # 11.04.1900:35:48  1   10400:0100:00:070876153281                           1
+    layout = Layout(
+        Column("date", 0, 16, date="%d.%m.%y%X", tz=timezone.utc),
+        Column("line", 16, 19),
+        Column("ext", 19, 25),
+        Column("ring", 25, 30),
+        Column("duration", 30, 38),
+        Column("number", 38, 63),
+        Column("call_type", 74, 76, int),
+    )
+
     def decode(self, raw: bytes) -> str:
         decoded_line = raw.decode("ASCII")
-        return decoded_line.translate(control_char_map)
+        line = decoded_line.translate(control_char_map)
+        if self.stats is not None:
+            # Count the control characters within the line, not the line ending
+            self.stats.control_chars += len(decoded_line.rstrip("\r\n")) - len(line)
+        return line
 
     def validate(self, decoded_line: str) -> Union[str, bool]:
         """Validate that the line contains data and is at least the right length."""
         line = decoded_line.rstrip()  # Gets rid of end of line crap
-        return False if len(line) < 76 else line
-
-    def parse(self, validated_line: str) -> CallDataRecord:
-        """Parse call logs received from the a Siemans Hipath serial interface."""
-        # Parse the received record
-        call_type = validated_line[74:76].strip()
-        record = CallDataRecord(int(call_type))
-        record.raw = validated_line
-
-        # Add date as UTC
-        # https://docs.python.org/3/library/datetime.html#strftime-and-strptime-format-codes
-        record.date_str(validated_line[:16], fmt="%d.%m.%y%X", tz=timezone.utc)
-
-        # Example serial output
-        # |--------------|--|-----|----|-------|------------------------|----------|-|
-        # 11.04.1900:35:48  1   10400:0100:00:070876153281                           1
-        record.line = validated_line[16:19]
-        record.ext = validated_line[19:25]
-        record.ring = validated_line[25:30]
-        record.duration = validated_line[30:38]
-        record.number = validated_line[38:63]
-
-        # Return processed call record
-        return record
+        return False if len(line) < self.layout.width else line
@@ -0,0 +1,137 @@
+__all__ = ["GenericSMDR"]
+
+# Standard library
+from datetime import datetime, timezone
+from typing import Callable, Optional, Union
+from functools import lru_cache
+import re
+import sys
+
+# Third Party
+import attr
+
+# Local
+from calllogger.plugins import SerialPlugin
+from calllogger.record import CallDataRecord
+from calllogger.middleware import to_seconds
+from calllogger.conf import json_value
+from calllogger.dates import date_parser
+
+record_fields = frozenset(attr.fields_dict(CallDataRecord)) - {"source"}
+
+
+def build_converter(field: str, spec: Union[str, dict]) -> Callable[[str], object]:
+    """
+    Build the converter for a field from its spec.
+
+    * ``int``: Convert to an integer.
+    * ``seconds``: Convert a duration in the format of 'HH:MM:SS', 'MM:SS' or 'SS' to seconds.
+    * ``date:<format>``: Parse a UTC date with the strptime format.
+    * A mapping of values, e.g. ``{"I": 1, "O": 2}`` for the call type.
+    """
+    if isinstance(spec, dict):
+        mapping = {str(key): value for key, value in spec.items()}
+        return lambda value: mapping[value.strip()]
+    elif spec == "int":
+        return int
+    elif spec == "seconds":
+        return lambda value: to_seconds(value.strip())
+    elif spec.startswith("date:"):
+        parse = date_parser(spec[5:], timezone.utc)
+
+        # Most SMDR dates only go down to the minute, so consecutive lines share the same date string
+        @lru_cache(maxsize=256)
+        def parse_date(value: str) -> datetime:
+            return parse(value.strip())
+        return parse_date
+    elif spec == "str":
+        return str.strip
+    raise ValueError(f"Unknown converter '{spec}' for field '{field}'")
+
+
+# noinspection PyMethodMayBeStatic
+class GenericSMDR(SerialPlugin):
+    """Add's support for phone systems that print delimited or semi-structured SMDR lines, configured by settings."""
+    # No phone system entry on the server yet, so it's selected by name only
+    id = None
+
+    # Configurable settings
+    #: Regex with named groups for the record fields, e.g. ``(?P<ext>\d+)\s+(?P<number>\+?\d+)``.
+    smdr_pattern: str = ""
+    #: Field delimiter, used when no pattern is given.
+    smdr_delimiter: str = ","
+    #: The record field of each delimited column in order, an empty name skips the column.
+    smdr_fields: json_value = []
+    #: Converter of each field: 'int', 'seconds', 'date:<strptime format>' or a mapping of values.
+    smdr_converters: json_value = {}
+    #: Lines that don't start with this prefix are ignored before any parsing.
+    smdr_prefix: str = ""
+    #: Encoding of the serial data.
+    smdr_encoding: str = "ASCII"
+
+    def __init__(self):
+        super(GenericSMDR, self).__init__()
+        try:
+            self._split, names = self.compile_splitter()
+            self._converters = self.compile_converters(names)
+        except (ValueError, re.error) as err:
+            print(f"Invalid SMDR settings: {err}")
+            sys.exit(0)
+
+    def compile_splitter(self) -> tuple[Callable[[str], Optional[dict]], list[str]]:
+        """Return a function that splits a line into a dict of raw field values, and the field names."""
+        if self.smdr_pattern:
+            regex = re.compile(self.smdr_pattern)
+            names = list(regex.groupindex)
+            match = regex.match
+
+            def split(line: str) -> Optional[dict]:
+                return found.groupdict() if (found := match(line)) else None
+        else:
+            columns = [(index, name) for index, name in enumerate(self.smdr_fields) if name]
+            names = [name for _, name in columns]
+            delimiter = self.smdr_delimiter
+            width = max((index for index, _ in columns), default=-1) + 1
+
+            def split(line: str) -> Optional[dict]:
+                values = line.split(delimiter)
+                return {name: values[index] for index, name in columns} if len(values) >= width else None
+
+        if unknown := set(names) - record_fields:
+            raise ValueError(f"Unknown record fields {sorted(unknown)}")
+        elif "call_type" not in names:
+            raise ValueError("The call_type field is required")
+        return split, names
+
+    def compile_converters(self, names: list[str]) -> tuple[tuple[str, Callable], ...]:
+        """Pair each field with its converter, fields are stripped by default and call_type is an int."""
+        converters = {"call_type": int}
+        converters.update({field: build_converter(field, spec) for field, spec in self.smdr_converters.items()})
+        return tuple((name, converters.get(name, str.strip)) for name in names)
+
+    def decode(self, raw: bytes) -> str:
+        return raw.decode(self.smdr_encoding)
+
+    def validate(self, decoded_line: str) -> Union[str, bool]:
+        """Strip the line and quickly reject noise that does not start with the prefix."""
+        line = decoded_line.strip()
+        if self.smdr_prefix and not line.startswith(self.smdr_prefix):
+            # Treated as an empty line, so noise like headers and banners are dropped quietly
+            return ""
+        return line
+
+    def parse(self, validated_line: str) -> Optional[CallDataRecord]:
+        if (values := self._split(validated_line)) is None:
+            return None
+
+        fields = {name: convert(values[name]) for name, convert in self._converters if values[name] is not None}
+        if "call_type" not in fields:
+            return None
+        elif "date" not in fields:
+            fields["date"] = datetime.now(timezone.utc)
+        fields["raw"] = validated_line
+
+        # Fill in the fields directly, skipping the setattr hook of the record as the values are already stripped
+        record = object.__new__(CallDataRecord)
+        record.__dict__ = fields
+        return record
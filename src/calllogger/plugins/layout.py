@@ -0,0 +1,115 @@
+"""
+Fixed-width layouts
+-------------------
+Declare the columns of a fixed-width serial record instead of hand coding the slices.
+
+A layout is compiled once into a specialised parse function, with every slice and converter inlined.
+The record fields are filled in directly, which skips the per field setattr hook of the record class.
+
+.. code-block:: python
+
+    class MyPBX(SerialPlugin):
+        layout = Layout(
+            Column("date", 0, 16, date="%d.%m.%y%X"),
+            Column("ext", 19, 25),
+            Column("number", 38, 63),
+            Column("call_type", 74, 76, int),
+        )
+"""
+
+# Standard lib
+from datetime import datetime, timezone
+from typing import Callable, NamedTuple, Optional
+
+# Local
+from calllogger.record import CallDataRecord
+from calllogger.dates import date_parser
+
+__all__ = ["Column", "Layout", "compile_layout"]
+
+
+class Column(NamedTuple):
+    """
+    A column of a fixed-width record.
+
+    :param name: The record field to store the value in.
+    :param start: The index of the first character of the column.
+    :param end: The index after the last character of the column, None for the rest of the line.
+    :param type: Converter for the stripped value, ``int`` is given the unstripped value as it ignores whitespace.
+    :param date: The strptime format of a date column, an empty date column is given the current time.
+    :param tz: The timezone of a date column.
+    """
+    name: str
+    start: int
+    end: Optional[int] = None
+    type: Callable = str
+    date: str = ""
+    tz: timezone = timezone.utc
+
+
+def compile_layout(columns: tuple[Column, ...], raw: bool = True, record_class=CallDataRecord) -> Callable:
+    """
+    Compile the columns into a function that parses a line into a record.
+
+    :param columns: The columns of the layout.
+    :param raw: Store the whole line as the record's raw field.
+    :param record_class: The class of the returned record.
+    """
+    if "call_type" not in (column.name for column in columns):
+        raise ValueError("A layout requires a call_type column")
+
+    namespace = {"_new": object.__new__, "_record": record_class, "_now": datetime.now}
+    items, dates = [], []
+    for index, column in enumerate(columns):
+        end = "" if column.end is None else int(column.end)
+        value = f"line[{int(column.start)}:{end}]"
+
+        if column.date:
+            namespace[f"_tz{index}"] = column.tz
+            namespace[f"_date{index}"] = date_parser(column.date, column.tz)
+            dates.append(f"    value = {value}.strip()")
+            dates.append(f"    fields[{column.name!r}] = _date{index}(value) if value else _now(_tz{index})")
+        elif column.type is str:
+            items.append(f"{column.name!r}: {value}.strip()")
+        elif column.type is int:
+            items.append(f"{column.name!r}: int({value})")
+        else:
+            namespace[f"_convert{index}"] = column.type
+            items.append(f"{column.name!r}: _convert{index}({value}.strip())")
+
+    if raw:
+        items.append("'raw': line")
+    if not dates:
+        namespace["_utc"] = timezone.utc
+        dates.append("    fields['date'] = _now(_utc)")
+
+    source = [
+        "def parse(line):",
+        "    record = _new(_record)",
+        "    record.__dict__ = fields = {" + ", ".join(items) + "}",
+        *dates,
+        "    return record",
+    ]
+    exec(compile("\n".join(source), "<layout>", "exec"), namespace)
+    return namespace["parse"]
+
+
+class Layout:
+    """
+    A fixed-width record layout, see :class:`Column`.
+
+    :param columns: The columns of the layout.
+    :param raw: Store the whole line as the record's raw field.
+    """
+
+    def __init__(self, *columns: Column, raw: bool = True):
+        self.columns = columns
+        self.parse = compile_layout(columns, raw=raw)
+
+    @property
+    def width(self) -> int:
+        """The min length of a line that holds every column."""
+        return max(column.start if column.end is None else column.end for column in self.columns)
+
+    def __call__(self, line: str) -> CallDataRecord:
+        return self.parse(line)
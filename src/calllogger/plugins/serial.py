@@ -1,16 +1,25 @@
 # Standard library
-from typing import NoReturn, Union
+from typing import NoReturn, Optional, Union
+from collections import deque
 from pathlib import PosixPath
-import abc
+import select
+import io
+import socket
+import time
 
 # Third party
 import serial
-from sentry_sdk import push_scope, capture_exception, Scope
+from sentry_sdk import push_scope, capture_exception
 
 # Local
 from calllogger.record import CallDataRecord
 from calllogger.plugins.base import BasePlugin
-from calllogger import telemetry
+from calllogger.plugins.layout import Layout
+from calllogger.plugins.framer import LineFramer
+from calllogger.deadletter import dead_letters
+from calllogger.capture import CaptureWriter
+from calllogger.conf import serial_port
+from calllogger import telemetry, settings
 
 
 class ParseError(RuntimeError):
@@ -35,43 +44,140 @@ class SerialPlugin(BasePlugin):
 
     #: The serial baudrate to use.
     baudrate: int = 9600
-    #: The serial port to comunicate with.
-    port: PosixPath = PosixPath("/dev/ttyUSB0")
+    #: The serial port to comunicate with, a stable path like ``/dev/serial/by-id/...`` keeps working when
+    #: the adapter is plugged back in under a different name. It can also be the URL of a serial-to-Ethernet converter,
+    #: e.g. ``socket://10.0.0.5:4001`` for a raw TCP port or ``rfc2217://10.0.0.5:4001`` for telnet (RFC 2217).
+    port: serial_port = PosixPath("/dev/ttyUSB0")
+
+    spec_setting = "port"
+
+    #: Fixed-width column layout used to parse the serial lines, see :mod:`calllogger.plugins.layout`.
+    layout: Layout = None
+
+    #: Number of recent stage values kept as context for errors.
+    context_size = 12
+
+    #: Most bytes taken from a network port in one read.
+    read_size = 4096
+
+    #: Longest a read waits for data, so a quiet line never holds up a shutdown or restart.
+    read_timeout = 0.05
+
+    #: Seconds between checks for an unplugged serial device to come back.
+    hotplug_interval = 0.25
 
     def __init__(self):
         super(SerialPlugin, self).__init__()
-        self.sserver = serial.Serial()
+        if self.is_url:
+            self.sserver = serial.serial_for_url(self.port, do_not_open=True)
+        else:
+            self.sserver = serial.Serial()
+        self.framer = LineFramer()
+        #: Keeps a copy of the raw serial data when enabled, see :mod:`calllogger.capture`.
+        self.capture = CaptureWriter(self.instance or str(self.port)) if settings.capture_size else None
+        #: Throughput and line errors of the port, see :class:`calllogger.telemetry.SerialStats`.
+        self.stats = None
+        if settings.collect_metrics and settings.serial_stats_interval:
+            self.stats = telemetry.SerialStats(
+                self.instance or str(self.port), telemetry.serial_link, settings.serial_stats_interval, time.monotonic()
+            )
+        #: Ring of the recent ``(stage, value)`` pairs of each line, the sentry scope is only built from it on error.
+        self.stage_values = deque(maxlen=self.context_size)
 
         # Check if serial port exists
-        if not self.port.exists():
+        if self.port_missing:
             print(f"The target serial port '{self.port}' can't be found.")
             print("Please ensure that the device is connected to the system.")
 
+    @property
+    def is_url(self) -> bool:
+        """True if the port is a network port URL."""
+        return isinstance(self.port, str)
+
+    def connect(self):
+        """Open the serial interface, network ports are kept alive and read without blocking."""
+        self.sserver.baudrate = self.baudrate
+        self.sserver.port = str(self.port)
+        self.sserver.open()
+
+        # Both the socket and rfc2217 handlers of pyserial keep the TCP connection here
+        if (sock := getattr(self.sserver, "_socket", None)) is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            # Notice a dead converter within about a minute instead of the system default of hours
+            for option, value in (("TCP_KEEPIDLE", 30), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3)):
+                if hasattr(socket, option):
+                    sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+        # The socket handler only reports 0 or 1 bytes waiting, so it's read without blocking instead, see read_waiting
+        if self.is_url and self.port.startswith("socket://"):
+            self.sserver.timeout = 0
+        else:
+            self.sserver.timeout = self.read_timeout
+
+        if self.stats is not None:
+            # The rfc2217 handler has no file descriptor, so no line error counts
+            try:
+                fd = self.sserver.fileno()
+            except (io.UnsupportedOperation, OSError):
+                fd = None
+            self.stats.attach(fd)
+
+    def read_waiting(self) -> bytes:
+        """
+        Read in all the data waiting on the serial interface, waiting up to the read timeout for the first byte.
+        Nothing is returned if no data arrived in that time.
+        """
+        if self.sserver.timeout == 0:
+            if not select.select([self.sserver.fileno()], [], [], self.read_timeout)[0]:
+                return b""
+            return self.sserver.read(self.read_size)
+        # Wait for the first byte, then take everything that is waiting in one read.
+        # readline would make a syscall for every byte.
+        return self.sserver.read(self.sserver.in_waiting or 1)
+
+    @property
+    def port_missing(self) -> bool:
+        """True if the port is a device that is not plugged in."""
+        return not self.is_url and not self.port.exists()
+
+    def backoff(self):
+        """
+        Wait before reconnecting after an error. An unplugged device is waited on instead,
+        so the port is reopened as soon as the device node appears rather than after the timeout decay.
+        """
+        if not self.port_missing:
+            self.timeout.sleep()
+            return
+
+        self.logger.info("Waiting for serial device to be plugged in: %s", self.port)
+        while self.port_missing:
+            if self.stopped.wait(self.hotplug_interval):
+                return
+        self.logger.info("Serial device plugged in: %s", self.port)
+
     def __open(self):
         """Open a connection to the serial interface, returning True if successful else False."""
         try:
-            self.sserver.baudrate = self.baudrate
-            self.sserver.port = str(self.port)
-            self.sserver.open()
+            self.connect()
         except Exception:
             self.logger.warning(
                 "Failed to connect to serial interface",
                 extra={"baudrate": self.baudrate, "port": str(self.port)},
             )
             telemetry.serial_error_counter().tags(error_type="conn").mark()
-            self.timeout.sleep()
+            self.backoff()
             self.sserver.close()
             raise
 
     def __read(self) -> bytes:
-        """Read in a line from the serial interface."""
+        """Read in all the waiting data from the serial interface."""
         try:
-            return self.sserver.readline()
+            return self.read_waiting()
         except Exception:
             self.logger.warning("Failed to read from serial interface")
             telemetry.serial_error_counter().tags(error_type="read").mark()
-            self.timeout.sleep()
             self.sserver.close()
+            self.backoff()
             raise
 
     def __decode(self, raw: bytes) -> str:
@@ -139,54 +245,118 @@ class SerialPlugin(BasePlugin):
             telemetry.serial_error_counter().tags(error_type="parse").mark()
             raise
 
-    @abc.abstractmethod
-    def parse(self, validated_line: str) -> CallDataRecord:  # pragma: no cover
+    def parse(self, validated_line: str) -> CallDataRecord:
         """
-        Overide this method to handel parsing of serial data.
+        Parse the serial line using the plugin's layout.
+        Overide this method to handel parsing of serial data that has no fixed-width layout.
 
         :param str validated_line: The decoded serial line.
         :returns: A :class:`calllogger.CallDataRecord` object.
         """
-        raise NotImplementedError
+        if self.layout is None:  # pragma: no cover
+            raise NotImplementedError
+        return self.layout.parse(validated_line)
 
     def entrypoint(self) -> NoReturn:
         """
-        Start the call monitoring loop. Reads a call record from the
+        Start the call monitoring loop. Reads call records from the
         serial interface, parse and push to QuartX Call Monitoring.
         """
-        while self.is_running:
-            with push_scope() as scope:
+        try:
+            while self.is_running:
                 try:
-                    self.monitor_interface(scope)
-                except EmptyLine:
-                    self.logger.debug("Serial line is empty, ignoring")
-                    telemetry.serial_error_counter().tags(error_type="empty_line").mark()
+                    raw_lines = self.read_lines()
                 except Exception as err:
-                    scope.set_context("Serial Interface", {
-                        "baudrate": self.baudrate,
-                        "port": str(self.port),
-                    })
-                    capture_exception(err, scope=scope)
-                else:
-                    self.timeout.reset()
-
-    def monitor_interface(self, scope: Scope):
+                    self.capture_error(err)
+                    continue
+
+                for raw_line in raw_lines:
+                    self.handle_line(raw_line)
+        finally:
+            self.close()
+
+    def close(self):
+        """Release the port straight away, so a restarted plugin can reopen it, and finish the capture segment."""
+        self.sserver.close()
+        if self.capture is not None:
+            self.capture.close()
+
+    def read_lines(self) -> list[bytes]:
+        """Read the waiting data from the serial interface, returning the complete lines."""
         # Ensure that the serial connection is open
         if not self.sserver.is_open:
             self.__open()
+            self.framer.reset()
 
-        # Read the raw serial line
-        raw_line = self.__read()
-        scope.set_extra("raw_line", repr(raw_line))
-
-        # Decode the serial line
-        decoded_line = self.__decode(raw_line)
-        scope.set_extra("decoded_line", decoded_line)
+        return self.frame(self.__read())
 
-        # Validate the decoded serial line
-        validated_line = self.__validate(decoded_line)
-        scope.set_extra("validated_line", validated_line)
+    def frame(self, data: bytes) -> list[bytes]:
+        """Split the data read from the serial interface into lines, keeping a copy when capturing."""
+        if self.capture is not None:
+            self.capture.write(data)
+        lines = self.framer.feed(data)
+        if self.stats is not None:
+            self.stats.read(data, lines, time.monotonic())
+        return lines
 
-        # Parse the serial line and push to the cloud
-        record = self.__parse(validated_line)
-        self.push(record)
+    def handle_line(self, raw_line: bytes):
+        """Process a raw serial line and push the record to the cloud."""
+        try:
+            record = self.process_line(raw_line)
+            self.push(record)
+        except EmptyLine:
+            self.logger.debug("Serial line is empty, ignoring")
+            telemetry.serial_error_counter().tags(error_type="empty_line").mark()
+        except Exception as err:
+            self.capture_error(err, self.line_context())
+        else:
+            self.timeout.reset()
+
+    def line_context(self) -> dict[str, str]:
+        """The stage values of the last line processed."""
+        context = {}
+        for stage, value in reversed(self.stage_values):
+            context[stage] = repr(value) if isinstance(value, bytes) else value
+            if stage == "raw_line":
+                break
+        return context
+
+    def capture_error(self, err: Exception, extras: Optional[dict] = None):
+        """Send the error to sentry, with the recent stage values as context."""
+        with push_scope() as scope:
+            scope.set_context("Serial Interface", {
+                "baudrate": self.baudrate,
+                "port": str(self.port),
+            })
+            for key, value in (extras or {}).items():
+                scope.set_extra(key, value)
+            scope.set_extra("recent_values", [f"{stage}: {value!r}" for stage, value in self.stage_values])
+            capture_exception(err, scope=scope)
+
+    def process_line(self, raw_line: bytes) -> CallDataRecord:
+        """
+        Decode, validate and parse a raw serial line into a call record.
+        Lines that fail are kept in the dead-letter store, see :mod:`calllogger.deadletter`.
+        """
+        # Only a reference to each value is kept per line, it's not formatted unless there is an error
+        keep = self.stage_values.append
+        keep(("raw_line", raw_line))
+        stage = "decode"
+        try:
+            # Decode the serial line
+            decoded_line = self.__decode(raw_line)
+            keep(("decoded_line", decoded_line))
+
+            # Validate the decoded serial line
+            stage = "validation"
+            validated_line = self.__validate(decoded_line)
+            keep(("validated_line", validated_line))
+
+            # Parse the serial line
+            stage = "parse"
+            return self.__parse(validated_line)
+        except EmptyLine:
+            raise
+        except Exception as err:
+            dead_letters.add(raw_line, stage, err, plugin=self.__class__.__name__)
+            raise
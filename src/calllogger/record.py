@@ -4,6 +4,9 @@ from datetime import datetime, timezone
 # Third Party
 import attr
 
+# Local
+from calllogger.dates import parse_date
+
 __all__ = ["CallDataRecord"]
 
 
@@ -28,6 +31,7 @@ class CallDataRecord:
         * **duration** (*int*) - The duration of the call in seconds. Defaults = 0
         * **answered** (*int*/*bool*) - Indicate if call was answered. Determined by duration if not given.
         * **raw** (*str*) - The original unparsed raw call record.
+        * **source** (*str*) - The plugin instance that created the record, only set when running many plugins.
 
     .. note:: **duration** & **ring** may also be in the format of ``HH:MM:SS`` or ``MM:SS``.
 
@@ -64,6 +68,7 @@ class CallDataRecord:
     duration: int = attr.ib(init=False)
     answered: bool = attr.ib(init=False)
     raw: str = attr.ib(init=False)
+    source: str = attr.ib(init=False)
 
     # Class Vars
     INCOMING = 0
@@ -99,4 +104,4 @@ class CallDataRecord:
         :param timezone tz: The timezone the date is from. Default = 'UTC'
         """
         if date := date.strip():
-            self.date = datetime.strptime(date, fmt).replace(tzinfo=tz)
+            self.date = parse_date(date, fmt, tz)
@@ -0,0 +1,189 @@
+"""
+Edge filtering rules
+--------------------
+Rules pushed from the server in ``client_info.settings["filter_rules"]`` that decide which
+records never get sent. Any record that matches one of the rules is dropped.
+
+A rule is either a condition on a record field or a group of rules combined with AND/OR.
+Every top level rule can be given a name that is used to tag its hit counter.
+
+A condition never matches a record that does not have the field, or whose value can't be
+converted to the type of the rule value. So ``ne`` and ``not_in`` only match records that have
+a different value, and a rule never drops a record because of data that isn't there.
+
+example::
+
+    [
+        {"name": "internal", "field": "number", "op": "len_lt", "value": 5},
+        {"name": "fax_line", "and": [
+            {"field": "line", "op": "eq", "value": 4},
+            {"field": "call_type", "op": "in", "value": [0, 1]},
+        ]},
+    ]
+"""
+
+# Standard lib
+from typing import Any, Callable, Optional
+import operator
+import logging
+import re
+
+# Third Party
+from sentry_sdk import capture_exception
+
+# Local
+from calllogger.record import CallDataRecord
+from calllogger import settings, telemetry
+
+__all__ = ["RuleError", "compile_rules", "RuleFilter", "edge_filter"]
+logger = logging.getLogger(__name__)
+
+Matcher = Callable[[dict], Optional[str]]
+
+
+class RuleError(ValueError):
+    pass
+
+
+def _len(op: Callable[[Any, Any], bool]):
+    return lambda value, expected: op(len(str(value)), expected)
+
+
+def _str(op: Callable[[str, str], bool]):
+    return lambda value, expected: op(str(value), expected)
+
+
+operators = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "in": lambda value, expected: value in expected,
+    "not_in": lambda value, expected: value not in expected,
+    "lt": operator.lt,
+    "le": operator.le,
+    "gt": operator.gt,
+    "ge": operator.ge,
+    "startswith": _str(str.startswith),
+    "endswith": _str(str.endswith),
+    "matches": lambda value, expected: expected.search(str(value)) is not None,
+    "len_lt": _len(operator.lt),
+    "len_gt": _len(operator.gt),
+}
+
+
+def _coerce(expected: Any) -> Callable[[Any], Any]:
+    """Return a function that converts a record value to the type of the rule value."""
+    sample = expected[0] if isinstance(expected, (list, tuple)) and expected else expected
+    if isinstance(sample, bool) or not isinstance(sample, (int, float)):
+        return lambda value: value
+
+    number_type = type(sample)
+
+    def coerce(value):
+        try:
+            return number_type(value)
+        except (TypeError, ValueError):
+            return None
+    return coerce
+
+
+def _compile_condition(rule: dict) -> Callable[[dict], bool]:
+    try:
+        field, op_name, expected = rule["field"], rule["op"], rule["value"]
+    except KeyError as err:
+        raise RuleError(f"Rule is missing required key: {err}")
+
+    if field not in CallDataRecord.__annotations__:
+        raise RuleError(f"Unknown record field: {field}")
+    elif (op := operators.get(op_name)) is None:
+        raise RuleError(f"Unknown rule operator: {op_name}")
+
+    if op_name == "matches" or op_name.startswith("len_"):
+        # Compared as text, so the value is kept as it is
+        coerce = _coerce(None)
+        if op_name == "matches":
+            expected = re.compile(expected)
+    else:
+        coerce = _coerce(expected)
+        if op_name in ("in", "not_in"):
+            expected = frozenset(expected)
+
+    def condition(fields: dict) -> bool:
+        # A missing value, or one that can't be converted, never matches
+        return (value := coerce(fields.get(field))) is not None and op(value, expected)
+    return condition
+
+
+def _compile_expression(rule: dict, namespace: dict) -> str:
+    """Convert a rule into a python expression, adding the conditions to the namespace."""
+    if not isinstance(rule, dict):
+        raise RuleError(f"Invalid rule: {rule!r}")
+
+    for key, joiner in (("and", " and "), ("or", " or ")):
+        if key in rule:
+            if not rule[key]:
+                raise RuleError(f"Empty '{key}' group")
+            parts = [_compile_expression(child, namespace) for child in rule[key]]
+            return f"({joiner.join(parts)})"
+
+    name = f"_cond{len(namespace)}"
+    namespace[name] = _compile_condition(rule)
+    return f"{name}(fields)"
+
+
+def compile_rules(rules: list[dict]) -> Matcher:
+    """
+    Compile the rules into one function.
+
+    :param rules: List of top level rules.
+    :returns: A function that takes the record fields and returns the name of the first matching rule or None.
+    :raises RuleError: If any of the rules are invalid.
+    """
+    namespace = {}
+    source = ["def match(fields):"]
+    for index, rule in enumerate(rules or []):
+        expression = _compile_expression(rule, namespace)
+        source.append(f"    if {expression}:")
+        source.append(f"        return {str(rule.get('name', f'rule{index}'))!r}")
+    source.append("    return None")
+
+    exec(compile("\n".join(source), "<filter-rules>", "exec"), namespace)
+    return namespace["match"]
+
+
+class RuleFilter:
+    """
+    Record filter that recompiles itself whenever the rules setting gets replaced.
+
+    :param rules: Function returning the current rules, defaults to the ``filter_rules`` setting.
+    :returns: True if the record is allowed through, False if it should be dropped.
+    """
+
+    def __init__(self, rules: Callable[[], list[dict]] = None):
+        self._rules = rules or (lambda: settings.filter_rules)
+        self._source = None
+        self._match: Matcher = compile_rules([])
+
+    def load(self, rules: list[dict]):
+        """Compile the given rules, falling back to no filtering if they are invalid."""
+        self._source = rules
+        try:
+            self._match = compile_rules(rules)
+        except Exception as err:
+            logger.warning("Invalid filter rules, filtering disabled: %s", err)
+            capture_exception(err)
+            self._match = compile_rules([])
+        else:
+            logger.debug("Loaded %d filter rules", len(rules or []))
+
+    def __call__(self, record: CallDataRecord) -> bool:
+        if (rules := self._rules()) is not self._source:
+            self.load(rules)
+
+        if name := self._match(record.__dict__):
+            telemetry.filter_rule_hits(tags=dict(rule=name)).inc()
+            return False
+        return True
+
+
+# Shared by all plugins so the rules only get compiled once
+edge_filter = RuleFilter()
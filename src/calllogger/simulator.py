@@ -0,0 +1,154 @@
+"""
+Serial simulator
+----------------
+Stand in for a phone system on a serial port, so the serial plugins can be tested and load tested without hardware.
+
+A pseudo terminal pair is opened and realistic Siemens HiPath lines, or the lines of a capture file,
+are written to it at a set rate. Lines can be written in bursts and mixed with line noise and control characters.
+Point a serial plugin at the printed port to read them through the real serial read path.
+
+.. code-block:: bash
+
+    calllogger-simulate-serial --rate 10000 --burst 20 --noise 0.01
+    PLUGIN=SiemensHipathSerial:/dev/pts/3 calllogger
+"""
+
+# Standard lib
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+from itertools import cycle
+import threading
+import random
+import select
+import time
+import tty
+import pty
+import os
+
+# Local
+from calllogger.plugins.internal.mockcalls import callset
+
+__all__ = ["SerialSimulator", "siemens_line"]
+
+# Control characters a Siemens HiPath prints within its lines
+control_chars = b"\x00\x07\x0c\x11\x13\x1b"
+
+
+def siemens_line(rand: random.Random, date: datetime) -> bytes:
+    """Create a random record line in the Siemens HiPath format."""
+    ring = rand.randint(0, 59)
+    duration = timedelta(seconds=rand.choice([0, rand.randint(1, 7200)]))
+    return (
+        f"{date:%d.%m.%y%H:%M:%S}"
+        f"{rand.randint(1, 3):>3}"
+        f"{rand.randint(100, 120):>6}"
+        f"00:{ring:02}"
+        f"{str(duration).zfill(8):>8}"
+        f"{rand.choice(list(callset)):<25}"
+        f"{'':11}"
+        f"{rand.choice([1, 2]):>2}"
+        "\r\n"
+    ).encode("ASCII")
+
+
+class SerialSimulator:
+    """
+    Write phone system lines to a pseudo terminal.
+
+    :param lines: Lines to write in a loop, random Siemens HiPath lines are created when not given.
+    :param rate: Lines per second.
+    :param burst: Number of lines written together at a time.
+    :param noise: Chance of a line having some of its bytes replaced with random bytes.
+    :param control: Chance of a line having a control character added.
+    :param seed: Seed of the random lines, noise and control characters.
+    """
+
+    def __init__(
+        self,
+        lines: Optional[list[bytes]] = None,
+        rate: float = 10.0,
+        burst: int = 1,
+        noise: float = 0.0,
+        control: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.lines = lines
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.noise = noise
+        self.control = control
+        self.rand = random.Random(seed)
+        self.master: Optional[int] = None
+        self.slave: Optional[int] = None
+        self.written = 0
+
+    def open(self) -> str:
+        """Open the pseudo terminal pair, returning the path of the port for the serial plugin."""
+        self.master, self.slave = pty.openpty()
+        # Without echo or line ending translation, the plugin reads exactly what was written
+        tty.setraw(self.slave)
+        return os.ttyname(self.slave)
+
+    def close(self):
+        for fd in (self.master, self.slave):
+            if fd is not None:
+                os.close(fd)
+        self.master = self.slave = None
+
+    def generate(self) -> Iterator[bytes]:
+        """The lines to write, before any noise."""
+        if self.lines:
+            yield from cycle(self.lines)
+        date = datetime.now().replace(microsecond=0)
+        while True:
+            date += timedelta(seconds=self.rand.randint(0, 30))
+            yield siemens_line(self.rand, date)
+
+    def mangle(self, line: bytes) -> bytes:
+        """Add line noise and control characters to a line by chance."""
+        rand = self.rand
+        if self.control and rand.random() < self.control:
+            index = rand.randrange(len(line))
+            line = line[:index] + bytes([rand.choice(control_chars)]) + line[index:]
+        if self.noise and rand.random() < self.noise:
+            data = bytearray(line)
+            for _ in range(rand.randint(1, 4)):
+                data[rand.randrange(len(data))] = rand.randrange(256)
+            line = bytes(data)
+        return line
+
+    def write(self, data: bytes, stopped: Optional[threading.Event] = None) -> bool:
+        """Write all the data, returning False if stopped while waiting on a plugin that is not reading."""
+        chunk = memoryview(data)
+        while chunk:
+            # The pty buffer fills up when nothing is reading, so wait in short steps to notice a stop
+            if not select.select([], [self.master], [], 0.1)[1]:
+                if stopped and stopped.is_set():
+                    return False
+                continue
+            chunk = chunk[os.write(self.master, chunk):]
+        return True
+
+    def run(self, count: int = 0, stopped: Optional[threading.Event] = None) -> int:
+        """
+        Write the lines at the set rate until the count is reached or stopped.
+
+        :param count: Number of lines to write, 0 for no limit.
+        :param stopped: Event that stops the simulator when set.
+        :returns: The number of lines written.
+        """
+        lines = self.generate()
+        start = time.monotonic()
+        while not (stopped and stopped.is_set()) and not (count and self.written >= count):
+            size = min(self.burst, count - self.written) if count else self.burst
+            if not self.write(b"".join(self.mangle(next(lines)) for _ in range(size)), stopped):
+                break
+            self.written += size
+
+            # Keep to the rate over the whole run, rather than sleeping a fixed time per burst
+            if (delay := start + self.written / self.rate - time.monotonic()) > 0:
+                if stopped:
+                    stopped.wait(delay)
+                else:
+                    time.sleep(delay)
+        return self.written
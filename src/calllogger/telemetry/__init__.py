@@ -9,17 +9,26 @@ import requests
 import psutil
 
 # Local
-from .instruments import Metric, Histogram, Event
+from .instruments import Metric, Histogram, Event, Counter, Gauge
 from .collectors import InfluxCollector
 from .logs import send_logs_to_logzio
+from .link import SerialStats
 
 __all__ = [
     "send_logs_to_logzio",
     "InfluxCollector",
     "collector",
     "SystemMetrics",
+    "SerialStats",
+    "serial_link",
     "serial_error_counter",
     "http_errors_counter",
+    "filter_rule_hits",
+    "beronet_polls",
+    "beronet_bytes",
+    "tenant_memory",
+    "thread_restarts",
+    "live_calls_gauge",
     "request_time",
 ]
 
@@ -99,8 +108,23 @@ def track_http_resp_time(resp: requests.Response):
 
 # Number of serial errors
 serial_error_counter = Event.setup("serial_error", collector)
+# Throughput and line errors of each serial port, see SerialStats
+serial_link = Metric.setup("serial_link", collector)
 # Number of http errors
 http_errors_counter = Event.setup("http_errors", collector)
+# Number of records dropped by each edge filter rule
+filter_rule_hits = Counter.setup("filter_rule_hits", collector)
+# Number of BeroNet CDR polls that were changed or unchanged
+beronet_polls = Counter.setup("beronet_polls", collector)
+# Bytes of the BeroNet CDR fetched, or skipped as the CDR was unchanged
+beronet_bytes = Counter.setup("beronet_bytes", collector)
+
+# Number of times each thread was restarted by the supervisor
+thread_restarts = Counter.setup("thread_restarts", collector)
+# Number of calls ringing right now
+live_calls_gauge = Gauge.setup("live_calls", collector)
+# Memory used by each hosted tenant
+tenant_memory = Metric.setup("calllogger_tenant_memory", collector)
 
 # Request latency
 request_time = Histogram.setup("http_request_duration_seconds", collector)
@@ -30,13 +30,19 @@ class Event(Metric):
 
 class Counter(Metric):
     """A Counter tracks counts of events or running totals."""
-    tracker: dict[str, int] = {}
+    tracker: dict[tuple, int] = {}
+
+    @property
+    def _key(self) -> tuple:
+        """Each combination of name & tags is tracked separately."""
+        return self._name, tuple(sorted(self._tags.items()))
 
     def inc(self, amount=1):
         """Increment by given value."""
-        value = self.tracker.get(self._name, 0) + amount
+        key = self._key
+        value = self.tracker.get(key, 0) + amount
         clone = self.field("value", value)
-        self.tracker[self._name] = value
+        self.tracker[key] = value
         clone.write()
 
 
@@ -45,15 +51,16 @@ class Gauge(Counter):
 
     def dec(self, amount=1):
         """Decrement gauge by the given amount."""
-        value = max(0, self.tracker.get(self._name, 1) - amount)
+        key = self._key
+        value = max(0, self.tracker.get(key, 1) - amount)
         self.field("value", value)
-        self.tracker[self._name] = value
+        self.tracker[key] = value
         self.write()
 
     def set(self, value):
         """Set to a given value."""
         self.field("value", value)
-        self.tracker[self._name] = value
+        self.tracker[self._key] = value
         self.write()
 
 
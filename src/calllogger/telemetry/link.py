@@ -0,0 +1,110 @@
+"""
+Serial link stats
+-----------------
+Aggregate what goes over a serial link and write it as one metric point per interval, instead of a point per event.
+
+The point has the bytes and lines per second, the average line length, the average and longest time between
+lines, the control characters stripped, the number of reads and, for real UARTs on Linux, the line errors
+counted by the kernel (frame, overrun, parity, break and buffer overrun). A chatty phone system shows
+up as a high line rate, a dying cable as line errors, control characters and lines that fail to parse.
+"""
+
+# Standard Lib
+from typing import Callable, Optional
+import struct
+import fcntl
+
+# Linux ioctl to get the serial_icounter_struct of a tty, see 'man 2 ioctl_tty'
+TIOCGICOUNT = 0x545D
+icounter = struct.Struct("20i")
+# The line error fields of serial_icounter_struct
+icounter_fields = {"frame_errors": 6, "overruns": 7, "parity_errors": 8, "breaks": 9, "buffer_overruns": 10}
+
+
+def read_icounter(fd: int) -> Optional[tuple[int, ...]]:
+    """The kernel's error counters of a serial port, None if the port does not have them, e.g. a pty or socket."""
+    try:
+        return icounter.unpack(fcntl.ioctl(fd, TIOCGICOUNT, bytes(icounter.size)))
+    except OSError:
+        return None
+
+
+class SerialStats:
+    """
+    Per interval stats of a serial link.
+
+    :param port: The port, used as the tag of the metric.
+    :param metric: The metric the stats are written to.
+    :param interval: Seconds between each point.
+    """
+
+    def __init__(self, port: str, metric: Callable, interval: float, now: float = 0.0):
+        self.port = port
+        self.metric = metric
+        self.interval = interval
+        self.fd: Optional[int] = None
+        self._icounter: Optional[tuple[int, ...]] = None
+        #: When the last line was read, kept across intervals
+        self.last_line: Optional[float] = None
+        self.reset(now)
+
+    def reset(self, now: float):
+        self.started = now
+        self.reads = 0
+        self.bytes = 0
+        self.lines = 0
+        self.line_bytes = 0
+        #: Control characters stripped from within the lines by the plugin
+        self.control_chars = 0
+        self.gaps = 0
+        self.gap_total = 0.0
+        self.gap_max = 0.0
+
+    def attach(self, fd: Optional[int]):
+        """Start tracking the line errors of a newly opened port."""
+        self.fd = fd
+        self._icounter = None if fd is None else read_icounter(fd)
+
+    def read(self, data: bytes, lines: list[bytes], now: float):
+        """Count a read from the port and the complete lines it finished."""
+        self.reads += 1
+        self.bytes += len(data)
+        if lines:
+            count = len(lines)
+            self.lines += count
+            self.line_bytes += sum(map(len, lines))
+            if self.last_line is not None:
+                # The other lines of the same read came with no gap
+                gap = now - self.last_line
+                self.gaps += count
+                self.gap_total += gap
+                self.gap_max = max(self.gap_max, gap)
+            self.last_line = now
+        self.tick(now)
+
+    def tick(self, now: float):
+        """Write the stats once the interval is up."""
+        if now - self.started >= self.interval:
+            self.flush(now)
+
+    def line_errors(self) -> dict[str, int]:
+        """The line errors since the last call, empty if the port does not count them."""
+        if self._icounter is None or (counter := read_icounter(self.fd)) is None:
+            return {}
+        previous, self._icounter = self._icounter, counter
+        return {name: counter[index] - previous[index] for name, index in icounter_fields.items()}
+
+    def flush(self, now: float):
+        elapsed = (now - self.started) or 1.0
+        fields = dict(
+            bytes_per_sec=self.bytes / elapsed,
+            lines_per_sec=self.lines / elapsed,
+            avg_line_length=self.line_bytes / self.lines if self.lines else 0.0,
+            avg_line_gap=self.gap_total / self.gaps if self.gaps else 0.0,
+            max_line_gap=self.gap_max,
+            control_chars=self.control_chars,
+            reads=self.reads,
+        )
+        fields.update(self.line_errors())
+        self.metric(tags=dict(port=self.port), fields=fields).write()
+        self.reset(now)
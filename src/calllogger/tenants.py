@@ -0,0 +1,264 @@
+"""
+Hosted tenants
+--------------
+Run many tenants from one process. Each tenant has its own token, identifier, plugin
+instances, plugin settings, record queue and filter rules. The HTTP connection pool,
+the checkin scheduler and the telemetry threads are shared between all tenants.
+
+The tenants are loaded from a JSON file. The optional ``settings`` of a tenant are the
+settings of its plugins, without the ``PLUGIN_`` prefix::
+
+    [
+        {"identifier": "virtual-0001", "token": "<cdr token>", "plugin": "beronet:10.0.0.5",
+         "settings": {"beronet_user": "admin", "beronet_password": "<password>"}},
+        {"identifier": "virtual-0002", "token": "<cdr token>", "plugin": "mockcalls"}
+    ]
+
+Only the ``filter_rules`` of the settings pushed from the server are applied per tenant.
+The record middleware, the live call table and every other process setting are shared by
+all tenants and only come from the environment, so a tenant setting for them is refused.
+"""
+
+# Standard lib
+from functools import partial
+from pathlib import PosixPath
+from queue import SimpleQueue
+from typing import Type, Union
+import logging
+import typing
+import json
+import sys
+import os
+
+# Third party
+from requests.adapters import HTTPAdapter
+from decouple import strtobool
+import requests
+import psutil
+
+# Local
+from calllogger import api, settings, stopped, telemetry, __version__
+from calllogger.misc import ThreadTimer, Supervisor
+from calllogger.plugins import BasePlugin, get_plugins
+from calllogger.rules import RuleFilter
+from calllogger.utils import TokenAuth
+
+__all__ = ["Tenant", "TenantAPIHandler", "TenantCDRWorker", "HostedTenants", "load_tenants"]
+logger = logging.getLogger(__name__)
+
+
+def _cast(cast: type, value):
+    """Values from the JSON file already have a type, only text gets cast the same as the environment."""
+    if not isinstance(value, str) or cast is str:
+        return value
+    return strtobool(value) if cast is bool else cast(value)
+
+
+class Tenant:
+    """
+    A single hosted tenant.
+
+    :param identifier: The device identifier of the tenant.
+    :param token: The CDR token of the tenant.
+    :param plugin: The plugin spec for the tenant, see :func:`calllogger.plugins.get_plugins`.
+    :param settings: Settings of the tenant's plugins, these take priority over the environment.
+    """
+
+    def __init__(self, identifier: str, token: str, plugin: str, settings: dict = None):
+        self.identifier = identifier.upper()
+        self.token = TokenAuth(token)
+        self.plugin = plugin
+        self.settings = settings or {}
+        self.queue = SimpleQueue()
+        self.client_info: Union[api.ClientInfo, None] = None
+        #: Filter rules pushed from the server for this tenant
+        self.filter_rules: list[dict] = []
+        self.edge_filter = RuleFilter(lambda: self.filter_rules)
+        #: Memory in bytes used by starting this tenant.
+        self.memory = 0
+        #: Set once the token is revoked, the tenant is then skipped until the process restarts.
+        self.disabled = False
+        self.worker: Union["TenantCDRWorker", None] = None
+
+    def __repr__(self):
+        return f"Tenant({self.identifier!r}, plugin={self.plugin!r})"
+
+    def plugins(self) -> list[tuple[Type[BasePlugin], dict]]:
+        """
+        The plugins of the tenant with the overrides for each instance.
+        Quits if a tenant setting is not a setting of any of its plugins.
+        """
+        selected, unknown = [], set(self.settings)
+        for plugin, overrides in get_plugins(self.plugin):
+            hints = typing.get_type_hints(plugin)
+            for key, value in self.settings.items():
+                if key in hints:
+                    unknown.discard(key)
+                    overrides[key] = _cast(hints[key], value)
+
+            overrides.setdefault("instance", f"{self.identifier}:{plugin.__name__}")
+            overrides["edge_filter"] = self.edge_filter
+            selected.append((plugin, overrides))
+
+        if unknown:
+            print(f"Tenant '{self.identifier}' has settings that are not plugin settings: {', '.join(sorted(unknown))}")
+            sys.exit(0)
+        return selected
+
+    def update(self, client_info: api.ClientInfo):
+        """Apply the settings pushed from the server that are kept per tenant."""
+        self.client_info = client_info
+        server_settings = client_info.raw_json.get("settings") or {}
+        self.filter_rules = server_settings.get("filter_rules") or []
+
+    def disable(self, resp: requests.Response):
+        """Disable this tenant only, as its token does not have the required permissions or has been revoked."""
+        logger.warning(
+            "Disabling tenant as the CDR token does not have the required permissions or has been revoked.",
+            extra={
+                "identifier": self.identifier,
+                "url": resp.url,
+                "status_code": resp.status_code,
+            },
+        )
+        self.disabled = True
+        if self.worker is not None:
+            self.worker.quit = True
+
+
+class TenantAPIHandler(api.QuartxAPIHandler):
+    """API handler for the requests of a single tenant, a revoked token disables that tenant only."""
+
+    def __init__(self, tenant: Tenant, session: requests.Session):
+        super().__init__()
+        self.session = session
+        self.tenant = tenant
+
+    def handle_unauthorized(self, resp: requests.Response):
+        # Unlike the base handler, this never revokes the process token or stops the process
+        self.tenant.disable(resp)
+
+
+def load_tenants(path: Union[str, PosixPath]) -> list[Tenant]:
+    """Load the tenants from the tenants file. Quits if the file is missing or invalid."""
+    try:
+        with open(path, "r", encoding="utf8") as stream:
+            data = json.load(stream)
+        tenants = [
+            Tenant(item["identifier"], item["token"], item["plugin"], item.get("settings")) for item in data
+        ]
+    except FileNotFoundError:
+        print(f"The tenants file '{path}' can't be found.")
+        sys.exit(0)
+    except (ValueError, TypeError, KeyError) as err:
+        print(f"The tenants file '{path}' is invalid: {err!r}")
+        sys.exit(0)
+
+    if not tenants:
+        print(f"The tenants file '{path}' has no tenants.")
+        sys.exit(0)
+
+    # Check the plugin spec and settings of every tenant before any are started
+    for tenant in tenants:
+        tenant.plugins()
+    return tenants
+
+
+class TenantCDRWorker(api.CDRWorker):
+    """
+    CDR worker for a single tenant that uses the shared session.
+
+    A revoked token only stops this tenant, not the whole process.
+    """
+
+    def __init__(self, tenant: Tenant, session: requests.Session):
+        super().__init__(tenant.queue, tenant.token)
+        self.name = f"Thread-{self.__class__.__name__}-{tenant.identifier}"
+        self.session = session
+        self.tenant = tenant
+        tenant.worker = self
+
+    def entrypoint(self):
+        super().entrypoint()
+        # Returning would stop the process, so wait for the other tenants instead
+        self.stopped.wait()
+
+    def handle_unauthorized(self, resp: requests.Response):
+        """Stop sending records for this tenant only."""
+        self.tenant.disable(resp)
+
+
+class HostedTenants:
+    """Start and manage the hosted tenants."""
+
+    def __init__(self, tenants: list[Tenant]):
+        self.tenants = tenants
+        self.supervisor = Supervisor()
+        self._process = psutil.Process(os.getpid())
+
+        # One connection pool shared by all tenants, sized so no tenant has to wait on another
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = f"quartx-calllogger/{__version__}"
+        adapter = HTTPAdapter(pool_maxsize=max(10, len(tenants) + 1))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _memory(self) -> int:
+        return self._process.memory_full_info().uss
+
+    def start(self):
+        """Fetch the client info and start the worker and plugins for every tenant."""
+        for tenant in self.tenants:
+            before = self._memory()
+            if not self.start_tenant(tenant):
+                continue
+            tenant.memory = max(0, self._memory() - before)
+            logger.info("Tenant started: %s", tenant.identifier, extra={"memory": tenant.memory})
+
+        self.report_memory()
+        checkin_interval = min(settings.checkin_interval, 30)
+        logger.info("Scheduling checkin of %d tenants every %smin", len(self.tenants), checkin_interval)
+        ThreadTimer(checkin_interval * 60, self.checkin, repeat=True).start()
+
+    def start_tenant(self, tenant: Tenant) -> bool:
+        """Start the worker and plugins of the tenant, returning False if the tenant is disabled."""
+        try:
+            tenant.update(api.ClientInfo.get_client_info(
+                tenant.token, tenant.identifier, apply_settings=False, handler=TenantAPIHandler(tenant, self.session),
+            ))
+        except requests.HTTPError:
+            if not tenant.disabled:
+                raise
+        if tenant.disabled:
+            logger.warning("Tenant not started as it is disabled: %s", tenant.identifier)
+            return False
+
+        self.supervisor.start(partial(TenantCDRWorker, tenant, self.session))
+        for plugin, overrides in tenant.plugins():
+            self.supervisor.start(partial(plugin, _queue=tenant.queue, **overrides))
+        return True
+
+    def checkin(self):
+        """Checkin every tenant using the one scheduler thread."""
+        for tenant in self.tenants:
+            if stopped.is_set():
+                return
+            elif tenant.disabled:
+                continue
+            try:
+                tenant.update(api.ClientInfo.get_client_info(
+                    tenant.token, tenant.identifier, checkin=True, apply_settings=False,
+                    handler=TenantAPIHandler(tenant, self.session),
+                ))
+            except Exception as err:
+                logger.warning("Tenant checkin failed: %s", tenant.identifier, extra={"error": str(err)})
+        self.report_memory()
+
+    def report_memory(self):
+        """Report the memory used by each tenant and the average over the whole process."""
+        average = self._memory() // len(self.tenants)
+        for tenant in self.tenants:
+            telemetry.tenant_memory(
+                tags=dict(tenant=tenant.identifier),
+                fields=dict(startup_bytes=tenant.memory, average_bytes=average, queue_size=tenant.queue.qsize()),
+            ).write()
@@ -0,0 +1,94 @@
+# Standard Lib
+import io
+
+# Third Party
+import pytest
+from pytest_mock import MockerFixture
+
+# Local
+from calllogger.api import phonebook as api_phonebook
+from calllogger.utils import TokenAuth
+from calllogger import phonebook, utils
+
+
+@pytest.fixture
+def datastore(tmp_path, mock_settings, mocker: MockerFixture):
+    mock_settings(datastore=tmp_path)
+    mocker.patch.object(phonebook, "directory", phonebook.Phonebook())
+    return tmp_path
+
+
+def test_sync(requests_mock, datastore):
+    content = "0876153281,Tom Baker,tom@example.com\n"
+    requests_mock.get(api_phonebook.phonebook_url, text=content, headers={"ETag": '"v1"'})
+
+    assert api_phonebook.sync_phonebook(TokenAuth("token")) is True
+    assert datastore.joinpath("phonebook.csv").read_text() == content
+    assert utils.read_datastore(datastore.joinpath("phonebook.etag")) == '"v1"'
+    assert phonebook.directory.lookup("0876153281") == ("Tom Baker", "tom@example.com")
+    assert not datastore.joinpath("phonebook.csv.download").exists()
+
+
+def test_sync_loads_from_file(requests_mock, datastore, mocker: MockerFixture):
+    """Test that the download is loaded from the file a row at a time, the same as at startup."""
+    spy_load = mocker.spy(phonebook, "load_phonebook")
+    requests_mock.get(api_phonebook.phonebook_url, text="101,Office\n")
+    assert api_phonebook.sync_phonebook(TokenAuth("token")) is True
+    spy_load.assert_called_once_with()
+
+
+class BrokenBody(io.RawIOBase):
+    """Response body that fails part way through the download."""
+
+    def __init__(self):
+        self.sent = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.sent:
+            raise ConnectionResetError("connection reset")
+        self.sent = True
+        buffer[:4] = b"101,"
+        return 4
+
+
+def test_download_failed(requests_mock, datastore):
+    """Test that a failed download leaves the phonebook and etag as they were."""
+    datastore.joinpath("phonebook.csv").write_text("101,Office\n")
+    utils.write_datastore(datastore.joinpath("phonebook.etag"), '"v1"')
+    requests_mock.get(api_phonebook.phonebook_url, body=BrokenBody(), headers={"ETag": '"v2"'})
+
+    assert api_phonebook.sync_phonebook(TokenAuth("token")) is False
+    assert datastore.joinpath("phonebook.csv").read_text() == "101,Office\n"
+    assert utils.read_datastore(datastore.joinpath("phonebook.etag")) == '"v1"'
+    assert not datastore.joinpath("phonebook.csv.download").exists()
+
+
+def test_etag_kept_until_loaded(requests_mock, datastore, mocker: MockerFixture):
+    mocker.patch.object(phonebook, "load_phonebook", side_effect=MemoryError)
+    requests_mock.get(api_phonebook.phonebook_url, text="101,Office\n", headers={"ETag": '"v1"'})
+
+    with pytest.raises(MemoryError):
+        api_phonebook.sync_phonebook(TokenAuth("token"))
+    assert not datastore.joinpath("phonebook.etag").exists()
+
+
+def test_sync_sends_etag(requests_mock, datastore):
+    datastore.joinpath("phonebook.csv").write_text("")
+    utils.write_datastore(datastore.joinpath("phonebook.etag"), '"v1"')
+    mocked_request = requests_mock.get(api_phonebook.phonebook_url, status_code=304)
+
+    assert api_phonebook.sync_phonebook(TokenAuth("token")) is False
+    assert mocked_request.last_request.headers["If-None-Match"] == '"v1"'
+
+
+def test_sync_without_phonebook_ignores_etag(requests_mock, datastore):
+    """Test that the phonebook is downloaded in full if the local file is missing."""
+    utils.write_datastore(datastore.joinpath("phonebook.etag"), '"v1"')
+    mocked_request = requests_mock.get(api_phonebook.phonebook_url, text="101,Office\n")
+
+    assert api_phonebook.sync_phonebook(TokenAuth("token")) is True
+    assert "If-None-Match" not in mocked_request.last_request.headers
+    assert not datastore.joinpath("phonebook.etag").exists()
@@ -1,8 +1,65 @@
 # Standard Lib
+from typing import Optional
+import threading
+import socket
 import queue
 
+# Third Party
+from serial import rfc2217
+import serial
+
 
 def call_plugin(plugin):
     """Call plugin with required parameters."""
     call_queue = queue.SimpleQueue()
     return plugin(_queue=call_queue)
+
+
+class RFC2217Server:
+    """
+    Local stand-in for an RFC 2217 serial-to-Ethernet converter, using the server side of pyserial.
+    Data given to :meth:`send` arrives at the client as if read from the serial line.
+    """
+
+    def __init__(self):
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.server.settimeout(5)
+        self.url = f"rfc2217://127.0.0.1:{self.server.getsockname()[1]}"
+        self.conn: Optional[socket.socket] = None
+        self.manager: Optional[rfc2217.PortManager] = None
+        self.connected = threading.Event()
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        try:
+            self.conn, _ = self.server.accept()
+        except OSError:
+            return
+        self.manager = rfc2217.PortManager(serial.serial_for_url("loop://"), self)
+        self.connected.set()
+        while data := self.recv():
+            # Negotiation and port settings are answered by the manager, data for the line is dropped
+            for _ in self.manager.filter(data):
+                pass
+
+    def recv(self) -> bytes:
+        try:
+            return self.conn.recv(1024)
+        except OSError:
+            return b""
+
+    def write(self, data: bytes):
+        self.conn.sendall(data)
+
+    def send(self, data: bytes):
+        self.connected.wait(5)
+        self.write(b"".join(self.manager.escape(data)))
+
+    def close(self):
+        if self.conn is not None and self.conn.fileno() != -1:
+            # Shut down first, a close alone does not interrupt the blocked recv of the serve thread
+            self.conn.shutdown(socket.SHUT_RDWR)
+            self.conn.close()
+        self.server.close()
+        self.thread.join(5)
@@ -10,7 +10,27 @@ import serial
 
 # Local
 from calllogger.plugins.serial import SerialPlugin
+from calllogger.deadletter import dead_letters
 from calllogger import stopped, utils
+from .common import RFC2217Server
+
+
+def pytest_addoption(parser):
+    parser.addoption("--perf", action="store_true", help="Also run the speed tests marked with 'perf'.")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "perf: asserts wall clock speed, only run with --perf")
+
+
+def pytest_collection_modifyitems(config, items):
+    """Speed tests depend on the machine and fail under coverage, so they are opt in."""
+    if config.getoption("--perf"):
+        return
+    skip = pytest.mark.skip(reason="Speed test, run with --perf")
+    for item in items:
+        if "perf" in item.keywords:
+            item.add_marker(skip)
 
 
 @pytest.fixture(autouse=True)
@@ -26,6 +46,13 @@ def reset_stopped():
     stopped.clear()
 
 
+@pytest.fixture(autouse=True)
+def dead_letter_store(monkeypatch, tmp_path):
+    """Keep dead letters out of the real datastore."""
+    monkeypatch.setattr(dead_letters, "_path", tmp_path.joinpath("deadletters.jsonl"))
+    return dead_letters
+
+
 @pytest.fixture
 def disable_sleep(mocker):
     mocked = mocker.patch.object(stopped, "wait")
@@ -59,6 +86,14 @@ def mock_serial(mocker):
     yield mocked.return_value
 
 
+@pytest.fixture
+def rfc2217_server():
+    """Local stand-in for an RFC 2217 serial-to-Ethernet converter."""
+    server = RFC2217Server()
+    yield server
+    server.close()
+
+
 @pytest.fixture
 def mock_settings(mocker):
     def worker(**kwargs):
@@ -0,0 +1,59 @@
+# Third Party
+import pytest
+
+# Local
+from calllogger.plugins.framer import LineFramer
+
+
+@pytest.mark.parametrize("ending", [b"\n", b"\r", b"\r\n"])
+def test_line_endings(ending):
+    framer = LineFramer()
+    assert framer.feed(b"one" + ending + b"two" + ending) == [b"one" + ending, b"two" + ending]
+
+
+def test_partial_line():
+    framer = LineFramer()
+    assert framer.feed(b"first li") == []
+    assert framer.feed(b"ne\nsecond") == [b"first line\n"]
+    assert framer.feed(b" line\n") == [b"second line\n"]
+
+
+def test_crlf_split_across_reads():
+    """Test that a CRLF split over two reads is one line ending, not an extra empty line."""
+    framer = LineFramer()
+    assert framer.feed(b"one\r") == [b"one\r"]
+    assert framer.feed(b"\ntwo\r\n") == [b"two\r\n"]
+
+
+def test_lone_lf_after_cr_only_chunk():
+    framer = LineFramer()
+    assert framer.feed(b"one\r") == [b"one\r"]
+    assert framer.feed(b"\n") == []
+    assert framer.feed(b"\n") == [b"\n"]
+
+
+def test_empty_lines():
+    framer = LineFramer()
+    assert framer.feed(b"\r\n\r\none\r\n") == [b"\r\n", b"\r\n", b"one\r\n"]
+
+
+def test_max_line():
+    framer = LineFramer(max_line=8)
+    assert framer.feed(b"1234") == []
+    assert framer.feed(b"5678") == [b"12345678"]
+    assert framer.feed(b"9\n") == [b"9\n"]
+
+
+def test_reset():
+    framer = LineFramer()
+    framer.feed(b"partial")
+    framer.reset()
+    assert framer.feed(b"line\n") == [b"line\n"]
+
+
+def test_buffer_reused():
+    framer = LineFramer()
+    buffer = framer._buffer
+    framer.feed(b"one\ntw")
+    framer.feed(b"o\n")
+    assert framer._buffer is buffer
@@ -0,0 +1,82 @@
+# Standard Lib
+from datetime import datetime, timezone, timedelta
+import timeit
+
+# Third Party
+import pytest
+
+# Local
+from calllogger.plugins.layout import Layout, Column
+from calllogger.plugins.internal.siemens_serial import SiemensHipathSerial
+from calllogger.record import CallDataRecord
+
+line = "11.04.1900:35:48  1   10400:0100:00:070876153281                           1"
+
+
+def hand_written_parse(validated_line: str) -> CallDataRecord:
+    """The Siemens parser as it was before the layout, used as the benchmark baseline."""
+    call_type = validated_line[74:76].strip()
+    record = CallDataRecord(int(call_type))
+    record.raw = validated_line
+    record.date_str(validated_line[:16], fmt="%d.%m.%y%X", tz=timezone.utc)
+    record.line = validated_line[16:19]
+    record.ext = validated_line[19:25]
+    record.ring = validated_line[25:30]
+    record.duration = validated_line[30:38]
+    record.number = validated_line[38:63]
+    return record
+
+
+def test_siemens_layout_matches_hand_written():
+    record = SiemensHipathSerial.layout(line)
+    assert isinstance(record, CallDataRecord)
+    assert record.__dict__ == hand_written_parse(line).__dict__
+    assert record.date == datetime(2019, 4, 11, 0, 35, 48, tzinfo=timezone.utc)
+    assert record.ext == "104"
+    assert record.number == "0876153281"
+    assert record.call_type == 1
+
+
+def test_converters():
+    layout = Layout(
+        Column("call_type", 0, 2, int),
+        Column("ext", 2, 6, int),
+        Column("number", 6, None, lambda value: value or None),
+        raw=False,
+    )
+    record = layout(" 2 101")
+    assert record.call_type == 2
+    assert record.ext == 101
+    assert record.number is None
+    assert "raw" not in record.__dict__
+    assert record.date.tzinfo is timezone.utc
+
+
+def test_empty_date_column():
+    tz = timezone(timedelta(hours=1))
+    layout = Layout(Column("date", 0, 8, date="%d.%m.%y", tz=tz), Column("call_type", 8, 10, int))
+    assert layout(" " * 8 + " 1").date.tzinfo is tz
+    assert layout("11.04.19 1").date == datetime(2019, 4, 11, tzinfo=tz)
+
+
+def test_width():
+    assert SiemensHipathSerial.layout.width == 76
+    assert Layout(Column("call_type", 0, 2, int), Column("number", 10)).width == 10
+
+
+def test_missing_call_type():
+    with pytest.raises(ValueError):
+        Layout(Column("number", 0, 10))
+
+
+def test_invalid_call_type():
+    with pytest.raises(ValueError):
+        SiemensHipathSerial.layout(line[:74] + "  ")
+
+
+@pytest.mark.perf
+def test_faster_than_hand_written():
+    """The compiled layout needs to beat the hand written parser it replaced."""
+    compiled = min(timeit.repeat(lambda: SiemensHipathSerial.layout.parse(line), number=2_000, repeat=5))
+    baseline = min(timeit.repeat(lambda: hand_written_parse(line), number=2_000, repeat=5))
+    assert compiled < baseline
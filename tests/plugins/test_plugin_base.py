@@ -7,6 +7,7 @@ import pytest
 
 # Local
 from calllogger import plugins, settings
+from calllogger.plugins.internal.multiserial import MultiSerial
 from calllogger.record import CallDataRecord
 
 
@@ -28,6 +29,13 @@ def test_register_plugins(mocker: MockerFixture):
     assert plugins.installed["mockedplugin"] is MockedPlugin
 
 
+def test_register_plugin_without_id(mocker: MockerFixture):
+    """Test that a plugin without a server entry is only registered by name."""
+    mocker.patch.object(plugins, "installed", {})
+    plugins.register_plugins(MockedPlugin, plugins.GenericSMDR, MultiSerial)
+    assert set(plugins.installed) == {"mockedplugin", "1", "genericsmdr", "multiserial"}
+
+
 class TestGetPlugin:
     """Test plugins.get_plugin function."""
 
@@ -49,6 +57,55 @@ class TestGetPlugin:
             plugins.get_plugin(value)
 
 
+class MockedSpecPlugin(plugins.BasePlugin):
+    id = 2
+    host: str = "localhost"
+    spec_setting = "host"
+
+    def entrypoint(self):
+        pass
+
+
+class TestGetPlugins:
+    """Test plugins.get_plugins function."""
+
+    @pytest.fixture(autouse=True)
+    def register_plugin(self, mocker: MockerFixture):
+        mocker.patch.object(plugins, "installed", {})
+        plugins.register_plugins(MockedPlugin, MockedSpecPlugin)
+
+    def test_single_plugin(self):
+        """Test that a single plugin has no instance name, records are not tagged."""
+        assert plugins.get_plugins("mockedplugin") == [(MockedPlugin, {})]
+
+    def test_many_plugins(self):
+        selected = plugins.get_plugins("mockedplugin, mockedspecplugin:10.0.0.5,mockedspecplugin:10.0.0.6")
+        assert selected == [
+            (MockedPlugin, {"instance": "mockedplugin"}),
+            (MockedSpecPlugin, {"host": "10.0.0.5", "instance": "mockedspecplugin:10.0.0.5"}),
+            (MockedSpecPlugin, {"host": "10.0.0.6", "instance": "mockedspecplugin:10.0.0.6"}),
+        ]
+
+    def test_value_is_cast(self):
+        selected = plugins.get_plugins("mockedspecplugin:/dev/ttyUSB1")
+        assert selected[0][1]["host"] == "/dev/ttyUSB1"
+        assert isinstance(selected[0][1]["host"], str)
+
+    def test_value_not_supported(self):
+        """Test that systemexit is raised if the plugin does not accept a spec value."""
+        with pytest.raises(SystemExit):
+            plugins.get_plugins("mockedplugin:value")
+
+    def test_instances_settings_isolated(self):
+        """Test that the settings of one instance do not leak into another."""
+        first = MockedSpecPlugin(_queue=SimpleQueue(), host="first", instance="first")
+        second = MockedSpecPlugin(_queue=SimpleQueue(), host="second", instance="second")
+        assert first.host == "first"
+        assert second.host == "second"
+        assert MockedSpecPlugin.host == "localhost"
+        assert first.name == "Thread-MockedSpecPlugin-first"
+
+
 @pytest.fixture
 def mock_record():
     return CallDataRecord(call_type=1)
@@ -143,3 +200,33 @@ class TestBasePluginSettings:
         plugin = MockedPluginSetting()
         assert plugin.test_value == assert_value
         assert plugin.value == assert_value
+
+
+class TestBasePluginMiddleware:
+    def test_dropped_record(self, mock_record, mocker):
+        """Test that a record dropped by the middleware never reaches the queue."""
+        plugin = MockedPlugin()
+        mocker.patch.object(plugin, "_queue", SimpleQueue())
+        plugin.middleware = lambda record: None
+        plugin.push(mock_record)
+        assert plugin._queue.qsize() == 0
+
+    def test_transformed_record(self, mock_record, mocker):
+        """Test that the record returned by the middleware is the one queued."""
+        plugin = MockedPlugin()
+        mocker.patch.object(plugin, "_queue", SimpleQueue())
+        replacement = CallDataRecord(call_type=2)
+        plugin.middleware = lambda record: replacement
+        plugin.push(mock_record)
+        assert plugin._queue.get() is replacement
+
+    def test_instance_tag(self, mock_record):
+        """Test that records are tagged with the name of the plugin instance."""
+        plugin = MockedPlugin(_queue=SimpleQueue(), instance="beronet:10.0.0.5")
+        plugin.push(mock_record)
+        assert plugin._queue.get().source == "beronet:10.0.0.5"
+
+    def test_no_instance_tag(self, mock_record):
+        plugin = MockedPlugin(_queue=SimpleQueue())
+        plugin.push(mock_record)
+        assert "source" not in plugin._queue.get().__dict__
@@ -1,3 +1,6 @@
+# Standard Lib
+import io
+
 # Third Party
 import pytest
 
@@ -5,7 +8,7 @@ import pytest
 from calllogger.plugins.internal import beronet
 from calllogger.record import CallDataRecord
 from ..common import call_plugin
-from calllogger import stopped
+from calllogger import stopped, telemetry
 
 
 # id 18 = Outgoing
@@ -19,7 +22,13 @@ CDR,32,ISDN:1:1,SIP,100,013231111,100 <sip:013231111@sip.iptel.co>,<sip:01323111
 
 
 @pytest.fixture
-def mock_plugin(mocker, mock_env):
+def datastore(tmp_path, mock_settings):
+    mock_settings(datastore=tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def mock_plugin(mocker, mock_env, datastore):
     mock_env(
         plugin_beronet_ip="192.168.130.20",
         plugin_beronet_user="admin",
@@ -83,3 +92,136 @@ def test_wrong_status_code_no_error(requests_mock, mock_plugin: beronet.BeroNet,
     """Test that the wrong status error gets caught and not cause an error."""
     requests_mock.get(mock_plugin.api_url, status_code=status_code)
     assert mock_plugin.run()  # This should return True if error was caught
+
+
+def test_second_poll_pushes_nothing(requests_mock, mock_plugin: beronet.BeroNet, datastore):
+    requests_mock.get(mock_plugin.api_url, status_code=200, content=good_lines)
+    mock_plugin.process_cdr(mock_plugin.collect_cdr())
+    mock_plugin.process_cdr(mock_plugin.collect_cdr())
+    assert mock_plugin._queue.qsize() == len(good_lines.splitlines())
+    assert mock_plugin.hwm_store == datastore.joinpath("beronet-192.168.130.20.hwm")
+
+
+def test_mark_per_instance(mock_plugin: beronet.BeroNet, datastore):
+    """Test that hosted tenants with gateways on the same private IP keep separate marks."""
+    first = beronet.BeroNet(_queue=mock_plugin._queue, instance="VIRTUAL-0001:BeroNet")
+    second = beronet.BeroNet(_queue=mock_plugin._queue, instance="VIRTUAL-0002:BeroNet")
+    assert first.hwm_store == datastore.joinpath("beronet-VIRTUAL-0001_BeroNet-192.168.130.20.hwm")
+    assert len({mock_plugin.hwm_store, first.hwm_store, second.hwm_store}) == 3
+
+
+def test_only_new_calls_pushed(requests_mock, mock_plugin: beronet.BeroNet, datastore):
+    lines = good_lines.splitlines()
+    requests_mock.get(mock_plugin.api_url, status_code=200, content=b"\n".join(lines[:2]))
+    mock_plugin.process_cdr(mock_plugin.collect_cdr())
+    assert mock_plugin._queue.qsize() == 2
+
+    # A fresh plugin resumes from the mark in the datastore
+    plugin = call_plugin(beronet.BeroNet)
+    requests_mock.get(mock_plugin.api_url, status_code=200, content=good_lines)
+    plugin.process_cdr(plugin.collect_cdr())
+    assert plugin._queue.qsize() == 2
+    assert plugin._queue.get().date.day == 23
+
+
+def test_calls_ending_at_the_mark(mock_plugin: beronet.BeroNet, datastore):
+    """Test that a new call ending the same second as the mark is still pushed."""
+    first = good_lines.splitlines()[3].decode().split(",")
+    second = first.copy()
+    second[1] = "33"
+    mock_plugin.process_cdr([first])
+    mock_plugin.process_cdr([first, second])
+    assert mock_plugin._queue.qsize() == 2
+    assert mock_plugin.hwm == ("23/07/23-14:12:33", frozenset(map(mock_plugin.call_hash, [first, second])))
+
+
+def test_broken_mark_pushes_everything(requests_mock, mock_plugin: beronet.BeroNet, datastore):
+    mock_plugin.hwm_store.write_bytes(b"not base64")
+    requests_mock.get(mock_plugin.api_url, status_code=200, content=good_lines)
+    mock_plugin.process_cdr(mock_plugin.collect_cdr())
+    assert mock_plugin._queue.qsize() == len(good_lines.splitlines())
+
+
+def test_resume_disabled(requests_mock, mock_plugin: beronet.BeroNet, datastore):
+    mock_plugin.beronet_resume = False
+    requests_mock.get(mock_plugin.api_url, status_code=200, content=good_lines)
+    mock_plugin.process_cdr(mock_plugin.collect_cdr())
+    mock_plugin.process_cdr(mock_plugin.collect_cdr())
+    assert mock_plugin._queue.qsize() == len(good_lines.splitlines()) * 2
+    assert not mock_plugin.hwm_store.exists()
+
+
+class SlowBody(io.BytesIO):
+    """Response body that keeps track of how much of the download was done as records are pushed."""
+    def __init__(self, data: bytes, queue):
+        super().__init__(data)
+        self.queue = queue
+        self.pushed_while_reading = []
+
+    def read(self, size=-1):
+        self.pushed_while_reading.append(self.queue.qsize())
+        return super().read(size)
+
+
+def test_streamed(requests_mock, mock_plugin: beronet.BeroNet):
+    """Test that calls are pushed while the CDR is still downloading."""
+    mock_plugin.chunk_size = 64
+    body = SlowBody(good_lines, mock_plugin._queue)
+    requests_mock.get(mock_plugin.api_url, status_code=200, body=body)
+
+    cdr = mock_plugin.collect_cdr()
+    assert body.pushed_while_reading == []  # Nothing is read until the calls are processed
+    mock_plugin.process_cdr(cdr)
+
+    assert mock_plugin._queue.qsize() == len(good_lines.splitlines())
+    assert 0 < max(body.pushed_while_reading) < mock_plugin._queue.qsize()
+    assert body.closed
+
+
+def test_not_modified_skipped(requests_mock, mock_plugin: beronet.BeroNet, mocker):
+    spy_polls = mocker.spy(telemetry, "beronet_polls")
+    headers = {"ETag": '"v1"', "Last-Modified": "Sun, 23 Jul 2023 14:12:33 GMT"}
+    requests_mock.get(mock_plugin.api_url, status_code=200, content=good_lines, headers=headers)
+    mock_plugin.process_cdr(mock_plugin.collect_cdr())
+
+    requests_mock.get(mock_plugin.api_url, status_code=304)
+    assert mock_plugin.collect_cdr() == []
+    sent = requests_mock.last_request.headers
+    assert (sent["If-None-Match"], sent["If-Modified-Since"]) == ('"v1"', headers["Last-Modified"])
+    assert spy_polls.call_args.kwargs["tags"]["result"] == "unchanged"
+
+
+sized = {"Content-Length": str(len(good_lines))}
+
+
+def test_head_content_length(requests_mock, mock_plugin: beronet.BeroNet):
+    """Test that a gateway without validators is checked with a HEAD request."""
+    requests_mock.get(mock_plugin.api_url, status_code=200, content=good_lines, headers=sized)
+    mock_plugin.process_cdr(mock_plugin.collect_cdr())
+    assert mock_plugin.content_length == len(good_lines)
+
+    head = requests_mock.head(mock_plugin.api_url, headers=sized)
+    assert mock_plugin.collect_cdr() == []
+    assert head.called and requests_mock.call_count == 2
+
+    head = requests_mock.head(mock_plugin.api_url, headers={"Content-Length": str(len(good_lines) + 10)})
+    assert list(mock_plugin.collect_cdr())
+    assert requests_mock.call_count == 4
+
+
+def test_head_not_supported(requests_mock, mock_plugin: beronet.BeroNet):
+    requests_mock.get(mock_plugin.api_url, status_code=200, content=good_lines, headers=sized)
+    mock_plugin.process_cdr(mock_plugin.collect_cdr())
+    requests_mock.head(mock_plugin.api_url, status_code=405)
+
+    assert list(mock_plugin.collect_cdr())
+    assert not mock_plugin.head_supported
+    assert list(mock_plugin.collect_cdr())
+    assert [request.method for request in requests_mock.request_history] == ["GET", "HEAD", "GET", "GET"]
+
+
+def test_partial_download_not_remembered(requests_mock, mock_plugin: beronet.BeroNet):
+    """Test that a download that was not read to the end is not used to skip the next poll."""
+    requests_mock.get(mock_plugin.api_url, status_code=200, content=good_lines, headers={"ETag": '"v1"'})
+    next(mock_plugin.collect_cdr())
+    assert mock_plugin.validators == {}
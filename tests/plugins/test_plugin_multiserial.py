@@ -0,0 +1,180 @@
+# Standard Lib
+from queue import SimpleQueue
+import time
+import os
+import pty
+
+# Third Party
+import pytest
+
+# Local
+from calllogger.plugins.internal.multiserial import MultiSerial
+from calllogger.plugins import SiemensHipathSerial, GenericSMDR
+from calllogger import stopped
+
+siemens_line = b"11.04.1900:35:48  1   10400:0100:00:070876153281                           1\r\n"
+smdr_line = b"104,0876153281,2\r\n"
+
+
+@pytest.fixture
+def ptys():
+    """Two pseudo terminals standing in for the serial ports, yields (master fd, port path) pairs."""
+    pairs = []
+    for _ in range(2):
+        master, slave = pty.openpty()
+        pairs.append((master, slave, os.ttyname(slave)))
+    yield [(master, path) for master, _, path in pairs]
+    for master, slave, _ in pairs:
+        os.close(master)
+        os.close(slave)
+
+
+@pytest.fixture
+def plugin(ptys) -> MultiSerial:
+    (_, siemens_port), (_, smdr_port) = ptys
+    plugin = MultiSerial(_queue=SimpleQueue(), serial_ports=[
+        {"port": siemens_port, "plugin": "SiemensHipathSerial"},
+        {"port": smdr_port, "plugin": "GenericSMDR", "smdr_fields": '["ext", "number", "call_type"]'},
+    ])
+    yield plugin
+    for parser in plugin.parsers:
+        parser.sserver.close()
+
+
+def drain(queue: SimpleQueue) -> list:
+    records = []
+    while not queue.empty():
+        records.append(queue.get())
+    return records
+
+
+def test_parsers(plugin, ptys):
+    assert [type(parser) for parser in plugin.parsers] == [SiemensHipathSerial, GenericSMDR]
+    assert [parser.instance for parser in plugin.parsers] == [path for _, path in ptys]
+    assert all(parser._queue is plugin._queue for parser in plugin.parsers)
+
+
+def test_lines_from_each_port(plugin, ptys):
+    (siemens_master, siemens_port), (smdr_master, smdr_port) = ptys
+    plugin.poll(timeout=0)
+    os.write(siemens_master, siemens_line + siemens_line[:20])
+    os.write(smdr_master, smdr_line)
+    for _ in range(3):
+        plugin.poll(timeout=0.1)
+
+    records = drain(plugin._queue)
+    assert sorted((record.source, record.number) for record in records) == [
+        (siemens_port, "0876153281"),
+        (smdr_port, "0876153281"),
+    ]
+
+    # The rest of the partial line arrives later
+    os.write(siemens_master, siemens_line[20:])
+    plugin.poll(timeout=0.1)
+    assert [record.source for record in drain(plugin._queue)] == [siemens_port]
+
+
+def test_failed_port_does_not_block_others(plugin, ptys, mocker):
+    """Test that a port that fails to open is retried later while the other port keeps working."""
+    (_, _), (smdr_master, smdr_port) = ptys
+    siemens = plugin.parsers[0]
+    mocker.patch.object(siemens.sserver, "open", side_effect=OSError("gone"))
+
+    plugin.poll(timeout=0)
+    assert not siemens.sserver.is_open
+    assert plugin.reconnect_at[siemens.instance] > 0
+
+    os.write(smdr_master, smdr_line)
+    plugin.poll(timeout=0.1)
+    assert [record.source for record in drain(plugin._queue)] == [smdr_port]
+    assert siemens.sserver.open.call_count == 1
+
+
+def test_read_error_reconnects(plugin, mocker):
+    plugin.poll(timeout=0)
+    siemens = plugin.parsers[0]
+    mocker.patch.object(siemens.sserver, "read", side_effect=OSError("unplugged"))
+
+    plugin.read_port(siemens)
+    assert not siemens.sserver.is_open
+    assert siemens.instance not in plugin.fds
+
+    plugin.reconnect_at[siemens.instance] = 0
+    plugin.connect()
+    assert siemens.instance in plugin.fds
+
+
+def test_rfc2217_port(rfc2217_server):
+    """Test that a port without a file descriptor for the selector is polled, and reconnected once it drops."""
+    plugin = MultiSerial(_queue=SimpleQueue(), serial_ports=[{"port": rfc2217_server.url}])
+    parser = plugin.parsers[0]
+    try:
+        plugin.poll(timeout=0)
+        assert parser.sserver.is_open
+        assert plugin.polled == {parser}
+
+        rfc2217_server.send(siemens_line)
+        deadline = time.monotonic() + 1
+        while plugin._queue.empty() and time.monotonic() < deadline:
+            plugin.poll(timeout=0.01)
+        assert [record.number for record in drain(plugin._queue)] == ["0876153281"]
+
+        # The converter drops the connection
+        rfc2217_server.close()
+        deadline = time.monotonic() + 1
+        while parser.sserver.is_open and time.monotonic() < deadline:
+            plugin.poll(timeout=0.01)
+        assert not parser.sserver.is_open
+        assert not plugin.polled
+    finally:
+        parser.sserver.close()
+
+
+@pytest.mark.parametrize("serial_ports", [
+    [],
+    [{"plugin": "SiemensHipathSerial"}],
+    [{"port": "/dev/ttyUSB0", "plugin": "BeroNet"}],
+])
+def test_invalid_ports(serial_ports):
+    with pytest.raises(SystemExit):
+        MultiSerial(_queue=SimpleQueue(), serial_ports=serial_ports)
+
+
+def test_replugged_device_reopened(tmp_path, ptys):
+    """Test that an unplugged device is reopened as soon as its by-id link is back, even under a new name."""
+    (_, first_port), (second_master, second_port) = ptys
+    by_id = tmp_path.joinpath("usb-FTDI_FT232R-if00-port0")
+    by_id.symlink_to(first_port)
+    plugin = MultiSerial(_queue=SimpleQueue(), serial_ports=[{"port": str(by_id), "plugin": "SiemensHipathSerial"}])
+    parser = plugin.parsers[0]
+    plugin.poll(timeout=0)
+    assert parser.sserver.is_open
+
+    # Unplugged, the port is closed and not retried while the device is gone
+    by_id.unlink()
+    plugin.close_port(parser)
+    plugin.poll(timeout=0)
+    assert plugin.unplugged == {str(by_id)}
+
+    # Plugged back in and enumerated as a different tty, opened without waiting out the timeout
+    by_id.symlink_to(second_port)
+    plugin.poll(timeout=0)
+    assert parser.sserver.is_open
+    assert not plugin.unplugged
+
+    os.write(second_master, siemens_line)
+    plugin.poll(timeout=0.1)
+    assert [record.number for record in drain(plugin._queue)] == ["0876153281"]
+    parser.sserver.close()
+
+
+def test_stops_quickly(plugin):
+    """Test that the thread stops within 100ms of shutdown with no serial traffic, closing every port."""
+    plugin.start()
+    time.sleep(0.1)
+    stopped.set()
+    start = time.monotonic()
+    plugin.join(timeout=1)
+    assert not plugin.is_alive()
+    assert time.monotonic() - start < 0.1
+    assert not any(parser.sserver.is_open for parser in plugin.parsers)
@@ -1,15 +1,21 @@
 # Standard Lib
+from pathlib import PosixPath
+import socket
+import queue
 import time
+import pty
+import os
 
 # Third Party
 import pytest
 import serial
 
 # Local
-from calllogger.plugins import SerialPlugin
+from calllogger.plugins import SerialPlugin, serial as serial_plugin
 from calllogger.record import CallDataRecord
+from calllogger.conf import serial_port
 from ..common import call_plugin
-from calllogger import stopped
+from calllogger import stopped, capture, closeers
 
 
 # noinspection PyAbstractClass
@@ -43,53 +49,74 @@ def test_open_serial_exception(mock_serial, mock_plugin, disable_sleep):
 
 
 def test_read_serial_line_exception(mock_serial, mock_plugin, mocker, disable_sleep):
-    mock_serial.readline.side_effect = serial.SerialException
+    mock_serial.read.side_effect = serial.SerialException
     spy_decode = mocker.spy(mock_plugin, "decode")
     mock_plugin.run()
 
-    assert mock_serial.readline.called
+    assert mock_serial.read.called
     assert not mock_serial.is_open
     assert mock_serial.close.called
     assert not spy_decode.called
 
 
 def test_dateline(mock_serial, mock_plugin):
-    mock_serial.readline.return_value = b"raw data line"
+    mock_serial.read.return_value = b"raw data line\n"
     mock_plugin.run()
 
-    assert mock_serial.readline.called
-    assert mock_serial.is_open
-    assert not mock_serial.close.called
+    assert mock_serial.read.called
+    # Only closed when the plugin stops
+    mock_serial.close.assert_called_once()
 
 
 def test_failed_decode(mock_serial, mock_plugin, mocker):
-    mock_serial.readline.return_value = b"raw data line"
+    mock_serial.read.return_value = b"raw data line\n"
     mocker.patch.object(mock_plugin, "decode", side_effect=UnicodeDecodeError)
     spy_validate = mocker.spy(mock_plugin, "validate")
     mock_plugin.run()
 
-    assert mock_serial.readline.called
-    assert mock_serial.is_open
+    assert mock_serial.read.called
+    mock_serial.close.assert_called_once()
     assert not spy_validate.called
 
 
 @pytest.mark.parametrize("return_value", [False, ""])
 def test_failed_validate(mock_serial, mock_plugin, mocker, return_value):
-    mock_serial.readline.return_value = b"raw data line"
+    mock_serial.read.return_value = b"raw data line\n"
     mocker.patch.object(mock_plugin, "validate", return_value=return_value)
     mock_plugin.run()
 
-    assert mock_serial.readline.called
-    assert mock_serial.is_open
+    assert mock_serial.read.called
+    mock_serial.close.assert_called_once()
+
+
+@pytest.mark.parametrize("method, stage", [("decode", "decode"), ("validate", "validation"), ("parse", "parse")])
+def test_dead_letter(mock_serial, mock_plugin, mocker, dead_letter_store, method, stage):
+    """Test that the raw line is stored with the failing stage."""
+    mock_serial.read.return_value = b"raw data line\n"
+    mocker.patch.object(mock_plugin, method, side_effect=ValueError("bad line"))
+    mock_plugin.run()
+
+    letters = dead_letter_store.read()
+    assert len(letters) == 1
+    assert letters[0].raw == b"raw data line\n"
+    assert letters[0].stage == stage
+    assert letters[0].plugin == "MockPlugin"
+    assert letters[0].error == "ValueError: bad line"
+
+
+def test_empty_line_not_dead_letter(mock_serial, mock_plugin, mocker, dead_letter_store):
+    mock_serial.read.return_value = b"\r\n"
+    mock_plugin.run()
+    assert len(dead_letter_store) == 0
 
 
 def test_invalid_parse_object(mock_serial, mock_plugin, mocker):
-    mock_serial.readline.return_value = b"raw data line"
+    mock_serial.read.return_value = b"raw data line\n"
     mocker.patch.object(mock_plugin, "parse", return_value=False)
     mock_plugin.run()
 
-    assert mock_serial.readline.called
-    assert mock_serial.is_open
+    assert mock_serial.read.called
+    mock_serial.close.assert_called_once()
 
 
 @pytest.mark.parametrize("dockerized", [False, True])
@@ -97,3 +124,247 @@ def test_none_existing_port(mock_port, mock_settings, dockerized):
     mock_port.exists.return_value = False
     mock_settings(dockerized=dockerized)
     MockPlugin()
+
+
+def test_burst_read_once(mock_serial, mock_plugin, mocker):
+    """Test that a burst of records is taken in one read and every line is pushed."""
+    mock_serial.in_waiting = 300
+    mock_serial.read.return_value = b"line one\r\nline two\r\nline three\r\n"
+    spy_push = mocker.patch.object(mock_plugin, "push")
+    mock_plugin.run()
+
+    mock_serial.read.assert_called_once_with(300)
+    assert spy_push.call_count == 3
+
+
+def test_block_for_first_byte(mock_serial, mock_plugin):
+    mock_serial.in_waiting = 0
+    mock_serial.read.return_value = b"x"
+    mock_plugin.run()
+    mock_serial.read.assert_called_once_with(1)
+
+
+def test_failed_line_does_not_stop_burst(mock_serial, mock_plugin, mocker):
+    mock_serial.read.return_value = b"line one\nline two\n"
+    mocker.patch.object(mock_plugin, "validate", side_effect=[False, "line two"])
+    spy_push = mocker.patch.object(mock_plugin, "push")
+    mock_plugin.run()
+    assert spy_push.call_count == 1
+
+
+def test_partial_line_kept(mock_serial, mock_plugin, mocker):
+    mocker.patch.object(stopped, "is_set", side_effect=[False, False, True])
+    mock_serial.read.side_effect = [b"raw da", b"ta line\n"]
+    spy_parse = mocker.spy(mock_plugin, "parse")
+    mock_plugin.run()
+    spy_parse.assert_called_once_with("raw data line")
+
+
+def test_reopen_drops_partial_line(mock_serial, mock_plugin, mocker):
+    mock_serial.configure_mock(is_open=False)
+    spy_reset = mocker.spy(mock_plugin.framer, "reset")
+    mock_serial.read.return_value = b""
+    mock_plugin.run()
+    assert spy_reset.called
+
+
+def test_capture_disabled(mock_plugin):
+    assert mock_plugin.capture is None
+
+
+def test_capture_raw_data(mock_serial, mock_settings, tmp_path):
+    """Test that the raw data is captured as read, before it's split into lines."""
+    mock_settings(capture_size=100_000, datastore=tmp_path)
+    plugin = call_plugin(MockPlugin)
+    assert plugin.frame(b"line one\r\nline ") == [b"line one\r\n"]
+    plugin.capture.close()
+
+    frames = capture.read_frames(capture.segments(capture.capture_dir()))
+    assert [chunk for _, chunk in frames] == [b"line one\r\nline "]
+
+
+def test_capture_closed_on_exit(mock_serial, mock_settings, tmp_path, mocker):
+    """Test that a failed plugin finishes its segment, so the size limit can remove it later."""
+    mock_settings(capture_size=100_000, datastore=tmp_path)
+    plugin = call_plugin(MockPlugin)
+    mock_serial.read.return_value = b"line one\r\n"
+    mocker.patch.object(plugin, "handle_line", side_effect=RuntimeError("bug"))
+
+    with pytest.raises(RuntimeError):
+        plugin.entrypoint()
+    assert plugin.capture._stream is None
+    assert plugin.capture.close not in closeers
+    assert not capture._open_segments
+    mock_serial.close.assert_called_once()
+
+
+def test_no_scope_per_line(mock_serial, mock_plugin, mocker):
+    """Test that the sentry scope is only built when a line fails."""
+    mocked_scope = mocker.patch.object(serial_plugin, "push_scope")
+    mock_serial.read.return_value = b"line one\r\nline two\r\n"
+    mock_plugin.run()
+    assert not mocked_scope.called
+    assert len(mock_plugin.stage_values) == 6
+
+
+def test_error_context(mock_serial, mock_plugin, mocker):
+    mocked_capture = mocker.patch.object(serial_plugin, "capture_exception")
+    mocker.patch.object(mock_plugin, "parse", side_effect=[ValueError("bad line")])
+    mock_serial.read.return_value = b"raw line\r\n"
+    mock_plugin.run()
+
+    scope = mocked_capture.call_args.kwargs["scope"]
+    assert scope._extras["raw_line"] == repr(b"raw line\r\n")
+    assert scope._extras["decoded_line"] == "raw line\r\n"
+    assert scope._extras["validated_line"] == "raw line"
+    assert scope._contexts["Serial Interface"]["port"] == str(mock_plugin.port)
+
+
+def test_context_ring_bounded(mock_plugin):
+    for _ in range(10):
+        mock_plugin.process_line(b"line\n")
+    assert len(mock_plugin.stage_values) == mock_plugin.context_size
+    assert mock_plugin.line_context() == {
+        "raw_line": repr(b"line\n"), "decoded_line": "line\n", "validated_line": "line",
+    }
+
+
+@pytest.fixture
+def tcp_server():
+    """Local stand-in for a serial-to-Ethernet converter."""
+    server = socket.create_server(("127.0.0.1", 0))
+    server.settimeout(5)
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def network_plugin(tcp_server):
+    plugin = MockPlugin(_queue=queue.SimpleQueue(), port=f"socket://127.0.0.1:{tcp_server.getsockname()[1]}")
+    yield plugin
+    plugin.sserver.close()
+
+
+def test_network_port(tcp_server, network_plugin):
+    network_plugin.connect()
+    conn, _ = tcp_server.accept()
+    with conn:
+        assert network_plugin.sserver._socket.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+
+        # Everything waiting is taken in one read, the partial line is kept for the next
+        conn.sendall(b"line one\r\nline two\r\nline th")
+        time.sleep(0.05)
+        assert network_plugin.read_lines() == [b"line one\r\n", b"line two\r\n"]
+        conn.sendall(b"ree\r\n")
+        assert network_plugin.read_lines() == [b"line three\r\n"]
+
+
+def test_network_port_reconnect(tcp_server, network_plugin, disable_sleep):
+    """Test that a dropped connection is closed with a backoff and reopened by the next read."""
+    network_plugin.connect()
+    conn, _ = tcp_server.accept()
+    conn.close()
+
+    with pytest.raises(serial.SerialException):
+        network_plugin.read_lines()
+    assert not network_plugin.sserver.is_open
+    assert disable_sleep.called
+
+    network_plugin.connect()
+    conn, _ = tcp_server.accept()
+    with conn:
+        conn.sendall(b"line one\n")
+        assert network_plugin.read_lines() == [b"line one\n"]
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("/dev/ttyUSB0", PosixPath("/dev/ttyUSB0")),
+    ("/dev/serial/by-id/usb-FTDI-if00-port0", PosixPath("/dev/serial/by-id/usb-FTDI-if00-port0")),
+    ("socket://10.0.0.5:4001", "socket://10.0.0.5:4001"),
+    ("rfc2217://10.0.0.5:4001", "rfc2217://10.0.0.5:4001"),
+])
+def test_port_setting(value, expected):
+    assert serial_port(value) == expected
+
+
+def test_unplugged_device_waited_on(mock_serial, mock_port, mock_plugin, disable_sleep, mocker):
+    """Test that an unplugged device is reopened as soon as it's back, instead of after the timeout decay."""
+    mock_serial.open.side_effect = serial.SerialException
+    mock_serial.configure_mock(is_open=False)
+    mock_port.exists.side_effect = [False, False, True]
+    spy_timeout = mocker.spy(mock_plugin.timeout, "sleep")
+    mock_plugin.run()
+
+    assert not spy_timeout.called
+    disable_sleep.assert_called_with(mock_plugin.hotplug_interval)
+    assert disable_sleep.call_count == 1
+
+
+def test_unplugged_while_reading(mock_serial, mock_port, mock_plugin, disable_sleep, mocker):
+    mock_serial.read.side_effect = serial.SerialException
+    mock_port.exists.return_value = False
+    disable_sleep.return_value = True
+    spy_timeout = mocker.spy(mock_plugin.timeout, "sleep")
+    mock_plugin.run()
+
+    assert not spy_timeout.called
+    assert mock_serial.close.called
+
+
+def test_backoff_when_present(mock_serial, mock_plugin, disable_sleep, mocker):
+    """A device that is plugged in but fails still backs off with the timeout decay."""
+    mock_serial.open.side_effect = serial.SerialException
+    mock_serial.configure_mock(is_open=False)
+    spy_timeout = mocker.spy(mock_plugin.timeout, "sleep")
+    mock_plugin.run()
+    assert spy_timeout.called
+
+
+@pytest.fixture
+def quiet_pty():
+    """A pseudo terminal with no traffic, yields the port path."""
+    master, slave = pty.openpty()
+    yield PosixPath(os.ttyname(slave))
+    os.close(master)
+    os.close(slave)
+
+
+def test_quiet_line_stops_quickly(quiet_pty):
+    """Test that the plugin stops within 100ms of shutdown while waiting on a quiet line."""
+    plugin = MockPlugin(_queue=queue.SimpleQueue(), port=quiet_pty)
+    plugin.start()
+    time.sleep(0.1)
+    assert plugin.sserver.is_open
+
+    stopped.set()
+    start = time.monotonic()
+    plugin.join(timeout=1)
+    assert not plugin.is_alive()
+    assert time.monotonic() - start < 0.1
+    # The port is released for a restarted plugin
+    assert not plugin.sserver.is_open
+
+
+def test_quiet_network_port(tcp_server, network_plugin):
+    network_plugin.connect()
+    conn, _ = tcp_server.accept()
+    with conn:
+        start = time.monotonic()
+        assert network_plugin.read_waiting() == b""
+        assert time.monotonic() - start < 0.1
+
+
+def test_rfc2217_port(rfc2217_server, mock_settings):
+    """Test that a port without a file descriptor connects and reads with the link stats enabled."""
+    mock_settings(collect_metrics=True, serial_stats_interval=60)
+    plugin = MockPlugin(_queue=queue.SimpleQueue(), port=rfc2217_server.url)
+    try:
+        plugin.connect()
+        assert plugin.stats.fd is None
+
+        rfc2217_server.send(b"line one\r\nline two\r\n")
+        time.sleep(0.05)
+        assert plugin.read_lines() == [b"line one\r\n", b"line two\r\n"]
+        assert plugin.stats.lines == 2
+    finally:
+        plugin.sserver.close()
@@ -196,7 +196,7 @@ def test_full_serial_parser_good_lines(
         raw_line
 ):
     """Test that all sorts of mocked call types work and DO not raise an exception."""
-    mock_serial.readline.return_value = raw_line
+    mock_serial.read.return_value = raw_line + b"\r\n"
     spy_push = mocker.patch.object(mock_plugin, "push")
     spy_parse = mocker.patch.object(mock_plugin, "parse")
     spy_validate = mocker.patch.object(mock_plugin, "validate")
@@ -206,4 +206,4 @@ def test_full_serial_parser_good_lines(
     assert spy_push.call_count == 1
     assert spy_parse.call_count == 1
     assert spy_validate.call_count == 1
-    assert mock_serial.readline.call_count == 1
+    assert mock_serial.read.call_count == 1
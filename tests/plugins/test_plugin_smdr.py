@@ -0,0 +1,101 @@
+# Standard Lib
+from datetime import datetime, timezone
+from queue import SimpleQueue
+import time
+
+# Third Party
+import pytest
+
+# Local
+from calllogger.plugins.internal.smdr import GenericSMDR
+from calllogger.plugins.serial import EmptyLine, ParseError
+
+pattern = (
+    r"^(?P<date>\d\d/\d\d/\d\d \d\d:\d\d) +(?P<duration>\d\d:\d\d:\d\d) +"
+    r"(?P<ext>\d+) +(?P<number>\+?\d+)? +(?P<call_type>[IO])"
+)
+converters = {"date": "date:%d/%m/%y %H:%M", "duration": "seconds", "call_type": {"I": 1, "O": 2}}
+line = b"11/04/19 09:35 00:01:07 104 0876153281 I\r\n"
+
+
+@pytest.fixture(autouse=True)
+def mock_port(mock_serial_port):
+    return mock_serial_port
+
+
+def make_plugin(**settings) -> GenericSMDR:
+    return GenericSMDR(_queue=SimpleQueue(), **settings)
+
+
+@pytest.fixture
+def regex_plugin() -> GenericSMDR:
+    return make_plugin(smdr_pattern=pattern, smdr_converters=converters, smdr_prefix="")
+
+
+def test_regex(regex_plugin):
+    record = regex_plugin.process_line(line)
+    assert record.call_type == 1
+    assert record.date == datetime(2019, 4, 11, 9, 35, tzinfo=timezone.utc)
+    assert record.duration == 67
+    assert record.ext == "104"
+    assert record.number == "0876153281"
+    assert record.raw == line.decode().strip()
+
+
+def test_optional_group(regex_plugin):
+    record = regex_plugin.process_line(b"11/04/19 09:35 00:01:07 104  O")
+    assert record.call_type == 2
+    assert "number" not in record.__dict__
+
+
+def test_no_match(regex_plugin):
+    with pytest.raises(ParseError):
+        regex_plugin.process_line(b"----- Daily report -----")
+
+
+def test_delimited():
+    plugin = make_plugin(
+        smdr_pattern="",
+        smdr_delimiter=";",
+        smdr_fields=["call_type", "", "ext", "number", "ring"],
+        smdr_converters={"ring": "int"},
+    )
+    record = plugin.process_line(b"1;trunk 2;104; 0876153281;5\n")
+    assert record.call_type == 1
+    assert record.ext == "104"
+    assert record.number == "0876153281"
+    assert record.ring == 5
+    assert record.date.tzinfo is timezone.utc
+
+    with pytest.raises(ParseError):
+        plugin.process_line(b"1;trunk 2")
+
+
+def test_prefix_rejects_noise(mocker, dead_letter_store):
+    plugin = make_plugin(smdr_pattern=pattern, smdr_converters=converters, smdr_prefix="1")
+    spy_split = mocker.spy(plugin, "_split")
+    with pytest.raises(EmptyLine):
+        plugin.process_line(b"Station Message Detail Recording")
+    assert not spy_split.called
+    assert len(dead_letter_store) == 0
+
+
+@pytest.mark.parametrize("settings", [
+    dict(smdr_pattern="(?P<call_type>"),
+    dict(smdr_pattern=r"(?P<unknown>\d+) (?P<call_type>\d)"),
+    dict(smdr_pattern=r"(?P<ext>\d+)"),
+    dict(smdr_pattern=r"(?P<call_type>\d)", smdr_converters={"call_type": "unknown"}),
+])
+def test_invalid_settings(settings):
+    with pytest.raises(SystemExit):
+        make_plugin(**settings)
+
+
+@pytest.mark.perf
+def test_throughput(regex_plugin):
+    """The generic plugin needs to sustain at least 50k lines a second."""
+    count = 20_000
+    start = time.perf_counter()
+    for _ in range(count):
+        regex_plugin.process_line(line)
+    assert count / (time.perf_counter() - start) > 50_000
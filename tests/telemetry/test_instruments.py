@@ -94,3 +94,12 @@ def test_histogram():
     line = histogram.to_line_protocol()
     assert line.startswith("event_metric value=0.052")
     assert len(collector.queue) == queue_count + 1
+
+
+def test_counter_tags():
+    """Test that each set of tags gets its own running total."""
+    Counter("tagged_counter", collector, tags=dict(rule="first")).inc()
+    Counter("tagged_counter", collector, tags=dict(rule="first")).inc()
+    counter = Counter("tagged_counter", collector, tags=dict(rule="second"))
+    counter.inc()
+    assert counter.to_line_protocol().startswith("tagged_counter,rule=second value=1i")
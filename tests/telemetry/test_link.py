@@ -0,0 +1,116 @@
+# Standard lib
+from queue import SimpleQueue
+import os
+import pty
+
+# Third Party
+from pytest_mock import MockerFixture
+import pytest
+
+# Local
+from calllogger.telemetry.link import SerialStats, read_icounter, icounter
+from calllogger.telemetry import link, collector
+from calllogger.plugins import SiemensHipathSerial
+
+siemens_line = b"11.04.1900:35:48  1   10400:0100:00:070876153281                           1\r\n"
+
+
+@pytest.fixture
+def points(mocker: MockerFixture):
+    """Collect the points written, as (tags, fields) pairs."""
+    written = []
+
+    def metric(tags, fields):
+        point = mocker.Mock()
+        point.write.side_effect = lambda: written.append((tags, fields))
+        return point
+    return metric, written
+
+
+def test_aggregated_per_interval(points):
+    metric, written = points
+    stats = SerialStats("/dev/ttyUSB0", metric, interval=10, now=0.0)
+    stats.read(b"line one\r\nline t", [b"line one\r\n"], now=1.0)
+    stats.read(b"wo\r\nline three\r\n", [b"line two\r\n", b"line three\r\n"], now=3.0)
+    stats.read(b"", [], now=5.0)
+    stats.control_chars += 2
+    assert not written
+
+    stats.read(b"line four\r\n", [b"line four\r\n"], now=10.0)
+    assert len(written) == 1
+    tags, fields = written[0]
+    assert tags == {"port": "/dev/ttyUSB0"}
+    assert fields["bytes_per_sec"] == pytest.approx(43 / 10)
+    assert fields["lines_per_sec"] == pytest.approx(0.4)
+    assert fields["avg_line_length"] == pytest.approx(43 / 4)
+    # Gaps of 2s and 7s, and no gap for the second line of the burst
+    assert fields["avg_line_gap"] == pytest.approx(9 / 3)
+    assert fields["max_line_gap"] == pytest.approx(7)
+    assert fields["control_chars"] == 2
+    assert fields["reads"] == 4
+
+    # The counts start again, but the time of the last line is kept
+    assert stats.lines == 0 and stats.last_line == 10.0
+
+
+def test_quiet_port_still_written(points):
+    metric, written = points
+    stats = SerialStats("/dev/ttyUSB0", metric, interval=10, now=0.0)
+    stats.tick(9.0)
+    stats.tick(10.0)
+    assert written[0][1]["lines_per_sec"] == 0
+    assert written[0][1]["avg_line_length"] == 0
+
+
+def test_line_errors(points, mocker: MockerFixture):
+    metric, written = points
+    counters = [[0] * 20, [0] * 20]
+    counters[1][6:11] = [1, 2, 3, 4, 5]
+    mocker.patch.object(link, "read_icounter", side_effect=[tuple(counter) for counter in counters])
+
+    stats = SerialStats("/dev/ttyS0", metric, interval=1, now=0.0)
+    stats.attach(3)
+    stats.tick(1.0)
+    fields = written[0][1]
+    assert (fields["frame_errors"], fields["overruns"], fields["parity_errors"]) == (1, 2, 3)
+    assert (fields["breaks"], fields["buffer_overruns"]) == (4, 5)
+
+
+def test_no_line_errors_on_pty():
+    master, slave = pty.openpty()
+    try:
+        assert read_icounter(slave) is None
+    finally:
+        os.close(master)
+        os.close(slave)
+    assert icounter.size == 80
+
+
+def test_serial_plugin_stats(mock_settings):
+    """Test the stats of a real serial read path over a pty, including stripped control characters."""
+    mock_settings(collect_metrics=True, serial_stats_interval=60)
+    master, slave = pty.openpty()
+    plugin = SiemensHipathSerial(_queue=SimpleQueue(), port=os.ttyname(slave))
+    try:
+        plugin.read_lines()
+        os.write(master, siemens_line.replace(b"  1", b"\x07 1", 1) + siemens_line)
+        reads = 1
+        while plugin.stats.lines < 2 and reads < 100:
+            for raw_line in plugin.read_lines():
+                plugin.handle_line(raw_line)
+            reads += 1
+
+        stats = plugin.stats
+        assert stats.lines == 2
+        assert stats.bytes == len(siemens_line) * 2
+        assert stats.control_chars == 1
+        assert stats.reads == reads
+
+        queue_count = len(collector.queue)
+        stats.flush(stats.started + 60)
+        assert len(collector.queue) == queue_count + 1
+        assert collector.queue[-1].startswith("serial_link,port=")
+    finally:
+        plugin.sserver.close()
+        os.close(master)
+        os.close(slave)
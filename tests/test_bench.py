@@ -0,0 +1,74 @@
+# Third Party
+from pytest_mock import MockerFixture
+import pytest
+
+# Local
+from calllogger import bench, __main__ as entrypoint
+from calllogger.plugins import SiemensHipathSerial, BeroNet, MockCalls
+
+siemens_lines = [
+    b"11.04.1900:35:48  1   10400:0100:00:070876153281                           1\r\n",
+    b"11.04.1900:36:34  2   10000:0500:00:0079923                                1\r\n",
+    b"garbage line\r\n",
+    b"11.04.1900:36:34  2   10000:0500:00:0079923                                X\r\n",
+]
+beronet_lines = [
+    b"CDR,18,ISDN:1:1,SIP,100,013231111,100 <sip:02642102@sip.iptel.co>,<sip:013231111@sip.iptel.co>,"
+    b"23/07/21-22:39:38,23/07/21-22:40:10,23/07/21-22:39:53,23/07/21-22:40:10,ISDN,EVENT_DISCONNECT:16,-,-\n",
+    b"\n",
+]
+
+
+@pytest.fixture(autouse=True)
+def mock_port(mock_serial_port):
+    return mock_serial_port
+
+
+def test_serial_plugin():
+    result = bench.bench_plugin(SiemensHipathSerial, siemens_lines, repeat=3)
+    assert result.lines == 12
+    assert result.records == 6
+    assert result.rate > 0
+    assert list(result.stage_time) == ["decode", "validate", "parse", "push"]
+    assert all(spent > 0 for spent in result.stage_time.values())
+    assert result.failures == {"validation: ValidationError": 3, "parse: ValueError": 3}
+    assert result.blocks_per_record > 0
+    assert result.bytes_per_record > 0
+
+
+def test_beronet_plugin():
+    """Test that the required BeroNet settings are not needed to benchmark."""
+    result = bench.bench_plugin(BeroNet, beronet_lines)
+    assert result.records == 1
+    assert result.failures == {"decode: EmptyLine": 1}
+
+
+def test_unsupported_plugin():
+    with pytest.raises(TypeError):
+        bench.bench_plugin(MockCalls, siemens_lines)
+
+
+def test_report():
+    report = bench.bench_plugin(SiemensHipathSerial, siemens_lines).report()
+    assert "Lines/s:" in report
+    assert "parse: ValueError" in report
+
+
+def test_read_capture(tmp_path):
+    path = tmp_path.joinpath("capture.txt")
+    path.write_bytes(b"".join(siemens_lines))
+    assert bench.read_capture(path) == siemens_lines
+
+
+@pytest.mark.parametrize("min_rate, exit_code", [(0, 0), (1_000_000_000, 1)])
+def test_entrypoint(tmp_path, mocker: MockerFixture, min_rate, exit_code):
+    path = tmp_path.joinpath("capture.txt")
+    path.write_bytes(b"".join(siemens_lines))
+    mocker.patch.object(entrypoint.sys, "argv", [
+        "calllogger-bench-plugin", "SiemensHipathSerial", str(path),
+        "--min-rate", str(min_rate), "--set", "baudrate=19200",
+    ])
+    spy_bench = mocker.spy(bench, "bench_plugin")
+
+    assert entrypoint.bench_plugin() == exit_code
+    assert spy_bench.call_args.kwargs["baudrate"] == 19200
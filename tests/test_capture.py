@@ -0,0 +1,102 @@
+# Standard Lib
+import gzip
+
+# Third Party
+from pytest_mock import MockerFixture
+import pytest
+
+# Local
+from calllogger import capture, closeers
+
+
+@pytest.fixture
+def capture_settings(mock_settings):
+    mock_settings(capture_size=100_000, capture_segment_size=1_000)
+
+
+@pytest.fixture
+def writer(tmp_path, capture_settings):
+    writer = capture.CaptureWriter("/dev/ttyUSB0", tmp_path)
+    yield writer
+    writer.close()
+
+
+def test_round_trip(writer, tmp_path, mocker: MockerFixture):
+    mocked_time = mocker.patch.object(capture.time, "monotonic", side_effect=[10.0, 10.5, 12.0])
+    chunks = [b"first\r\nsec", b"ond\r\n", b"\x00\xff binary"]
+    for chunk in chunks:
+        writer.write(chunk)
+    writer.write(b"")
+    writer.close()
+
+    frames = list(capture.read_frames(capture.segments(tmp_path)))
+    assert frames == [(10.0, chunks[0]), (10.5, chunks[1]), (12.0, chunks[2])]
+    assert mocked_time.call_count == 3
+    assert capture.segments(tmp_path)[0].name.startswith("dev_ttyUSB0-")
+
+
+def test_rotation_and_size_limit(writer, tmp_path, mock_settings):
+    """Test that segments are rotated and the oldest removed once over the total size."""
+    mock_settings(capture_size=2_000, capture_segment_size=1_000)
+    for index in range(200):
+        writer.write(bytes(range(256)) + index.to_bytes(2, "big"))
+    writer.close()
+
+    paths = capture.segments(tmp_path)
+    assert len(paths) > 1
+    assert sum(path.stat().st_size for path in paths[:-1]) <= 2_000
+
+    # The newest frames are kept in order
+    chunks = [chunk for _, chunk in capture.read_frames(paths)]
+    assert chunks[-1].endswith((199).to_bytes(2, "big"))
+    assert chunks == sorted(chunks, key=lambda chunk: chunk[-2:])
+
+
+def test_open_segment_not_removed(writer, tmp_path, mock_settings):
+    mock_settings(capture_size=0)
+    writer.write(b"data")
+    writer.rotate()
+    assert capture.segments(tmp_path) == [writer._path]
+
+
+def test_cut_short_segment(writer, tmp_path):
+    """Test that a segment from a process that died is read up to the last flush."""
+    writer.write(b"first chunk")
+    writer._stream.flush(capture.zlib.Z_SYNC_FLUSH)
+    path = writer._path
+    content = path.read_bytes()
+
+    truncated = tmp_path.joinpath("cut-1.cap.gz")
+    truncated.write_bytes(content)
+    assert [chunk for _, chunk in capture.read_frames([truncated])] == [b"first chunk"]
+
+
+def test_not_a_segment(tmp_path):
+    path = tmp_path.joinpath("other-1.cap.gz")
+    with gzip.open(path, "wb") as stream:
+        stream.write(b"something else")
+    assert list(capture.read_frames([path])) == []
+
+
+def test_write_error_logged(writer, mocker: MockerFixture):
+    mocker.patch.object(writer, "rotate", side_effect=OSError("disk full"))
+    writer.write(b"data")
+    assert writer._stream is None
+
+
+def test_closeer_only_while_open(writer):
+    """Test that a writer is only kept for shutdown while it has a segment open."""
+    assert writer.close not in closeers
+    writer.write(b"data")
+    assert writer.close in closeers
+    writer.close()
+    assert writer.close not in closeers
+
+
+def test_segments_of_port(tmp_path, capture_settings):
+    for name in ("ttyUSB", "ttyUSB-0"):
+        writer = capture.CaptureWriter(name, tmp_path)
+        writer.write(name.encode())
+        writer.close()
+    assert [capture.segment_port(path) for path in capture.segments(tmp_path, "ttyUSB")] == ["ttyUSB"]
+    assert len(capture.segments(tmp_path)) == 2
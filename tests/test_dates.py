@@ -0,0 +1,121 @@
+# Standard Lib
+from datetime import datetime, timedelta, timezone
+import timeit
+import random
+
+# Third Party
+import pytest
+
+# Local
+from calllogger.dates import compile_date_parser, parse_date
+
+formats = ["%d.%m.%y%X", "%y/%m/%d-%H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%d/%m/%Y %H:%M", "%H:%M %d%m%y"]
+timezones = [None, timezone.utc, timezone(timedelta(hours=2))]
+
+
+def strptime(value: str, fmt: str, tz):
+    """The expected result, or the error type."""
+    try:
+        return datetime.strptime(value, fmt).replace(tzinfo=tz)
+    except ValueError:
+        return ValueError
+
+
+def parsed(parser, value: str):
+    try:
+        return parser(value)
+    except ValueError:
+        return ValueError
+
+
+def random_dates(seed: int, count: int):
+    rand = random.Random(seed)
+    start = datetime(1969, 1, 1)
+    span = int((datetime(2068, 12, 31, 23, 59, 59) - start).total_seconds())
+    for _ in range(count):
+        yield start + timedelta(seconds=rand.randrange(span))
+
+
+def mutate(rand: random.Random, value: str) -> str:
+    """Break a date string in a way that strptime may or may not accept."""
+    chars = list(value)
+    choice = rand.randrange(5)
+    index = rand.randrange(len(chars))
+    if choice == 0:
+        chars[index] = rand.choice("0123456789 :./-T+_x٣")
+    elif choice == 1:
+        del chars[index]
+    elif choice == 2:
+        chars.insert(index, rand.choice("0 1:"))
+    elif choice == 3:
+        chars[index] = chars[index].lower()
+    else:
+        # Out of range fields like month 13 or day 31 of a short month
+        chars[index:index + 2] = rand.choice(["13", "31", "29", "30", "00", "24", "60", "61", "99"])
+    return "".join(chars)
+
+
+@pytest.mark.parametrize("fmt", formats)
+@pytest.mark.parametrize("tz", timezones)
+def test_same_as_strptime(fmt, tz):
+    parser = compile_date_parser(fmt, tz)
+    for date in random_dates(seed=len(fmt), count=2000):
+        value = date.strftime(fmt)
+        result = parser(value)
+        assert result == strptime(value, fmt, tz), value
+        assert result.tzinfo is tz
+
+
+@pytest.mark.parametrize("fmt", formats)
+def test_broken_dates_same_as_strptime(fmt):
+    """Test that any string gives the same date, or the same error, as strptime."""
+    rand = random.Random(fmt)
+    parser = compile_date_parser(fmt, timezone.utc)
+    for date in random_dates(seed=7, count=3000):
+        value = mutate(rand, date.strftime(fmt))
+        assert parsed(parser, value) == strptime(value, fmt, timezone.utc), repr(value)
+
+
+@pytest.mark.parametrize("value", [
+    "29.02.2400:00:00",  # Leap day
+    "29.02.2300:00:00",  # Not a leap year
+    "31.04.2400:00:00",
+    "01.01.6900:00:00",  # Century boundary of two digit years
+    "31.12.6823:59:59",
+    " 1.01.2400:00:00",
+    "1.1.2400:00:00",
+    "01.01.2400:00:61",
+    "01.01.24 00:00:00",
+    "",
+])
+def test_edge_cases(value):
+    fmt = "%d.%m.%y%X"
+    assert parsed(compile_date_parser(fmt, timezone.utc), value) == strptime(value, fmt, timezone.utc)
+
+
+def test_same_day_cached():
+    parser = compile_date_parser("%d.%m.%y%X")
+    first = parser("11.04.1900:35:48")
+    second = parser("11.04.1923:10:01")
+    assert (first.date(), second.date()) == (datetime(2019, 4, 11).date(),) * 2
+    assert second.hour == 23
+
+
+@pytest.mark.parametrize("fmt", ["%d %B %Y", "%a %d.%m.%y", "%d.%m", "%s", "%d.%m.%y%"])
+def test_unsupported_format(fmt):
+    """Test that formats that are not fixed-width are left to strptime."""
+    value = datetime(2024, 3, 5, 10, 11, 12).strftime(fmt)
+    assert parsed(compile_date_parser(fmt), value) == strptime(value, fmt, None)
+
+
+def test_parse_date():
+    assert parse_date("24/01/05-10:00:00", "%y/%m/%d-%H:%M:%S") == datetime(2024, 1, 5, 10)
+
+
+@pytest.mark.perf
+@pytest.mark.parametrize("fmt, value", [("%d.%m.%y%X", "11.04.1900:35:48"), ("%y/%m/%d-%H:%M:%S", "24/01/05-10:00:00")])
+def test_faster_than_strptime(fmt, value):
+    parser = compile_date_parser(fmt, timezone.utc)
+    fast = min(timeit.repeat(lambda: parser(value), number=2_000, repeat=5))
+    baseline = min(timeit.repeat(lambda: strptime(value, fmt, timezone.utc), number=2_000, repeat=5))
+    assert fast * 2 < baseline
@@ -0,0 +1,125 @@
+# Third Party
+import pytest
+
+# Local
+from calllogger.deadletter import DeadLetterStore
+
+
+@pytest.fixture
+def store(tmp_path, mock_settings):
+    mock_settings(dead_letter_size=200, dead_letter_files=2)
+    return DeadLetterStore(tmp_path.joinpath("deadletters.jsonl"))
+
+
+def test_add_and_read(store):
+    store.add(b"line one\x00\xff", "decode", UnicodeDecodeError("ascii", b"\xff", 0, 1, "bad"), plugin="Test")
+    store.add(b"line two", "parse", ValueError("bad"))
+
+    letters = store.read()
+    assert [letter.raw for letter in letters] == [b"line one\x00\xff", b"line two"]
+    assert letters[0].stage == "decode"
+    assert letters[0].plugin == "Test"
+    assert letters[1].error == "ValueError: bad"
+
+
+def test_rotation(store):
+    """Test that the files are rotated and the oldest dropped once full."""
+    for index in range(10):
+        store.add(f"line {index}".encode(), "parse", ValueError())
+
+    files = store.files()
+    assert len(files) == 3
+    assert all(path.stat().st_size <= 200 for path in files)
+
+    lines = [letter.raw for letter in store.read()]
+    assert lines[-1] == b"line 9"
+    assert b"line 0" not in lines
+    assert lines == sorted(lines)
+
+
+def test_disabled(store, mock_settings):
+    mock_settings(dead_letter_size=0)
+    store.add(b"line", "parse", ValueError())
+    assert store.files() == []
+
+
+def test_corrupt_line_skipped(store):
+    store.add(b"line", "parse", ValueError())
+    with store.path.open("a") as stream:
+        stream.write("not json\n")
+    assert len(store.read()) == 1
+
+
+def test_clear(store):
+    for index in range(10):
+        store.add(b"line", "parse", ValueError())
+    store.clear()
+    assert store.read() == []
+    assert len(store) == 0
+
+
+def raws(letters):
+    return [letter.raw for letter in letters]
+
+
+def test_claim(store):
+    """Test that the claimed letters are removed, while letters added by another process are kept."""
+    for index in range(6):
+        store.add(f"line {index}".encode(), "parse", ValueError())
+    assert len(store.files()) > 1
+    before = store.read()
+
+    with store.claim() as letters:
+        assert letters == before
+        # Another process, e.g. the running logger, adds to a fresh file
+        DeadLetterStore(store.path).add(b"other", "parse", ValueError())
+        assert raws(store.read()) == [b"other"]
+        # This process is held back until the claim finishes
+        store.add(b"line 5", "parse", ValueError())
+        assert raws(store.read()) == [b"other"]
+
+    assert raws(store.read()) == [b"other", b"line 5"]
+    assert store._claimed() == []
+
+
+def test_claim_failed(store):
+    """Test that a failed claim puts the letters back in front of the ones added meanwhile."""
+    store.add(b"line 0", "parse", ValueError())
+    with pytest.raises(RuntimeError), store.claim():
+        DeadLetterStore(store.path).add(b"other", "parse", ValueError())
+        store.add(b"line 1", "parse", ValueError())
+        raise RuntimeError
+    assert raws(store.read()) == [b"line 0", b"other"]
+    assert store._claimed() == []
+
+
+def test_claim_failed_bounded(store):
+    """Test that putting the letters back drops the oldest files past the limit, like a rotation."""
+    for index in range(6):
+        store.add(f"line {index}".encode(), "parse", ValueError())
+    with pytest.raises(RuntimeError), store.claim():
+        other = DeadLetterStore(store.path)
+        for index in range(6, 12):
+            other.add(f"line {index}".encode(), "parse", ValueError())
+        raise RuntimeError
+
+    assert len(store.files()) == 3
+    lines = raws(store.read())
+    assert lines[-1] == b"line 11"
+    assert lines == sorted(lines, key=lambda line: int(line.split()[1]))
+
+
+def test_claim_left_behind(store):
+    """Test that the files of a claim that was killed are claimed again."""
+    store.add(b"line 0", "parse", ValueError())
+    store.path.replace(store.path.with_name("deadletters.jsonl.claimed.0"))
+    store.add(b"line 1", "parse", ValueError())
+
+    with store.claim() as letters:
+        assert raws(letters) == [b"line 0", b"line 1"]
+    assert store._claimed() == []
+
+
+def test_claim_once(store):
+    with store.claim(), pytest.raises(RuntimeError), DeadLetterStore(store.path).claim():
+        pass
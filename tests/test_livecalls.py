@@ -0,0 +1,109 @@
+# Third Party
+from pytest_mock import MockerFixture
+import pytest
+
+# Local
+from calllogger import livecalls, settings
+from calllogger.record import CallDataRecord as Record
+
+
+@pytest.fixture
+def mock_time(mocker: MockerFixture):
+    mocked = mocker.patch.object(livecalls.time, "monotonic")
+    mocked.return_value = 100.0
+    return mocked
+
+
+@pytest.fixture
+def table(mock_time):
+    return livecalls.LiveCallTable(timeout=60)
+
+
+def make_record(call_type, ext=101, line=1, number="0876153281", **fields) -> Record:
+    record = Record(call_type)
+    record.line = line
+    record.ext = ext
+    record.number = number
+    for key, val in fields.items():
+        setattr(record, key, val)
+    return record
+
+
+def test_incoming_hops(table, mock_time):
+    """Test that incoming hops for the same call are merged into one live call."""
+    assert table.track(make_record(Record.INCOMING, ext=101)) is True
+    mock_time.return_value = 104.0
+    table.track(make_record(Record.INCOMING, ext=102))
+
+    calls = table.snapshot()
+    assert len(calls) == 1
+    assert calls[0]["exts"] == [101, 102]
+    assert calls[0]["ringing"] == 4
+
+
+def test_separate_lines(table):
+    table.track(make_record(Record.INCOMING, line=1))
+    table.track(make_record(Record.INCOMING, line=2))
+    assert len(table) == 2
+
+
+@pytest.mark.parametrize("call_type", [
+    Record.RECEIVED, Record.OUTGOING, Record.RECEIVED_FORWARDED, Record.RECEIVED_TRANSFERRED_INT,
+])
+def test_call_ended(table, mock_time, call_type):
+    """Test that the call is removed and the ring time calculated when the phone system gives none."""
+    table.track(make_record(Record.INCOMING))
+    mock_time.return_value = 112.0
+    record = make_record(call_type, ring="")
+
+    assert table.track(record) is True
+    assert len(table) == 0
+    assert record.ring == 12
+
+
+def test_ring_time_from_record_kept(table):
+    table.track(make_record(Record.INCOMING))
+    record = make_record(Record.RECEIVED, ring="00:05")
+    table.track(record)
+    assert record.ring == "00:05"
+
+
+def test_other_call_types_ignored(table):
+    table.track(make_record(Record.INCOMING))
+    assert table.track(make_record(Record.RECEIVED_CONFERENCE)) is True
+    assert len(table) == 1
+
+
+def test_expired(table, mock_time):
+    table.track(make_record(Record.INCOMING, line=1))
+    mock_time.return_value = 130.0
+    table.track(make_record(Record.INCOMING, line=2))
+    mock_time.return_value = 170.0
+
+    calls = table.snapshot()
+    assert [call["line"] for call in calls] == [2]
+
+
+def test_refreshed_call_not_expired(table, mock_time):
+    """Test that a call seen again moves to the back of the expiry order."""
+    table.track(make_record(Record.INCOMING, line=1))
+    table.track(make_record(Record.INCOMING, line=2))
+    mock_time.return_value = 130.0
+    table.track(make_record(Record.INCOMING, line=1))
+    mock_time.return_value = 170.0
+
+    assert [call["line"] for call in table.snapshot()] == [1]
+
+
+def test_summary_mode(table, mocker: MockerFixture):
+    mocker.patch.object(settings, "live_calls_summary", True)
+    assert table.track(make_record(Record.INCOMING)) is False
+    assert table.track(make_record(Record.RECEIVED)) is True
+
+
+def test_gauge(table, mocker: MockerFixture):
+    mocked_gauge = mocker.patch.object(table, "_gauge")
+    table.track(make_record(Record.INCOMING, ext=101))
+    table.track(make_record(Record.INCOMING, ext=102))
+    table.track(make_record(Record.RECEIVED))
+    assert [call.args[0] for call in mocked_gauge.set.call_args_list] == [1, 0]
@@ -1,9 +1,13 @@
 # Third Party
 from pytest_mock import MockerFixture
+import pytest
 
 # Local
 from calllogger import __main__ as entrypoint
-from calllogger import settings
+from calllogger import settings, capture
+from calllogger.tenants import Tenant
+from calllogger.api import ClientInfo
+from calllogger.deadletter import DeadLetterStore
 
 
 def test_monitor(mocker: MockerFixture):
@@ -18,3 +22,178 @@ def test_mockcalls(mocker: MockerFixture):
     ret = entrypoint.mockcalls()
     assert ret == 0
     mocked_loop.assert_called_with("MockCalls")
+
+
+def test_hosted(mocker: MockerFixture):
+    mocked_loop = mocker.patch.object(entrypoint, "hosted_loop", return_value=0)
+    ret = entrypoint.hosted()
+    assert ret == 0
+    assert mocked_loop.called
+
+
+class TestHostedLoop:
+    @pytest.fixture
+    def hosted(self, mocker: MockerFixture):
+        mocker.patch.object(entrypoint, "load_tenants")
+        mocker.patch.object(entrypoint.stopped, "wait")
+        mocker.patch.object(entrypoint, "initialise_telemetry")
+        mocked = mocker.patch.object(entrypoint, "HostedTenants").return_value
+        mocked.tenants = [Tenant("virtual-0001", "token1", "mockcalls"), Tenant("virtual-0002", "token2", "mockcalls")]
+        return mocked
+
+    def test_first_tenant_revoked(self, hosted):
+        """Test that telemetry uses the first tenant that started when the first tenant's token is revoked."""
+        hosted.tenants[0].disabled = True
+        hosted.tenants[1].client_info = ClientInfo({"slug": "second"})
+        assert entrypoint.hosted_loop() == 0
+        entrypoint.initialise_telemetry.assert_called_with(hosted.tenants[1].client_info, slug="hosted")
+
+    def test_no_tenant_started(self, hosted):
+        for tenant in hosted.tenants:
+            tenant.disabled = True
+        assert entrypoint.hosted_loop() == 0
+        assert not entrypoint.initialise_telemetry.called
+
+
+good_line = b"11.04.1900:35:48  1   10400:0100:00:070876153281                           1\r\n"
+
+
+class TestReprocess:
+    @pytest.fixture(autouse=True)
+    def mock_port(self, mock_serial_port):
+        return mock_serial_port
+
+    @pytest.fixture
+    def mocked_worker(self, mocker: MockerFixture):
+        mocker.patch.object(entrypoint, "get_token")
+        mocked = mocker.patch.object(entrypoint.api, "CDRWorker")
+        mocked.return_value.send_request.return_value = True
+        return mocked.return_value
+
+    def test_entrypoint(self, mocker: MockerFixture):
+        mocked_loop = mocker.patch.object(entrypoint, "reprocess_loop", return_value=0)
+        assert entrypoint.reprocess() == 0
+        mocked_loop.assert_called_with("")
+
+    def test_nothing_to_reprocess(self, mocked_worker):
+        assert entrypoint.reprocess_loop() == 0
+        assert not mocked_worker.send_request.called
+
+    def test_recovered(self, mocked_worker, dead_letter_store):
+        dead_letter_store.add(good_line, "parse", ValueError(), plugin="SiemensHipathSerial")
+        dead_letter_store.add(b"still broken", "validation", ValueError(), plugin="SiemensHipathSerial")
+
+        assert entrypoint.reprocess_loop() == 0
+        records = mocked_worker.send_request.call_args.args[1]
+        assert len(records) == 1
+        assert records[0]["number"] == "0876153281"
+
+        # Only the line that still fails is left
+        letters = dead_letter_store.read()
+        assert [letter.raw for letter in letters] == [b"still broken"]
+
+    def test_plugin_override(self, mocked_worker, dead_letter_store):
+        dead_letter_store.add(good_line, "parse", ValueError(), plugin="Removed")
+        entrypoint.reprocess_loop("SiemensHipathSerial")
+        assert mocked_worker.send_request.called
+
+    def test_unsupported_plugin(self, mocked_worker, dead_letter_store):
+        dead_letter_store.add(good_line, "parse", ValueError(), plugin="SiemensHipathSerial")
+        dead_letter_store.add(good_line, "parse", ValueError(), plugin="MockCalls")
+        with pytest.raises(SystemExit):
+            entrypoint.reprocess_loop()
+        assert not mocked_worker.send_request.called
+        # The letters are kept, as nothing was reprocessed
+        assert len(dead_letter_store) == 2
+
+    def test_unknown_plugin(self, mocked_worker, dead_letter_store):
+        dead_letter_store.add(good_line, "parse", ValueError(), plugin="SiemensHipathSerial")
+        with pytest.raises(SystemExit):
+            entrypoint.reprocess_loop("typo")
+        assert len(dead_letter_store) == 1
+
+    def test_failed_run_keeps_letters(self, mocked_worker, dead_letter_store):
+        """Test that the store is only rewritten once the whole run finishes."""
+        mocked_worker.send_request.side_effect = RuntimeError
+        dead_letter_store.add(good_line, "parse", ValueError(), plugin="SiemensHipathSerial")
+        dead_letter_store.add(b"still broken", "validation", ValueError(), plugin="SiemensHipathSerial")
+
+        with pytest.raises(RuntimeError):
+            entrypoint.reprocess_loop()
+        assert [letter.raw for letter in dead_letter_store.read()] == [good_line, b"still broken"]
+
+    def test_added_by_logger_kept(self, mocked_worker, dead_letter_store):
+        """Test that the letters the running logger adds during the run are kept."""
+        def logger_adds(*_):
+            running = DeadLetterStore(dead_letter_store.path)
+            running.add(b"new line", "parse", ValueError(), plugin="SiemensHipathSerial")
+            return True
+
+        mocked_worker.send_request.side_effect = logger_adds
+        dead_letter_store.add(good_line, "parse", ValueError(), plugin="SiemensHipathSerial")
+        dead_letter_store.add(b"still broken", "validation", ValueError(), plugin="SiemensHipathSerial")
+
+        assert entrypoint.reprocess_loop() == 0
+        assert [letter.raw for letter in dead_letter_store.read()] == [b"new line", b"still broken"]
+
+    def test_send_failed(self, mocked_worker, dead_letter_store):
+        """Test that the recovered lines are kept if they could not be sent."""
+        mocked_worker.send_request.return_value = False
+        dead_letter_store.add(good_line, "parse", ValueError(), plugin="SiemensHipathSerial")
+
+        entrypoint.reprocess_loop()
+        letters = dead_letter_store.read()
+        assert [letter.stage for letter in letters] == ["send"]
+        assert letters[0].raw == good_line
+
+
+class TestReplay:
+    @pytest.fixture(autouse=True)
+    def mock_port(self, mock_serial_port):
+        return mock_serial_port
+
+    @pytest.fixture
+    def capture_path(self, tmp_path, mock_settings, mocker: MockerFixture):
+        mock_settings(capture_size=100_000)
+        mocked_time = mocker.patch.object(capture.time, "monotonic", side_effect=[5.0, 6.0])
+        writer = capture.CaptureWriter("ttyUSB0", tmp_path)
+        # The line is split across two reads
+        writer.write(good_line[:20])
+        writer.write(good_line[20:] + b"junk\r\n")
+        writer.close()
+        mocker.stop(mocked_time)
+        return tmp_path
+
+    def test_entrypoint(self, mocker: MockerFixture):
+        mocked_loop = mocker.patch.object(entrypoint, "replay_loop", return_value=0)
+        mocker.patch("sys.argv", ["calllogger-replay", "SiemensHipathSerial", "capture", "--speed", "0"])
+        assert entrypoint.replay() == 0
+        mocked_loop.assert_called_with("SiemensHipathSerial", ["capture"], 0.0, "")
+
+    def test_replayed(self, capture_path, capsys, dead_letter_store):
+        assert entrypoint.replay_loop("SiemensHipathSerial", [str(capture_path)], speed=0) == 0
+        output = capsys.readouterr().out
+        assert "0876153281" in output
+        assert "Replayed 2 lines into 1 records" in output
+
+    def test_ports_not_mixed(self, capture_path, capsys):
+        """Test that a capture of more than one port needs a port picked, as they can't share a parser."""
+        writer = capture.CaptureWriter("ttyUSB1", capture_path)
+        writer.write(b"other port\r\n")
+        writer.close()
+
+        assert entrypoint.replay_loop("SiemensHipathSerial", [str(capture_path)], speed=0) == 0
+        output = capsys.readouterr().out
+        assert "more than one port" in output and "ttyUSB0, ttyUSB1" in output
+
+        assert entrypoint.replay_loop("SiemensHipathSerial", [str(capture_path)], speed=0, port="ttyUSB0") == 0
+        assert "Replayed 2 lines into 1 records" in capsys.readouterr().out
+
+    def test_timing_kept(self, capture_path, mocker: MockerFixture):
+        mocked_wait = mocker.patch.object(entrypoint.stopped, "wait", return_value=False)
+        entrypoint.replay_loop("SiemensHipathSerial", [str(capture_path)], speed=2)
+        mocked_wait.assert_called_once_with(0.5)
+
+    def test_unsupported_plugin(self, capture_path, capsys):
+        assert entrypoint.replay_loop("MockCalls", [str(capture_path)]) == 0
+        assert "does not support replaying" in capsys.readouterr().out
@@ -0,0 +1,119 @@
+# Standard Lib
+from types import SimpleNamespace
+import time
+
+# Third Party
+import pytest
+
+# Local
+from calllogger import middleware
+from calllogger.record import CallDataRecord
+
+
+@pytest.fixture
+def mock_settings():
+    return SimpleNamespace(
+        ext_names={"101": "Office"},
+        contact_names={"0876159281": "Tom Baker"},
+        drop_call_types="0",
+        redact_digits=4,
+        country_code="353",
+        trunk_prefix="0",
+        international_prefix="00",
+        outside_line="",
+    )
+
+
+def make_record(call_type=1) -> CallDataRecord:
+    record = CallDataRecord(call_type)
+    record.number = "0876159281"
+    record.line = "3"
+    record.ext = "101"
+    record.ring = "00:15"
+    record.duration = "00:01:05"
+    record.raw = "raw line"
+    return record
+
+
+def test_no_middleware(mock_settings):
+    chain = middleware.build_chain("", mock_settings)
+    record = make_record()
+    assert chain is middleware.passthrough
+    assert chain(record) is record
+
+
+def test_unknown_middleware(mock_settings):
+    chain = middleware.build_chain("unknown,normalise", mock_settings)
+    record = chain(make_record())
+    assert record.ext == 101
+
+
+def test_normalise(mock_settings):
+    chain = middleware.build_chain("normalise", mock_settings)
+    record = chain(make_record())
+    assert record.line == 3
+    assert record.ext == 101
+    assert record.ring == 15
+    assert record.duration == 65
+
+
+def test_e164(mock_settings):
+    chain = middleware.build_chain("e164", mock_settings)
+    record = chain(make_record())
+    assert record.number == "+353876159281"
+
+
+@pytest.mark.parametrize("value, expected", [
+    (15, 15), ("", 0), ("20", 20), ("01:05", 65), ("01:00:05", 3605), ("??", "??"),
+])
+def test_to_seconds(value, expected):
+    assert middleware.to_seconds(value) == expected
+
+
+def test_enrich(mock_settings):
+    chain = middleware.build_chain(["enrich"], mock_settings)
+    record = chain(make_record())
+    assert record.ext_name == "Office"
+    assert record.contact_name == "Tom Baker"
+
+
+def test_enrich_keeps_existing(mock_settings):
+    chain = middleware.build_chain("enrich", mock_settings)
+    record = make_record()
+    record.contact_name = "Existing"
+    assert chain(record).contact_name == "Existing"
+
+
+@pytest.mark.parametrize("call_type, dropped", [(0, True), (1, False)])
+def test_filter(mock_settings, call_type, dropped):
+    chain = middleware.build_chain("normalise,filter,redact", mock_settings)
+    record = chain(make_record(call_type))
+    assert (record is None) is dropped
+
+
+def test_redact(mock_settings):
+    chain = middleware.build_chain("redact", mock_settings)
+    record = chain(make_record())
+    assert record.number == "087615XXXX"
+    assert "raw" not in record.__dict__
+
+
+def test_chain_order(mock_settings):
+    """Test that stages run in the configured order, redact before enrich means no contact match."""
+    chain = middleware.build_chain("redact,enrich", mock_settings)
+    record = chain(make_record())
+    assert "contact_name" not in record.__dict__
+
+
+@pytest.mark.perf
+def test_chain_throughput(mock_settings):
+    """The full chain needs to handle at least 100k records per second on one core."""
+    chain = middleware.build_chain("normalise,enrich,filter,redact", mock_settings)
+    records = [make_record() for _ in range(50_000)]
+
+    start = time.perf_counter()
+    for record in records:
+        chain(record)
+    elapsed = time.perf_counter() - start
+
+    assert len(records) / elapsed > 100_000
@@ -1,5 +1,6 @@
 # Standard Lib
 from unittest.mock import Mock
+from functools import partial
 import signal
 
 # Third Party
@@ -60,6 +61,83 @@ class TestThreadExceptionManager:
         assert stopped.get_exit_code() == 1
 
 
+class TestSupervisor:
+    class Failing(misc.ThreadExceptionManager):
+        runs = 0
+
+        def entrypoint(self):
+            type(self).runs += 1
+            raise RuntimeError
+
+    @pytest.fixture(autouse=True)
+    def reset_runs(self):
+        self.Failing.runs = 0
+
+    def test_supervised_failure_does_not_stop(self, mocker, disable_sleep):
+        """Test that a supervised thread that fails is restarted instead of stopping the program."""
+        supervisor = misc.Supervisor(max_restarts=2, window=60)
+        mocked_start = mocker.patch.object(supervisor, "start")
+        thread = self.Failing(name="Thread-Failing")
+        thread.supervisor = supervisor
+        supervisor._factories[thread.name] = self.Failing
+
+        assert thread.run() is False
+        assert not stopped.is_set()
+        mocked_start.assert_called_once_with(self.Failing)
+
+    def test_restart_until_escalation(self, mocker, disable_sleep):
+        """Test that the thread is restarted max_restarts times before the program is stopped."""
+        spy_restarts = mocker.spy(misc.telemetry, "thread_restarts")
+        supervisor = misc.Supervisor(max_restarts=2, window=60)
+        mocker.patch.object(misc.ThreadExceptionManager, "start", misc.ThreadExceptionManager.run)
+
+        supervisor.start(partial(self.Failing, name="Thread-Failing"))
+        assert self.Failing.runs == 3
+        assert spy_restarts.call_count == 2
+        assert stopped.is_set()
+        assert stopped.get_exit_code() == 1
+
+    @pytest.mark.parametrize("error", [RuntimeError("bad"), SystemExit(0)])
+    def test_restart_factory_fails(self, disable_sleep, error):
+        """Test that a factory that fails to create the thread again stops the program instead of the thread."""
+        supervisor = misc.Supervisor(max_restarts=2, window=60)
+        thread = self.Failing(name="Thread-Failing")
+        thread.supervisor = supervisor
+
+        def factory():
+            raise error
+        supervisor._factories[thread.name] = factory
+
+        assert thread.run() is False
+        assert stopped.is_set()
+        assert stopped.get_exit_code() == 1
+
+    def test_failures_outside_window_forgotten(self, mocker, disable_sleep):
+        supervisor = misc.Supervisor(max_restarts=1, window=10)
+        mocker.patch.object(supervisor, "start")
+        mocked_time = mocker.patch.object(misc.time, "monotonic")
+        thread = self.Failing(name="Thread-Failing")
+        supervisor._factories[thread.name] = self.Failing
+
+        for now in (0, 20, 40):
+            mocked_time.return_value = now
+            supervisor.failed(thread)
+
+        assert not stopped.is_set()
+        assert supervisor.start.call_count == 3
+
+    def test_backoff(self, mocker, disable_sleep, mock_settings):
+        mock_settings(timeout=2, timeout_decay=2, max_timeout=5)
+        supervisor = misc.Supervisor(max_restarts=5, window=60)
+        mocker.patch.object(supervisor, "start")
+        thread = self.Failing(name="Thread-Failing")
+        supervisor._factories[thread.name] = self.Failing
+
+        for _ in range(3):
+            supervisor.failed(thread)
+        assert [call.args[0] for call in disable_sleep.call_args_list] == [2, 4, 5]
+
+
 @pytest.mark.parametrize("return_data", [KeyboardInterrupt, "testdata"])
 def test_graceful_exception(mocker: MockerFixture, return_data):
     spy_running_clear = mocker.spy(stopped, "set")
@@ -0,0 +1,48 @@
+# Third Party
+import pytest
+
+# Local
+from calllogger.numbers import compile_normaliser
+
+
+@pytest.fixture
+def normalise():
+    return compile_normaliser("353", trunk_prefix="0", international_prefix="00", outside_line="9")
+
+
+@pytest.mark.parametrize("number, expected", [
+    ("0876153281", "+353876153281"),
+    ("087 615 3281", "+353876153281"),
+    ("(021) 427-4845", "+353214274845"),
+    ("00441234567890", "+441234567890"),
+    ("+353876153281", "+353876153281"),
+    ("+44 1234 567890", "+441234567890"),
+    ("90876153281", "+353876153281"),
+    ("900441234567890", "+441234567890"),
+    ("4274845", "4274845"),
+    ("901", "901"),
+    ("Anonymous", "Anonymous"),
+    ("0", "0"),
+    ("", ""),
+])
+def test_normalise(normalise, number, expected):
+    assert normalise(number) == expected
+
+
+def test_without_country_code():
+    """Test that only international numbers are normalised when the country code is unknown."""
+    normalise = compile_normaliser("")
+    assert normalise("0876153281") == "0876153281"
+    assert normalise("00353876153281") == "+353876153281"
+
+
+def test_north_american_rules():
+    normalise = compile_normaliser("+1", trunk_prefix="1", international_prefix="011")
+    assert normalise("12125550123") == "+12125550123"
+    assert normalise("011353876153281") == "+353876153281"
+
+
+def test_many_outside_lines():
+    normalise = compile_normaliser("353", outside_line="9, 81")
+    assert normalise("90876153281") == "+353876153281"
+    assert normalise("810876153281") == "+353876153281"
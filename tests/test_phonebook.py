@@ -0,0 +1,114 @@
+# Standard Lib
+from types import SimpleNamespace
+import tracemalloc
+
+# Third Party
+import pytest
+
+# Local
+from calllogger import phonebook, middleware
+from calllogger.record import CallDataRecord
+
+rows = [
+    ["# number", "name", "email"],
+    ["0876153281", "Tom Baker", "tom@example.com"],
+    ["021427*", "Acme Switchboard", ""],
+    ["0214274*", "Acme Sales"],
+    ["+35321*", "Cork"],
+    ["101", "Office"],
+    [],
+    ["not a number", "Ignored"],
+]
+
+
+@pytest.fixture
+def book():
+    return phonebook.Phonebook(rows)
+
+
+@pytest.mark.parametrize("number, expected", [
+    ("0876153281", ("Tom Baker", "tom@example.com")),
+    ("0214270000", ("Acme Switchboard", None)),
+    ("0214274845", ("Acme Sales", None)),
+    ("+353214274845", ("Cork", None)),
+    ("353214274845", None),
+    ("0876153282", None),
+    ("021427", ("Acme Switchboard", None)),
+    ("02142", None),
+    ("12????", None),
+    ("", None),
+    (None, None),
+    (101, ("Office", None)),
+])
+def test_lookup(book, number, expected):
+    assert book.lookup(number) == expected
+
+
+def test_lookup_without_prefixes(book):
+    assert book.lookup("0214270000", prefixes=False) is None
+    assert book.lookup("101", prefixes=False) == ("Office", None)
+
+
+def test_len(book):
+    assert len(book) == 5
+
+
+def test_reload_replaces_entries(book):
+    book.load([["0871111111", "New"]])
+    assert book.lookup("0876153281") is None
+    assert book.lookup("0871111111") == ("New", None)
+
+
+def test_load_phonebook_file(tmp_path, mocker):
+    path = tmp_path.joinpath("phonebook.csv")
+    path.write_text("0876153281,Tom Baker\n")
+    mocker.patch.object(phonebook, "phonebook_path", return_value=path)
+    mocker.patch.object(phonebook, "directory", phonebook.Phonebook())
+
+    phonebook.load_phonebook()
+    assert phonebook.directory.lookup("0876153281") == ("Tom Baker", None)
+
+
+def test_load_phonebook_missing_file(tmp_path, mocker):
+    mocker.patch.object(phonebook, "phonebook_path", return_value=tmp_path.joinpath("missing.csv"))
+    mocked_directory = mocker.patch.object(phonebook, "directory")
+    phonebook.load_phonebook()
+    assert not mocked_directory.load.called
+
+
+def test_middleware(mocker):
+    mocker.patch.object(phonebook.directory, "_entries", phonebook.Phonebook(rows)._entries)
+    chain = middleware.build_chain("phonebook", SimpleNamespace())
+    record = CallDataRecord(1)
+    record.number = "0876153281"
+    record.ext = 101
+
+    chain(record)
+    assert record.contact_name == "Tom Baker"
+    assert record.contact_email == "tom@example.com"
+    assert record.ext_name == "Office"
+
+
+def test_memory_budget(tmp_path, mocker):
+    """
+    Load 50k unique contacts from a CSV file through the real loading path and scale it up.
+    500k entries need to fit within 40MB and loading them must peak under 80MB.
+    """
+    count = 50_000
+    path = tmp_path.joinpath("phonebook.csv")
+    with path.open("w", encoding="utf8") as stream:
+        for index in range(count):
+            stream.write(f"08{index:08d},Contact Name {index},contact.{index}@example.com\n")
+    mocker.patch.object(phonebook, "phonebook_path", return_value=path)
+    book = mocker.patch.object(phonebook, "directory", phonebook.Phonebook())
+
+    # The file is read within the trace, so the names and emails are counted
+    tracemalloc.start()
+    phonebook.load_phonebook()
+    used, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert len(book) == count
+    assert book.lookup("0800000123") == ("Contact Name 123", "contact.123@example.com")
+    assert used * (500_000 / count) < 40_000_000
+    assert peak * (500_000 / count) < 80_000_000
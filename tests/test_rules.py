@@ -0,0 +1,124 @@
+# Third Party
+import pytest
+
+# Local
+from calllogger import rules, settings, telemetry
+from calllogger.record import CallDataRecord
+
+
+def make_fields(**fields) -> dict:
+    record = CallDataRecord(fields.pop("call_type", 1))
+    for key, val in fields.items():
+        setattr(record, key, val)
+    return record.__dict__
+
+
+@pytest.mark.parametrize("rule, fields, matched", [
+    ({"field": "line", "op": "eq", "value": 2}, dict(line="2"), True),
+    ({"field": "line", "op": "eq", "value": 2}, dict(line="3"), False),
+    ({"field": "line", "op": "ne", "value": 2}, dict(line="3"), True),
+    ({"field": "call_type", "op": "in", "value": [0, 3]}, dict(call_type=0), True),
+    ({"field": "call_type", "op": "not_in", "value": [0, 3]}, dict(call_type=0), False),
+    ({"field": "ext", "op": "ge", "value": 200}, dict(ext="250"), True),
+    ({"field": "ext", "op": "lt", "value": 200}, dict(ext="250"), False),
+    ({"field": "ext", "op": "lt", "value": 200}, dict(), False),
+    ({"field": "ext", "op": "lt", "value": 200}, dict(ext="??"), False),
+    ({"field": "number", "op": "startswith", "value": "1800"}, dict(number="1800123456"), True),
+    ({"field": "number", "op": "endswith", "value": "456"}, dict(number="1800123456"), True),
+    ({"field": "number", "op": "matches", "value": r"^08[5-7]"}, dict(number="0876153281"), True),
+    ({"field": "number", "op": "len_lt", "value": 5}, dict(number="104"), True),
+    ({"field": "number", "op": "len_lt", "value": 5}, dict(number="0876153281"), False),
+    ({"field": "number", "op": "len_gt", "value": 5}, dict(number="0876153281"), True),
+    # A field that is missing, or can't be converted, never matches whatever the operator
+    ({"field": "contact_name", "op": "matches", "value": "^No"}, dict(), False),
+    ({"field": "contact_name", "op": "matches", "value": "^No"}, dict(contact_name="Noel"), True),
+    ({"field": "ext", "op": "ne", "value": 101}, dict(), False),
+    ({"field": "ext", "op": "ne", "value": 101}, dict(ext="??"), False),
+    ({"field": "ext", "op": "ne", "value": 101}, dict(ext=102), True),
+    ({"field": "ext", "op": "not_in", "value": [101, 102]}, dict(), False),
+    ({"field": "ext", "op": "not_in", "value": [101, 102]}, dict(ext=103), True),
+    ({"field": "number", "op": "len_lt", "value": 5}, dict(), False),
+    ({"field": "number", "op": "startswith", "value": "No"}, dict(), False),
+])
+def test_operators(rule, fields, matched):
+    match = rules.compile_rules([rule])
+    assert (match(make_fields(**fields)) is not None) is matched
+
+
+def test_and_or_groups():
+    match = rules.compile_rules([
+        {"name": "internal", "or": [
+            {"field": "number", "op": "len_lt", "value": 5},
+            {"and": [
+                {"field": "line", "op": "eq", "value": 4},
+                {"field": "call_type", "op": "eq", "value": 0},
+            ]},
+        ]},
+    ])
+    assert match(make_fields(number="104")) == "internal"
+    assert match(make_fields(number="0876153281", line=4, call_type=0)) == "internal"
+    assert match(make_fields(number="0876153281", line=4, call_type=1)) is None
+
+
+def test_first_matching_rule_name():
+    match = rules.compile_rules([
+        {"field": "line", "op": "eq", "value": 1},
+        {"name": "second", "field": "line", "op": "eq", "value": 2},
+    ])
+    assert match(make_fields(line=1)) == "rule0"
+    assert match(make_fields(line=2)) == "second"
+    assert match(make_fields(line=3)) is None
+
+
+@pytest.mark.parametrize("rule", [
+    {"field": "line", "op": "eq"},
+    {"field": "unknown", "op": "eq", "value": 1},
+    {"field": "line", "op": "unknown", "value": 1},
+    {"and": []},
+    "not a rule",
+])
+def test_invalid_rules(rule):
+    with pytest.raises(rules.RuleError):
+        rules.compile_rules([rule])
+
+
+class TestRuleFilter:
+    @pytest.fixture
+    def mock_rules(self, mocker):
+        def worker(value):
+            mocker.patch.object(settings, "filter_rules", value)
+        return worker
+
+    def test_no_rules(self, mock_rules):
+        mock_rules([])
+        assert rules.RuleFilter()(CallDataRecord(1)) is True
+
+    def test_dropped_and_counted(self, mock_rules, mocker):
+        spy_counter = mocker.spy(telemetry, "filter_rule_hits")
+        mock_rules([{"name": "incoming", "field": "call_type", "op": "eq", "value": 0}])
+        edge_filter = rules.RuleFilter()
+
+        assert edge_filter(CallDataRecord(0)) is False
+        assert edge_filter(CallDataRecord(1)) is True
+        spy_counter.assert_called_once_with(tags=dict(rule="incoming"))
+
+    def test_reloaded_on_change(self, mock_rules):
+        edge_filter = rules.RuleFilter()
+        mock_rules([{"field": "call_type", "op": "eq", "value": 0}])
+        assert edge_filter(CallDataRecord(0)) is False
+
+        mock_rules([{"field": "call_type", "op": "eq", "value": 1}])
+        assert edge_filter(CallDataRecord(0)) is True
+
+    def test_invalid_rules_disable_filtering(self, mock_rules):
+        mock_rules([{"field": "unknown", "op": "eq", "value": 0}])
+        assert rules.RuleFilter()(CallDataRecord(0)) is True
+
+    def test_rules_source(self):
+        """Test that a filter can follow rules other than the setting, like the rules of a hosted tenant."""
+        current = {"rules": [{"field": "call_type", "op": "eq", "value": 0}]}
+        tenant_filter = rules.RuleFilter(lambda: current["rules"])
+        assert tenant_filter(CallDataRecord(0)) is False
+
+        current["rules"] = []
+        assert tenant_filter(CallDataRecord(0)) is True
@@ -0,0 +1,129 @@
+# Standard Lib
+from datetime import datetime
+from queue import SimpleQueue
+import threading
+import random
+import time
+import os
+
+# Third Party
+from pytest_mock import MockerFixture
+import pytest
+
+# Local
+from calllogger.simulator import SerialSimulator, siemens_line
+from calllogger.plugins import SiemensHipathSerial
+from calllogger import __main__ as entrypoint
+from calllogger import stopped
+
+
+@pytest.fixture
+def simulator():
+    simulator = SerialSimulator(rate=100_000, seed=1)
+    simulator.open()
+    yield simulator
+    simulator.close()
+
+
+def read_all(fd: int, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        data += os.read(fd, size - len(data))
+    return data
+
+
+def test_siemens_lines_parse(mock_serial_port):
+    """Test that the random lines are valid Siemens HiPath records."""
+    plugin = SiemensHipathSerial(_queue=SimpleQueue())
+    rand = random.Random(3)
+    for _ in range(200):
+        line = siemens_line(rand, datetime(2024, 1, 5, 10))
+        assert len(line) == 78
+        record = plugin.process_line(line)
+        assert record.call_type in (1, 2)
+        assert record.number
+
+
+def test_written_at_rate(simulator):
+    simulator.rate = 1_000
+    start = time.monotonic()
+    assert simulator.run(count=100) == 100
+    assert time.monotonic() - start >= 0.09
+
+    data = read_all(simulator.slave, 78 * 100)
+    assert data.count(b"\r\n") == 100
+
+
+def test_capture_lines_cycled(simulator):
+    simulator.lines = [b"line one\r\n", b"line two\r\n"]
+    simulator.burst = 2
+    simulator.run(count=3)
+    assert read_all(simulator.slave, 30) == b"line one\r\nline two\r\nline one\r\n"
+
+
+def test_control_chars_and_noise(mock_serial_port):
+    simulator = SerialSimulator(control=1.0, noise=1.0, seed=2)
+    line = b"11.04.1900:35:48  1   10400:0100:00:070876153281                           1\r\n"
+    mangled = [simulator.mangle(line) for _ in range(50)]
+    assert all(len(data) == len(line) + 1 for data in mangled)
+    assert all(data != line for data in mangled)
+
+
+def test_control_chars_stripped_by_plugin(mock_serial_port):
+    """Lines with only control characters added still parse, as the Siemens plugin strips them."""
+    simulator = SerialSimulator(control=1.0, seed=4)
+    plugin = SiemensHipathSerial(_queue=SimpleQueue())
+    rand = random.Random(4)
+    for _ in range(50):
+        line = siemens_line(rand, datetime(2024, 1, 5, 10))
+        mangled = simulator.mangle(line.rstrip(b"\r\n")) + b"\r\n"
+        assert plugin.process_line(mangled).number == plugin.process_line(line).number
+
+
+def test_stops_when_not_read(simulator):
+    """Test that a stop is noticed even when nothing reads the port and its buffer is full."""
+    event = threading.Event()
+    thread = threading.Thread(target=simulator.run, kwargs=dict(stopped=event))
+    thread.start()
+    time.sleep(0.2)
+    event.set()
+    thread.join(timeout=1)
+    assert not thread.is_alive()
+    assert simulator.written > 0
+
+
+def test_entrypoint(mocker: MockerFixture, capsys):
+    mocked = mocker.patch.object(entrypoint, "SerialSimulator")
+    mocked.return_value.open.return_value = "/dev/pts/9"
+    mocked.return_value.run.return_value = 10
+    mocker.patch("sys.argv", ["calllogger-simulate-serial", "--rate", "500", "--burst", "5", "--count", "10"])
+
+    assert entrypoint.simulate_serial() == 0
+    mocked.assert_called_with(lines=None, rate=500.0, burst=5, noise=0.0, control=0.0, seed=None)
+    mocked.return_value.run.assert_called_with(10, stopped)
+    assert mocked.return_value.close.called
+    output = capsys.readouterr().out
+    assert "/dev/pts/9" in output
+    assert "Wrote 10 lines" in output
+
+
+def test_load_through_serial_read_path(simulator, mock_settings):
+    """Test that the real serial read path keeps up with 10k lines a second in bursts."""
+    mock_settings(queue_size=10_000)
+    simulator.rate, simulator.burst = 10_000, 20
+    queue = SimpleQueue()
+    plugin = SiemensHipathSerial(_queue=queue, port=os.ttyname(simulator.slave))
+    plugin.read_lines()
+    writer = threading.Thread(target=simulator.run, kwargs=dict(count=2_000))
+    writer.start()
+
+    start = time.monotonic()
+    try:
+        while queue.qsize() < 2_000 and time.monotonic() - start < 5:
+            for raw_line in plugin.read_lines():
+                plugin.handle_line(raw_line)
+    finally:
+        writer.join()
+        plugin.sserver.close()
+    assert queue.qsize() == 2_000
+    assert time.monotonic() - start < 1
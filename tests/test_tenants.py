@@ -0,0 +1,213 @@
+# Standard Lib
+from unittest import mock
+import json
+
+# Third Party
+from pytest_mock import MockerFixture
+import pytest
+
+# Local
+from calllogger import tenants, telemetry, stopped, auth
+from calllogger.api import info, cdr
+from calllogger.record import CallDataRecord
+from calllogger.plugins.base import BasePlugin
+
+tenants_data = [
+    {"identifier": "virtual-0001", "token": "token1", "plugin": "mockcalls"},
+    {"identifier": "virtual-0002", "token": "token2", "plugin": "mockcalls"},
+]
+
+
+@pytest.fixture
+def tenants_file(tmp_path):
+    path = tmp_path.joinpath("tenants.json")
+    path.write_text(json.dumps(tenants_data))
+    return path
+
+
+class TestLoadTenants:
+    def test_load(self, tenants_file):
+        loaded = tenants.load_tenants(tenants_file)
+        assert [tenant.identifier for tenant in loaded] == ["VIRTUAL-0001", "VIRTUAL-0002"]
+        assert loaded[0].token.token == "token1"
+        assert loaded[0].queue is not loaded[1].queue
+
+    @pytest.mark.parametrize("content", ["not json", "[]", '[{"identifier": "missing token"}]'])
+    def test_invalid(self, tmp_path, content):
+        path = tmp_path.joinpath("tenants.json")
+        path.write_text(content)
+        with pytest.raises(SystemExit):
+            tenants.load_tenants(path)
+
+    def test_plugin_settings(self, tmp_path, mock_env):
+        """Test that each tenant has its own plugin settings, over the environment."""
+        mock_env(plugin_beronet_user="env", plugin_beronet_password="env")
+        path = tmp_path.joinpath("tenants.json")
+        path.write_text(json.dumps([
+            dict(
+                tenants_data[0], plugin="beronet:10.0.0.5", settings={"beronet_user": "one", "beronet_resume": "false"},
+            ),
+            dict(tenants_data[1], plugin="beronet:10.0.0.5", settings={"beronet_user": "two", "beronet_sleep": 10}),
+        ]))
+        first, second = [tenant.plugins()[0][1] for tenant in tenants.load_tenants(path)]
+
+        assert (first["beronet_user"], first["beronet_resume"]) == ("one", False)
+        assert (second["beronet_user"], second["beronet_sleep"]) == ("two", 10)
+        assert first["edge_filter"] is not second["edge_filter"]
+
+    def test_unknown_setting(self, tmp_path):
+        """Test that a setting no plugin of the tenant has is refused, e.g. process wide settings."""
+        path = tmp_path.joinpath("tenants.json")
+        path.write_text(json.dumps([dict(tenants_data[0], settings={"middleware": "redact"})]))
+        with pytest.raises(SystemExit):
+            tenants.load_tenants(path)
+
+    def test_missing(self, tmp_path):
+        with pytest.raises(SystemExit):
+            tenants.load_tenants(tmp_path.joinpath("missing.json"))
+
+
+class TestHostedTenants:
+    @pytest.fixture
+    def hosted(self, tenants_file, mocker: MockerFixture):
+        mocker.patch.object(info.ClientInfo, "get_client_info", return_value=info.ClientInfo({"slug": "test"}))
+        mocker.patch.object(tenants.TenantCDRWorker, "start")
+        mocker.patch.object(BasePlugin, "start", autospec=True)
+        mocker.patch.object(tenants, "ThreadTimer")
+        return tenants.HostedTenants(tenants.load_tenants(tenants_file))
+
+    def test_start(self, hosted, mocker: MockerFixture):
+        spy_memory = mocker.spy(telemetry, "tenant_memory")
+        hosted.start()
+
+        for tenant in hosted.tenants:
+            assert tenant.client_info.slug == "test"
+            info.ClientInfo.get_client_info.assert_any_call(
+                tenant.token, tenant.identifier, apply_settings=False, handler=mock.ANY,
+            )
+        assert tenants.TenantCDRWorker.start.call_count == 2
+        assert BasePlugin.start.call_count == 2
+        assert spy_memory.call_count == 2
+        assert tenants.ThreadTimer.return_value.start.called
+
+    def test_records_routed_per_tenant(self, hosted):
+        """Test that the plugin of each tenant pushes to the queue of that tenant only."""
+        hosted.start()
+
+        record = CallDataRecord(1)
+        record.number = "0857539075"
+        record.ext = 101
+        first = BasePlugin.start.call_args_list[0].args[0]
+        first.push(record)
+        assert hosted.tenants[0].queue.qsize() == 1
+        assert hosted.tenants[1].queue.qsize() == 0
+        assert hosted.tenants[0].queue.get().source == "VIRTUAL-0001:MockCalls"
+
+    def test_filter_rules_per_tenant(self, hosted):
+        """Test that the filter rules pushed for one tenant only drop the records of that tenant."""
+        rules = [{"name": "all", "field": "call_type", "op": "eq", "value": 1}]
+        info.ClientInfo.get_client_info.side_effect = [
+            info.ClientInfo({"settings": {"filter_rules": rules}}), info.ClientInfo({"settings": {}}),
+        ]
+        hosted.start()
+
+        for call in BasePlugin.start.call_args_list:
+            record = CallDataRecord(1)
+            record.number = "0857539075"
+            record.ext = 101
+            call.args[0].push(record)
+        assert hosted.tenants[0].queue.qsize() == 0
+        assert hosted.tenants[1].queue.qsize() == 1
+
+    def test_multiserial_tenant(self, hosted, tmp_path):
+        """Test that the port parsers of a MultiSerial tenant use the tenant's filter rules and source."""
+        rules = [{"name": "all", "field": "call_type", "op": "eq", "value": 1}]
+        info.ClientInfo.get_client_info.side_effect = [
+            info.ClientInfo({"settings": {"filter_rules": rules}}), info.ClientInfo({"settings": {}}),
+        ]
+        settings = {"serial_ports": [{"port": "socket://127.0.0.1:4001", "plugin": "SiemensHipathSerial"}]}
+        path = tmp_path.joinpath("multiserial.json")
+        path.write_text(json.dumps([dict(data, plugin="MultiSerial", settings=settings) for data in tenants_data]))
+        hosted.tenants = tenants.load_tenants(path)
+        hosted.start()
+
+        for tenant, call in zip(hosted.tenants, BasePlugin.start.call_args_list):
+            parser = call.args[0].parsers[0]
+            assert parser.edge_filter is tenant.edge_filter
+            record = CallDataRecord(1)
+            record.number = "0857539075"
+            record.ext = 101
+            parser.push(record)
+        assert hosted.tenants[0].queue.qsize() == 0
+        assert hosted.tenants[1].queue.get().source == "VIRTUAL-0002:MultiSerial:socket://127.0.0.1:4001"
+
+    def test_checkin(self, hosted):
+        hosted.checkin()
+        assert info.ClientInfo.get_client_info.call_count == 2
+
+    def test_checkin_error(self, hosted):
+        """Test that a failed checkin of one tenant does not stop the checkin of the others."""
+        info.ClientInfo.get_client_info.side_effect = [RuntimeError, info.ClientInfo({})]
+        hosted.checkin()
+        assert info.ClientInfo.get_client_info.call_count == 2
+
+
+def test_unauthorized_only_stops_tenant(tenants_file, requests_mock, mocker, disable_sleep):
+    tenant = tenants.load_tenants(tenants_file)[0]
+    tenant.queue.put(CallDataRecord(1))
+    worker = tenants.TenantCDRWorker(tenant, tenants.HostedTenants([tenant]).session)
+    mocked_wait = mocker.patch.object(worker.stopped, "wait")
+    requests_mock.post(cdr.cdr_url, status_code=401)
+
+    assert worker.run() is True
+    assert worker.quit is True
+    # The worker waits for shutdown instead of exiting the process with an error
+    assert mocked_wait.called
+    assert stopped.get_exit_code() == 0
+
+
+class TestRevokedToken:
+    """A revoked token of one tenant must never stop the process or touch the process token."""
+
+    @pytest.fixture
+    def hosted(self, tenants_file, mocker: MockerFixture, disable_sleep):
+        mocker.patch.object(tenants.TenantCDRWorker, "start")
+        mocker.patch.object(BasePlugin, "start", autospec=True)
+        mocker.patch.object(tenants, "ThreadTimer")
+        self.revoke = mocker.patch.object(auth, "revoke_token")
+        return tenants.HostedTenants(tenants.load_tenants(tenants_file))
+
+    @staticmethod
+    def respond(requests_mock, revoked: str):
+        def callback(request, context):
+            context.status_code = 401 if request.headers["Authorization"] == f"Token {revoked}" else 200
+            return {"slug": "test"}
+        requests_mock.post(info.info_url, json=callback)
+
+    def test_at_start(self, hosted, requests_mock):
+        self.respond(requests_mock, "token1")
+        hosted.start()
+
+        assert [tenant.disabled for tenant in hosted.tenants] == [True, False]
+        assert tenants.TenantCDRWorker.start.call_count == 1
+        assert BasePlugin.start.call_count == 1
+        assert not stopped.is_set()
+        assert not self.revoke.called
+
+    def test_at_checkin(self, hosted, requests_mock):
+        self.respond(requests_mock, "")
+        hosted.start()
+        first = hosted.tenants[0]
+        assert first.worker is not None and first.worker.quit is False
+
+        self.respond(requests_mock, "token1")
+        hosted.checkin()
+        assert first.disabled and first.worker.quit is True
+        assert not hosted.tenants[1].disabled
+        assert not stopped.is_set()
+        assert not self.revoke.called
+
+        # Disabled tenants are skipped from then on
+        requests_mock.reset_mock()
+        hosted.checkin()
+        assert requests_mock.call_count == 1